@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connect the events_ingested and connection_created receivers.
+        from . import caching, heavy_hitters, metrics, rollups, sketches  # noqa: F401
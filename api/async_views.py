@@ -0,0 +1,351 @@
+"""
+Native async versions of the ingest and read-only analytics endpoints, for
+deployments served over ASGI (see webAnalytics/asgi.py). They are routed
+instead of the api.views ones when API_ASYNC_VIEWS is set, and answer the
+same URLs with the same payloads.
+
+Request parsing and validation run on the event loop. Django's async ORM
+still drives the synchronous database driver from a worker thread, so
+analytics queries are awaited on a bounded pool of their own (see
+``get_executor``) and ingest writes through ``sync_to_async(store_events)``:
+the loop never waits on the database, and a burst of slow queries cannot
+hold more than ASYNC_VIEW_WORKERS connections. Requests waiting for another
+process to fill the result cache hold a pool thread too, which is why the
+pool is separate from (and larger than) the dashboard's.
+"""
+import asyncio
+import contextvars
+import io
+import json
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.exceptions import ParseError, ValidationError
+
+from . import dashboard as dashboard_widgets, live, metrics, widgets
+from .buffer import BufferFull, get_buffer
+from .caching import cached_call
+from .ingest import batch_status, store_events, validate_batch
+from .models import Event
+from .parsers import NDJSONParser
+from .queries import TimeRange, parse_limit
+from .renderers import FastJSONRenderer
+from .routers import replica_reads
+from .serializers import event_data, validate_event
+from .views import (
+    EXPORT_CHUNK_SIZE, TOP_PAGES_MAX_LIMIT, _event_stream_response, _export_encoder, _export_query,
+    _export_response, _is_true,
+)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool the async analytics endpoints run their queries on."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.ASYNC_VIEW_WORKERS, thread_name_prefix='async-views'
+                )
+    return _executor
+
+
+async def _run(fn):
+    """Await ``fn()`` on the pool, in a copy of the caller's context (replica routing, request metrics)."""
+    future = get_executor().submit(contextvars.copy_context().run, dashboard_widgets._timed, fn)
+    result, _ = await asyncio.wrap_future(future)
+    return result
+
+
+def _json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    # Encoded like the DRF responses of the sync views
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status_code, headers=headers, content_type='application/json'
+    )
+
+
+async def _cached_widget(name, request, default_days, compute):
+    """
+    Answer the analytics endpoint ``name`` with ``compute(time_range)``,
+    through the same result cache (and cache keys) as its sync view.
+    """
+    try:
+        time_range = TimeRange.from_params(request.GET, default_days=default_days)
+    except ValidationError as e:
+        return _json_response(e.detail, status.HTTP_400_BAD_REQUEST)
+
+    def cached():
+        return cached_call(
+            name, request.GET, default_days,
+            lambda: (status.HTTP_200_OK, compute(time_range))
+        )
+
+    status_code, data = await _run(cached)
+    return _json_response(data, status_code)
+
+
+@require_GET
+@replica_reads
+async def event_count_by_day(request):
+    """Async event_count_by_day: event counts grouped by day."""
+    event_name = request.GET.get('event_name', None)
+    return await _cached_widget(
+        'event_count_by_day', request, 7,
+        lambda time_range: widgets.event_counts_by_day(time_range, event_name)
+    )
+
+
+@require_GET
+@replica_reads
+async def page_views_by_country(request):
+    """Async page_views_by_country: page view counts grouped by country."""
+    fast = _is_true(request.GET.get('fast'))
+    try:
+        limit = parse_limit(request.GET, 50, settings.TOPK_CAPACITY)
+    except ValidationError as e:
+        return _json_response(e.detail, status.HTTP_400_BAD_REQUEST)
+    return await _cached_widget(
+        'page_views_by_country', request, 30,
+        lambda time_range: widgets.country_views(time_range, fast=fast, limit=limit)
+    )
+
+
+@require_GET
+@replica_reads
+async def traffic_sources(request):
+    """Async traffic_sources: sessions and bounce rate per UTM source."""
+    return await _cached_widget('traffic_sources', request, 7, widgets.traffic_sources)
+
+
+@require_GET
+@replica_reads
+async def page_metrics(request):
+    """Async page_metrics: page views, unique visitors and their trend."""
+    exact = _is_true(request.GET.get('exact'))
+    return await _cached_widget(
+        'page_metrics', request, 7,
+        lambda time_range: widgets.page_metrics(time_range, exact=exact)
+    )
+
+
+@require_GET
+@replica_reads
+async def top_pages(request):
+    """Async top_pages: performance metrics for the most viewed pages."""
+    try:
+        limit = parse_limit(request.GET, 10, TOP_PAGES_MAX_LIMIT)
+    except ValidationError as e:
+        return _json_response(e.detail, status.HTTP_400_BAD_REQUEST)
+    fast = _is_true(request.GET.get('fast'))
+    return await _cached_widget(
+        'top_pages', request, 7,
+        lambda time_range: widgets.top_pages(time_range, limit=limit, fast=fast)
+    )
+
+
+@require_GET
+@replica_reads
+async def dashboard(request):
+    """
+    Async dashboard: every widget in one response.
+
+    The widgets already run concurrently on the dashboard pool, so the
+    request waits for them from a plain worker thread rather than from a
+    pool thread, which could deadlock a saturated pool.
+    """
+    try:
+        time_range = TimeRange.from_params(request.GET, default_days=7)
+        limit = parse_limit(request.GET, 10, TOP_PAGES_MAX_LIMIT)
+    except ValidationError as e:
+        return _json_response(e.detail, status.HTTP_400_BAD_REQUEST)
+    names = request.GET.get('widgets')
+    names = names.split(',') if names else list(dashboard_widgets.WIDGETS)
+    unknown = [name for name in names if name not in dashboard_widgets.WIDGETS]
+    if unknown:
+        return _json_response(
+            {'detail': f"Unknown widgets: {', '.join(unknown)}"},
+            status.HTTP_400_BAD_REQUEST
+        )
+    options = {
+        'exact': _is_true(request.GET.get('exact')),
+        'fast': _is_true(request.GET.get('fast')),
+        'limit': limit,
+    }
+
+    status_code, data = await sync_to_async(cached_call, thread_sensitive=False)(
+        'dashboard', request.GET, 7,
+        lambda: dashboard_widgets.dashboard_response(time_range, names, options)
+    )
+    return _json_response(data, status_code)
+
+
+@require_GET
+@replica_reads
+async def export_events(request):
+    """
+    Async export_events: the same NDJSON or CSV stream, produced by an
+    async iterator so ASGI servers send each chunk as it is read instead
+    of buffering a sync generator. The CSV header goes out first, before
+    any query runs.
+    """
+    # Resolving the database may check the replica's lag: not on the loop
+    export = await sync_to_async(_export_query)(request)
+    if isinstance(export, HttpResponse):
+        return export
+    rows, columns, export_format, compress = export
+
+    chunks = _export_chunks(rows, columns, export_format)
+    if compress:
+        chunks = _gzip_chunks(chunks)
+    return _export_response(chunks, export_format, compress)
+
+
+async def _export_chunks(rows, columns, export_format):
+    header, encode = _export_encoder(columns, export_format)
+    if header:
+        yield header
+    chunk = []
+    async for row in rows.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield encode(chunk)
+            chunk = []
+    if chunk:
+        yield encode(chunk)
+
+
+async def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+@require_GET
+async def live_stream(request):
+    """Async live_stream: Server-Sent Events of the live counters."""
+    return _event_stream_response(live.astream())
+
+
+def _parse_body(request):
+    """Decode a JSON (or, for batches, NDJSON) request body."""
+    if request.content_type == NDJSONParser.media_type:
+        return NDJSONParser().parse(io.BytesIO(request.body))
+    if request.content_type != 'application/json':
+        raise ParseError(f'Unsupported media type "{request.content_type}" in request.')
+    try:
+        return json.loads(request.body)
+    except ValueError as exc:
+        raise ParseError(f'JSON parse error - {exc}')
+
+
+def _buffer_full_response(exc):
+    """Ask the client to retry later when the ingest buffer is saturated."""
+    return _json_response(
+        {'detail': str(exc)},
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(settings.TRACK_BUFFER_RETRY_AFTER)}
+    )
+
+
+@csrf_exempt
+@require_POST
+async def track_event(request):
+    """
+    Async track_event: validate and store one analytics event.
+
+    In buffered ingest mode the event is queued without leaving the event
+    loop and acknowledged with 202; otherwise it is written from a worker
+    thread and returned with 201.
+    """
+    try:
+        data = _parse_body(request)
+    except ParseError as e:
+        return _json_response({'detail': e.detail}, status.HTTP_400_BAD_REQUEST)
+
+    validated, errors = validate_event(data)
+    if errors:
+        metrics.record_ingest('track', rejected=1)
+        return _json_response(errors, status.HTTP_400_BAD_REQUEST)
+
+    event = Event(**validated)
+
+    if settings.TRACK_INGEST_MODE == 'buffered':
+        try:
+            get_buffer().offer([event])
+        except BufferFull as exc:
+            metrics.record_ingest('track', throttled=1)
+            return _buffer_full_response(exc)
+        live.record([event])
+        metrics.record_ingest('track', accepted=1)
+        return _json_response(event_data(event), status.HTTP_202_ACCEPTED)
+
+    event, = await sync_to_async(store_events)([event])
+    live.record([event])
+    metrics.record_ingest('track', accepted=1)
+    return _json_response(event_data(event), status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_POST
+async def track_batch(request):
+    """
+    Async track_batch: validate and store many analytics events, answering
+    with one status entry per item exactly like the sync endpoint.
+    """
+    try:
+        items = _parse_body(request)
+    except ParseError as e:
+        return _json_response({'detail': e.detail}, status.HTTP_400_BAD_REQUEST)
+    if not isinstance(items, list):
+        return _json_response(
+            {'detail': 'Expected a JSON array or NDJSON body.'},
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    max_events = settings.TRACK_BATCH_MAX_EVENTS
+    if len(items) > max_events:
+        metrics.record_ingest('batch', rejected=len(items), batch_size=len(items))
+        return _json_response(
+            {'detail': f'Batch exceeds the limit of {max_events} events.'},
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    buffered = settings.TRACK_INGEST_MODE == 'buffered'
+    accepted_status = status.HTTP_202_ACCEPTED if buffered else status.HTTP_201_CREATED
+
+    results, pending = validate_batch(items, accepted_status)
+    events = [event for _, event in pending]
+    if buffered:
+        try:
+            get_buffer().offer(events)
+        except BufferFull as exc:
+            metrics.record_ingest(
+                'batch', rejected=len(results) - len(events), throttled=len(events), batch_size=len(items)
+            )
+            return _buffer_full_response(exc)
+        live.record(events)
+    else:
+        stored = await sync_to_async(store_events)(events)
+        for (result, _), event in zip(pending, stored):
+            result['id'] = event.pk
+        live.record(events)
+
+    accepted = len(events)
+    rejected = len(results) - accepted
+    metrics.record_ingest('batch', accepted=accepted, rejected=rejected, batch_size=len(items))
+    return _json_response(
+        {'accepted': accepted, 'rejected': rejected, 'results': results},
+        batch_status(accepted, rejected, accepted_status)
+    )
@@ -0,0 +1,286 @@
+"""
+Benchmark harness for the ingest and analytics endpoints.
+
+Each benchmark issues a fixed number of requests from ``concurrency``
+threads, either in process through Django's test client (the view stack
+without a network hop) or over HTTP against a running server, and reports
+throughput and latency percentiles. Results are plain JSON so runs on
+different commits can be compared with ``compare``.
+
+The ``serialization`` benchmark instead times event validation, list
+representation and JSON rendering in process, through EventSerializer and
+through the fast path the endpoints use, in events per CPU second.
+"""
+import json
+import math
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.test import Client
+
+from rest_framework.renderers import JSONRenderer
+
+from .models import Event
+from .renderers import FastJSONRenderer
+from .serializers import EVENT_FIELDS, EventSerializer, event_rows, validate_event
+from .synthetic import EventGenerator
+
+# Pageview, click, form submission: the shape of a typical signup funnel
+FUNNEL_STEPS = urllib.parse.quote(json.dumps(
+    [{'event_name': 'pageview'}, {'event_name': 'click'}, {'event_name': 'form_submit'}]
+))
+
+# name -> (path, query string) of the read endpoints; {days} is filled in
+ANALYTICS_BENCHMARKS = {
+    'daily': ('/api/analytics/daily/', 'days={days}'),
+    'daily_click': ('/api/analytics/daily/', 'days={days}&event_name=click'),
+    'countries': ('/api/analytics/countries/', 'days={days}'),
+    'countries_fast': ('/api/analytics/countries/', 'days={days}&fast=true'),
+    'sources': ('/api/analytics/sources/', 'days={days}'),
+    'pages': ('/api/analytics/pages/', 'days={days}'),
+    'pages_exact': ('/api/analytics/pages/', 'days={days}&exact=true'),
+    'top_pages': ('/api/analytics/top-pages/', 'days={days}'),
+    'top_pages_fast': ('/api/analytics/top-pages/', 'days={days}&fast=true'),
+    'top_values': ('/api/analytics/top/', 'days={days}&dimension=path'),
+    'funnel': ('/api/analytics/funnel/', 'days={days}&steps=' + FUNNEL_STEPS),
+    'dashboard': ('/api/analytics/dashboard/', 'days={days}'),
+    'events': ('/api/events/', ''),
+    'live': ('/api/live/', ''),
+}
+
+INGEST_BENCHMARKS = ('track_event', 'track_batch')
+
+SERIALIZATION_BENCHMARK = 'serialization'
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank ``p``-th percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors, elapsed, concurrency, events=None):
+    """Benchmark result from per-request latencies in seconds."""
+    ms = sorted(latency * 1000 for latency in latencies)
+    result = {
+        'requests': len(ms),
+        'errors': errors,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(ms) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(ms) / len(ms), 2) if ms else None,
+            'p50': _round(percentile(ms, 50)),
+            'p95': _round(percentile(ms, 95)),
+            'p99': _round(percentile(ms, 99)),
+            'max': _round(ms[-1] if ms else None),
+        },
+    }
+    if events is not None:
+        result['events_per_s'] = round(events / elapsed, 1) if elapsed else None
+    return result
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+class InProcessTransport:
+    """Requests through Django's test client, one client per thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = Client(SERVER_NAME='localhost')
+        return self._local.client
+
+    def get(self, path, query):
+        return self._client().get(f'{path}?{query}' if query else path).status_code
+
+    def post(self, path, body, content_type='application/json'):
+        return self._client().post(path, body, content_type=content_type).status_code
+
+    def close(self):
+        close_old_connections()
+
+
+class HTTPTransport:
+    """Requests over HTTP to a running server at ``base_url``."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def _send(self, request):
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def get(self, path, query):
+        return self._send(urllib.request.Request(f'{self.base_url}{path}?{query}'))
+
+    def post(self, path, body, content_type='application/json'):
+        return self._send(urllib.request.Request(
+            f'{self.base_url}{path}', data=body.encode('utf-8'),
+            headers={'Content-Type': content_type}, method='POST'
+        ))
+
+    def close(self):
+        pass
+
+
+def run(transport, calls, concurrency):
+    """
+    Issue every ``call()`` (returning an HTTP status) from ``concurrency``
+    threads. Returns (latencies in seconds, error count, wall time).
+    """
+    def timed(call):
+        started = time.perf_counter()
+        try:
+            ok = call() < 400
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def worker(chunk):
+        try:
+            return [timed(call) for call in chunk]
+        finally:
+            transport.close()
+
+    chunks = [calls[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = [outcome for chunk in pool.map(worker, chunks) for outcome in chunk]
+    elapsed = time.perf_counter() - started
+    return [latency for latency, _ in outcomes], sum(not ok for _, ok in outcomes), elapsed
+
+
+def bench_ingest(transport, name, requests, concurrency, batch_size, seed):
+    """Benchmark ``track_event`` (one event per request) or ``track_batch``."""
+    per_request = batch_size if name == 'track_batch' else 1
+    generator = EventGenerator(seed=seed, days=1)
+    events = [EventGenerator.payload(event) for event in generator.events(requests * per_request)]
+    if name == 'track_batch':
+        bodies = [json.dumps(events[i:i + batch_size]) for i in range(0, len(events), batch_size)]
+        path = '/api/track/batch/'
+    else:
+        bodies = [json.dumps(event) for event in events]
+        path = '/api/track/'
+
+    calls = [lambda body=body: transport.post(path, body) for body in bodies]
+    latencies, errors, elapsed = run(transport, calls, concurrency)
+    return summarize(latencies, errors, elapsed, concurrency, events=len(events))
+
+
+def bench_endpoint(transport, name, requests, concurrency, days):
+    path, query = ANALYTICS_BENCHMARKS[name]
+    query = query.format(days=days)
+    transport.get(path, query)  # Warm up connections and code paths
+    calls = [lambda: transport.get(path, query)] * requests
+    latencies, errors, elapsed = run(transport, calls, concurrency)
+    result = summarize(latencies, errors, elapsed, concurrency)
+    result['url'] = f'{path}?{query}' if query else path
+    return result
+
+
+def _events_per_cpu_second(function, count):
+    started = time.process_time()
+    function()
+    elapsed = time.process_time() - started
+    return round(count / elapsed, 1) if elapsed else None
+
+
+def bench_serialization(count, seed):
+    """
+    Events per CPU second validated (track payloads), represented (list
+    pages) and rendered to JSON by EventSerializer and by the fast path.
+    No database access: rows are built from synthetic events.
+    """
+    generator = EventGenerator(seed=seed, days=1)
+    events = list(generator.events(count))
+    payloads = [EventGenerator.payload(event) for event in events]
+    instances = [Event(pk=i, created_at=event['received_at'], **event) for i, event in enumerate(events, start=1)]
+    # What values(*EVENT_FIELDS) yields for the same events
+    rows = [{name: getattr(instance, name) for name in EVENT_FIELDS} for instance in instances]
+    data = event_rows(rows)
+
+    def drf_validate():
+        for payload in payloads:
+            serializer = EventSerializer(data=payload)
+            serializer.is_valid()
+            serializer.validated_data
+
+    def fast_validate():
+        for payload in payloads:
+            validate_event(payload)
+
+    stages = {
+        'validate': (drf_validate, fast_validate),
+        'represent': (lambda: EventSerializer(instances, many=True).data, lambda: event_rows(rows)),
+        'render': (lambda: JSONRenderer().render(data), lambda: FastJSONRenderer().render(data)),
+    }
+    result = {'events': count}
+    for stage, (baseline, fast) in stages.items():
+        before = _events_per_cpu_second(baseline, count)
+        after = _events_per_cpu_second(fast, count)
+        result[stage] = {
+            'serializer_events_per_cpu_s': before,
+            'fast_events_per_cpu_s': after,
+            'speedup': round(after / before, 1) if before and after else None,
+        }
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(label, options):
+    return {
+        'label': label,
+        'commit': git_commit(),
+        'created_at': datetime.now(dt_timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'options': options,
+    }
+
+
+def compare(baseline, current):
+    """
+    Rows ``(name, metric, before, after, change %)`` for the benchmarks both
+    result sets contain; negative latency changes are improvements.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None or name == SERIALIZATION_BENCHMARK:
+            continue
+        for metric in ('p50', 'p95', 'p99'):
+            old, new = before['latency_ms'][metric], result['latency_ms'][metric]
+            if old and new is not None:
+                rows.append((name, metric, old, new, round((new - old) * 100 / old, 1)))
+        old, new = before['throughput_rps'], result['throughput_rps']
+        if old and new is not None:
+            rows.append((name, 'rps', old, new, round((new - old) * 100 / old, 1)))
+    return rows
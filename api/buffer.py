@@ -0,0 +1,171 @@
+import atexit
+import json
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import OperationalError, close_old_connections
+
+from . import metrics
+from .ingest import store_events
+from .serializers import event_data
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    """Raised when the ingest buffer has no room for the offered events."""
+
+
+class EventBuffer:
+    """
+    Bounded in-process write-behind buffer for validated events.
+
+    Request threads append events with ``offer()`` and return immediately.
+    A background thread drains the buffer with bulk inserts whenever
+    ``flush_size`` events are waiting or ``flush_interval`` seconds have
+    passed, whichever comes first. The thread is started lazily on the
+    first offer so that it is created after any pre-fork of the server
+    process, and the remaining events are flushed at interpreter exit.
+    Events the database rejects are logged and dropped rather than
+    retried, so they cannot hold up the rest (see ``_store``).
+    """
+
+    def __init__(self, max_events, flush_size, flush_interval):
+        self.max_events = max_events
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def offer(self, events):
+        """
+        Enqueue all of ``events`` or none of them.
+
+        Raises BufferFull when accepting them would exceed ``max_events``,
+        so callers can push back on the client instead of dropping data.
+        """
+        with self._lock:
+            if self._stopping.is_set():
+                raise BufferFull('Ingest buffer is shutting down.')
+            if len(self._events) + len(events) > self.max_events:
+                raise BufferFull(f'Ingest buffer is full ({self.max_events} events).')
+            self._events.extend(events)
+            pending = len(self._events)
+            self._ensure_started()
+
+        if pending >= self.flush_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write out everything currently buffered. Returns the number stored."""
+        stored = 0
+        with self._flush_lock:
+            try:
+                while True:
+                    batch = self._take(self.flush_size)
+                    if not batch:
+                        break
+                    batch_stored, complete = self._store(batch)
+                    stored += batch_stored
+                    if not complete:
+                        break
+            finally:
+                close_old_connections()
+        return stored
+
+    def _store(self, batch):
+        """
+        Store ``batch`` and return ``(stored, complete)``.
+
+        An OperationalError (lost connection, deadlock, serialization
+        failure) may go away on its own: the events not yet stored go back
+        to the front of the buffer for the next flush and ``complete`` is
+        False. Any other error comes from the events themselves, so the
+        failing part is split in halves and retried until the events that
+        cannot be stored are isolated and dead-lettered (``_drop``).
+        """
+        stored = 0
+        parts = deque([batch])
+        while parts:
+            part = parts.popleft()
+            try:
+                store_events(part)
+            except OperationalError:
+                logger.exception('Failed to flush %d buffered events; will retry', len(part))
+                self._put_back([event for events in (part, *parts) for event in events])
+                return stored, False
+            except Exception:
+                if len(part) == 1:
+                    self._drop(part[0])
+                else:
+                    middle = len(part) // 2
+                    parts.extendleft((part[middle:], part[:middle]))
+                continue
+            stored += len(part)
+        return stored, True
+
+    def _drop(self, event):
+        """Log an event that cannot be stored, with its data, and discard it."""
+        logger.error(
+            'Dropped a buffered event that cannot be stored: %s',
+            json.dumps(event_data(event), cls=DjangoJSONEncoder), exc_info=True
+        )
+        metrics.record_ingest('buffer', dropped=1)
+
+    def stop(self, timeout=None):
+        """Stop the flusher thread and flush whatever is left."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='event-buffer-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _take(self, count):
+        with self._lock:
+            return [self._events.popleft() for _ in range(min(count, len(self._events)))]
+
+    def _put_back(self, batch):
+        with self._lock:
+            self._events.extendleft(reversed(batch))
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the process-wide EventBuffer, creating it from settings."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = EventBuffer(
+                    max_events=settings.TRACK_BUFFER_MAX_EVENTS,
+                    flush_size=settings.TRACK_BUFFER_FLUSH_SIZE,
+                    flush_interval=settings.TRACK_BUFFER_FLUSH_INTERVAL,
+                )
+                atexit.register(_buffer.stop)
+    return _buffer
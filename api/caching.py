@@ -0,0 +1,244 @@
+import functools
+import hashlib
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.http import urlencode
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .queries import TimeRange
+from .signals import events_ingested
+
+KEY_PREFIX = 'analytics'
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+# Query parameters each cached endpoint reads besides its time range (days,
+# start_date, end_date). Only these go into its cache keys, so unrelated
+# parameters such as cache busters share the cached result.
+RANGE_PARAMS = ('days', 'start_date', 'end_date')
+ENDPOINT_PARAMS = {
+    'event_count_by_day': ('event_name',),
+    'page_views_by_country': ('fast', 'limit'),
+    'traffic_sources': (),
+    'page_metrics': ('exact',),
+    'top_pages': ('fast', 'limit'),
+    'top_values': ('dimension', 'limit'),
+    'dashboard': ('widgets', 'exact', 'fast', 'limit'),
+}
+
+# Backends whose entries (and so generation bumps) stay in one process
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Striped in-process locks: misses on the same key always share a lock
+_local_locks = [threading.Lock() for _ in range(64)]
+
+
+def _cache():
+    return caches[settings.ANALYTICS_CACHE_ALIAS]
+
+
+def _generation_key(day):
+    return f'{KEY_PREFIX}:gen:{day.isoformat()}'
+
+
+def _month_generation_key(day):
+    return f'{KEY_PREFIX}:gen:{day:%Y-%m}'
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _generation_keys(start_date, end_date):
+    """
+    Keys stamping [start_date, end_date]: one per whole month inside it and
+    one per remaining day, so a year costs about 75 keys, not 366.
+    """
+    keys = []
+    day = start_date
+    while day <= end_date:
+        month_end = _next_month(day)
+        if day.day == 1 and month_end - timedelta(days=1) <= end_date:
+            keys.append(_month_generation_key(day))
+            day = month_end
+        else:
+            keys.append(_generation_key(day))
+            day += timedelta(days=1)
+    return keys
+
+
+def window_generation(start_date, end_date):
+    """
+    Generation stamp of the days in [start_date, end_date]: changes whenever
+    an event is ingested into any of those days.
+    """
+    keys = _generation_keys(start_date, end_date)
+    generations = _cache().get_many(keys)
+    return tuple(generations.get(key, 0) for key in keys)
+
+
+def invalidate_days(days):
+    """Bump the generation of every day in ``days`` and of their months."""
+    cache = _cache()
+    keys = {_generation_key(day) for day in days} | {_month_generation_key(day) for day in days}
+    for key in sorted(keys):
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, 1, timeout=None)
+
+
+def is_shared():
+    """Whether the analytics cache is shared, so invalidations reach every process."""
+    return settings.CACHES[settings.ANALYTICS_CACHE_ALIAS]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def local_cache_warning():
+    """
+    Warning for management commands that change analytics results, or None.
+
+    Commands run in their own process: with an in-process cache their
+    invalidations never reach the web workers, which keep serving the
+    results cached before the command until they expire.
+    """
+    if not settings.ANALYTICS_CACHE_ENABLED or is_shared():
+        return None
+    return (
+        f"The analytics cache is local to each process: web workers serve results cached before this "
+        f"command for up to ANALYTICS_CACHE_TIMEOUT ({settings.ANALYTICS_CACHE_TIMEOUT}s). Point "
+        f"ANALYTICS_CACHE_URL at redis:// or memcached to invalidate them."
+    )
+
+
+@receiver(events_ingested, dispatch_uid='api.caching.invalidate')
+def _on_events_ingested(sender, events, **kwargs):
+    days = {timezone.localtime(event.timestamp).date() for event in events}
+    transaction.on_commit(lambda: invalidate_days(days))
+
+
+def _local_lock(key):
+    return _local_locks[hash(key) % len(_local_locks)]
+
+
+def _is_fresh(entry, generation):
+    if entry is None:
+        return False
+    entry_generation, computed_at, _ = entry
+    return (
+        entry_generation == generation
+        or time.time() - computed_at < settings.ANALYTICS_CACHE_STALE_SECONDS
+    )
+
+
+def get_or_compute(key, generation, compute, timeout=None):
+    """
+    Return the cached value for ``key`` if it was computed at ``generation``,
+    otherwise call ``compute()`` and cache its result for ``timeout``
+    seconds (default ANALYTICS_CACHE_TIMEOUT).
+
+    ``compute`` returns ``(value, cacheable)``. Concurrent misses for the same
+    key run ``compute`` once: threads of this process wait on a local lock,
+    other processes see the lock entry in the shared cache and serve the
+    previous value (or poll for the new one) while the holder recomputes.
+    """
+    cache = _cache()
+    entry = cache.get(key)
+    if _is_fresh(entry, generation):
+        return entry[2]
+
+    lock_key = f'{key}:lock'
+    with _local_lock(key):
+        entry = cache.get(key)
+        if _is_fresh(entry, generation):
+            return entry[2]
+
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            if entry is not None:
+                return entry[2]
+            if time.monotonic() > deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if _is_fresh(entry, generation):
+                return entry[2]
+
+        try:
+            value, cacheable = compute()
+            if cacheable:
+                cache.set(key, (generation, time.time(), value), timeout=timeout or settings.ANALYTICS_CACHE_TIMEOUT)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+
+def cached_call(name, params, default_days, compute):
+    """
+    Return ``compute()``, a ``(status_code, data)`` pair, for the analytics
+    endpoint ``name`` called with the query ``params`` (a QueryDict). The
+    result is cached by endpoint, the parameters it reads (ENDPOINT_PARAMS)
+    and the current day, and invalidated when events land inside the time
+    range (``days`` or ``start_date``/``end_date``). The parameters are
+    hashed, so keys stay short and valid for memcached whatever the query
+    string holds. Only 200 results are cached.
+    """
+    if not settings.ANALYTICS_CACHE_ENABLED:
+        return compute()
+    try:
+        time_range = TimeRange.from_params(params, default_days)
+    except ValidationError:
+        # Let the endpoint report the malformed parameters
+        return compute()
+    # The endpoints read the last value of a repeated parameter
+    normalized = {k: params.get(k) for k in (*RANGE_PARAMS, *ENDPOINT_PARAMS[name]) if k in params}
+    normalized.setdefault('days', str(default_days))
+
+    today = timezone.localdate()
+    query = urlencode(sorted(normalized.items()))
+    key = f'{KEY_PREFIX}:{name}:{today.isoformat()}:{hashlib.sha1(query.encode()).hexdigest()}'
+    generation = window_generation(time_range.start_date, time_range.end_date)
+
+    def cacheable_compute():
+        status_code, data = compute()
+        return (status_code, data), status_code == status.HTTP_200_OK
+
+    return get_or_compute(key, generation, cacheable_compute)
+
+
+def cached_analytics(default_days):
+    """
+    Cache a read-only analytics view with ``cached_call``, keyed by the view
+    name. Apply below ``@api_view``.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not settings.ANALYTICS_CACHE_ENABLED:
+                return view(request, *args, **kwargs)
+
+            def compute():
+                response = view(request, *args, **kwargs)
+                data = response.data
+                if isinstance(data, QuerySet):
+                    data = list(data)
+                return response.status_code, data
+
+            status_code, data = cached_call(view.__name__, request.query_params, default_days, compute)
+            return Response(data, status=status_code)
+        return wrapper
+    return decorator
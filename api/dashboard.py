@@ -0,0 +1,132 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework import status
+
+from . import widgets
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool bounding the widget queries running at once."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DASHBOARD_WORKERS, thread_name_prefix='dashboard'
+                )
+    return _executor
+
+
+def _submit(fn, *args, **kwargs):
+    """Run ``_timed(fn, ...)`` on the pool in a copy of the caller's context (request metrics)."""
+    return get_executor().submit(contextvars.copy_context().run, _timed, fn, *args, **kwargs)
+
+
+def _timed(fn, *args, **kwargs):
+    """Run ``fn`` on a pool thread as a request would: fresh connection state, wall time in ms."""
+    close_old_connections()
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs), (time.perf_counter() - started) * 1000
+    finally:
+        close_old_connections()
+
+
+def _daily(time_range, options, shared):
+    return widgets.event_counts_by_day(time_range, shared=shared.result()[0])
+
+
+def _countries(time_range, options, shared):
+    return widgets.country_views(time_range, fast=options['fast'])
+
+
+def _sources(time_range, options, shared):
+    return widgets.traffic_sources(time_range)
+
+
+def _pages(time_range, options, shared):
+    return widgets.page_metrics(time_range, exact=options['exact'], shared=shared.result()[0])
+
+
+def _top_pages(time_range, options, shared):
+    return widgets.top_pages(time_range, limit=options['limit'], fast=options['fast'])
+
+
+# Widget name -> function(time_range, options, shared scan future) computing its payload
+WIDGETS = {
+    'daily': _daily,
+    'countries': _countries,
+    'sources': _sources,
+    'pages': _pages,
+    'top_pages': _top_pages,
+}
+
+# Widgets deriving their payload from the shared daily_event_counts scan
+SHARED_SCAN_WIDGETS = {'daily', 'pages'}
+
+
+def build_dashboard(time_range, names, options):
+    """
+    Compute the ``names`` widgets concurrently on the dashboard pool.
+
+    Returns ``(payloads, timings, errors)``: payload and wall time in ms per
+    widget, and the message of every widget that raised. The scan shared by
+    the daily and page metrics widgets runs once, as its own task; its time
+    is reported as ``shared_scan``.
+    """
+    shared = None
+    if SHARED_SCAN_WIDGETS & set(names):
+        # Submitted first, so a widget waiting on it never blocks its start
+        shared = _submit(widgets.daily_event_counts, time_range)
+    futures = {
+        name: _submit(WIDGETS[name], time_range, options, shared)
+        for name in names
+    }
+
+    payloads, timings, errors = {}, {}, {}
+    if shared is not None:
+        try:
+            timings['shared_scan'] = round(shared.result()[1], 1)
+        except Exception:
+            pass  # Reported by the widgets that depend on it
+    for name, future in futures.items():
+        try:
+            payloads[name], elapsed = future.result()
+            timings[name] = round(elapsed, 1)
+        except Exception as e:
+            logger.exception('Dashboard widget %s failed', name)
+            payloads[name] = None
+            errors[name] = str(e)
+    return payloads, timings, errors
+
+
+def dashboard_response(time_range, names, options):
+    """
+    ``(status_code, body)`` of the dashboard endpoint: the widget payloads
+    and timings (plus the total), with 500 and ``errors`` if any failed.
+    """
+    started = time.perf_counter()
+    payloads, timings, errors = build_dashboard(time_range, names, options)
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+
+    result = {
+        'start_date': time_range.start_date,
+        'end_date': time_range.end_date,
+        'widgets': payloads,
+        'timings': timings,
+    }
+    if errors:
+        result['errors'] = errors
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, result
+    return status.HTTP_200_OK, result
@@ -0,0 +1,241 @@
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.conf import settings
+from django.db import models, transaction
+
+from .fields import DimensionField
+from .models import DimensionValue
+
+
+class InternCache:
+    """
+    Thread-safe LRU map between (kind, value) strings and their integer keys.
+
+    Lookups in either direction refresh the entry; once more than
+    ``maxsize`` values are held, the least recently used one is evicted.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def key(self, kind, value):
+        with self._lock:
+            key = self._keys.get((kind, value))
+            if key is not None:
+                self._keys.move_to_end((kind, value))
+            return key
+
+    def value(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            self._keys.move_to_end(entry)
+            return entry[1]
+
+    def put(self, kind, mapping):
+        with self._lock:
+            for value, key in mapping.items():
+                self._keys[(kind, value)] = key
+                self._keys.move_to_end((kind, value))
+                self._values[key] = (kind, value)
+            while len(self._keys) > self.maxsize:
+                _, key = self._keys.popitem(last=False)
+                del self._values[key]
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._values.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Keys resolved for the batch being saved by this thread (see ``interned``)
+_batch = threading.local()
+
+# Rows of query results decoded together (see ``decoded``)
+DECODE_CHUNK_SIZE = 2000
+_deferred = ContextVar('dimension_keys_deferred', default=False)
+
+
+class DimensionKey(int):
+    """A key ``value_for`` could not serve from the cache, left for ``decoded`` to resolve."""
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = InternCache(settings.DIMENSION_CACHE_SIZE)
+    return _cache
+
+
+def _remember(kind, mapping):
+    # Keys read inside a transaction may belong to rows it created; cache
+    # them only once they are committed (immediately under autocommit).
+    if mapping:
+        transaction.on_commit(lambda: get_cache().put(kind, mapping))
+
+
+def intern(kind, values, create=True):
+    """
+    Resolve strings of one dimension ``kind`` to their integer keys with at
+    most one INSERT and one SELECT for all cache misses. Missing values are
+    inserted unless ``create`` is false, in which case they are left out of
+    the returned {value: key} dict.
+    """
+    cache = get_cache()
+    batch = getattr(_batch, 'keys', None) or {}
+    keys = {}
+    missing = set()
+    for value in values:
+        key = batch.get((kind, value)) or cache.key(kind, value)
+        if key is None:
+            missing.add(value)
+        else:
+            keys[value] = key
+    if not missing:
+        return keys
+
+    if create:
+        DimensionValue.objects.bulk_create(
+            [DimensionValue(kind=kind, value=value) for value in sorted(missing)],
+            ignore_conflicts=True
+        )
+    found = dict(
+        DimensionValue.objects.filter(kind=kind, value__in=missing).values_list('value', 'id')
+    )
+    _remember(kind, found)
+    keys.update(found)
+    return keys
+
+
+def key_for(kind, value, create=False):
+    """Integer key of one string, or None if it was never stored and ``create`` is false."""
+    return intern(kind, [value], create=create).get(value)
+
+
+def value_for(kind, key):
+    """
+    String stored under ``key``. While ``decoded`` reads a chunk of rows, a
+    key missing from the cache comes back as a DimensionKey instead.
+    """
+    value = get_cache().value(key)
+    if value is None:
+        if _deferred.get():
+            return DimensionKey(key)
+        value = DimensionValue.objects.filter(pk=key).values_list('value', flat=True).first()
+        if value is not None:
+            _remember(kind, {value: key})
+    return value
+
+
+@contextmanager
+def interned(events):
+    """
+    Resolve every dimension string of unsaved events in one round trip per
+    dimension, and serve those keys to this thread while the events are
+    saved, even inside a transaction that has not committed them yet.
+    """
+    keys = {}
+    for field in events[0]._meta.concrete_fields if events else ():
+        if isinstance(field, DimensionField):
+            values = {getattr(e, field.attname) for e in events}
+            values.discard(None)
+            if values:
+                keys.update(
+                    ((field.kind, value), key) for value, key in intern(field.kind, values).items()
+                )
+    previous = getattr(_batch, 'keys', None)
+    _batch.keys = {**previous, **keys} if previous else keys
+    try:
+        yield
+    finally:
+        _batch.keys = previous
+
+
+def values_for(keys):
+    """Strings of many keys, as {key: value}, with one query for all cache misses."""
+    cache = get_cache()
+    values = {}
+    missing = []
+    for key in keys:
+        value = cache.value(key)
+        if value is None:
+            missing.append(key)
+        else:
+            values[key] = value
+    if missing:
+        by_kind = defaultdict(dict)
+        for key, kind, value in DimensionValue.objects.filter(pk__in=missing).values_list('id', 'kind', 'value'):
+            values[key] = value
+            by_kind[kind][value] = key
+        for kind, mapping in by_kind.items():
+            _remember(kind, mapping)
+    return values
+
+
+def _fields(row):
+    """The values a query result row holds, whatever its shape."""
+    if isinstance(row, models.Model):
+        return row.__dict__.values()
+    if isinstance(row, dict):
+        return row.values()
+    if isinstance(row, tuple):
+        return row
+    return (row,)
+
+
+def _resolve(rows):
+    """Replace the DimensionKeys in a list of result rows by their strings."""
+    keys = {value for row in rows for value in _fields(row) if type(value) is DimensionKey}
+    if not keys:
+        return rows
+    values = values_for(keys)
+
+    def decode(value):
+        return values.get(value) if type(value) is DimensionKey else value
+
+    resolved = []
+    for row in rows:
+        if isinstance(row, (models.Model, dict)):
+            attributes = row.__dict__ if isinstance(row, models.Model) else row
+            for name, value in attributes.items():
+                if type(value) is DimensionKey:
+                    attributes[name] = values.get(value)
+        elif isinstance(row, tuple):
+            decoded_row = [decode(value) for value in row]
+            row = type(row)._make(decoded_row) if hasattr(row, '_make') else tuple(decoded_row)
+        else:
+            row = decode(row)
+        resolved.append(row)
+    return resolved
+
+
+def decoded(rows, chunk_size=DECODE_CHUNK_SIZE):
+    """
+    Yield query results with their dimension strings, reading ``rows`` in
+    chunks and resolving every key missing from the cache with a single
+    query per chunk instead of one per key.
+    """
+    rows = iter(rows)
+    while True:
+        token = _deferred.set(True)
+        try:
+            chunk = list(islice(rows, chunk_size))
+        finally:
+            _deferred.reset(token)
+        if not chunk:
+            return
+        yield from _resolve(chunk)
+
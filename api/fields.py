@@ -0,0 +1,120 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db import connections, models
+from django.db.models import lookups
+
+
+class DimensionField(models.CharField):
+    """
+    String column stored as an integer key into the DimensionValue lookup
+    table (dictionary encoding).
+
+    Model instances, ``values()`` rows, filters and serializers all see plain
+    strings; the database only stores, indexes and groups by the key.
+    Strings are resolved through the in-process interning cache in
+    ``api.dimensions``: saving inserts unseen values, lookups never do.
+    ``kind`` names the dictionary and defaults to the field name.
+
+    Comparisons (``gt``, ``range``, ...) and text lookups are matched
+    against the strings. Ordering and Min/Max, however, see the keys, which
+    follow first appearance rather than alphabetical order: sort by the
+    string with ``DimensionValue`` or in Python.
+    """
+
+    description = 'Dictionary-encoded string'
+
+    def __init__(self, *args, kind=None, **kwargs):
+        self.kind = kind
+        super().__init__(*args, **kwargs)
+
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        self.kind = self.kind or name
+        super().contribute_to_class(cls, name, *args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['kind'] = self.kind
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        # Column type, index and GROUP BY are those of an integer
+        return 'IntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        from .dimensions import value_for
+        return value_for(self.kind, value)
+
+    def get_prep_value(self, value):
+        # Lookup values: an unknown string maps to key 0, which matches nothing
+        if isinstance(value, str):
+            from .dimensions import key_for
+            return key_for(self.kind, value) or 0
+        return value
+
+    def get_db_prep_save(self, value, connection):
+        if isinstance(value, str):
+            from .dimensions import key_for
+            value = key_for(self.kind, value, create=True)
+        return super().get_db_prep_save(value, connection)
+
+
+class DimensionQuerySet(models.QuerySet):
+    """
+    QuerySet of a model with DimensionFields: results are read in chunks
+    and each chunk's keys missing from the interning cache are resolved
+    with one query (see ``api.dimensions.decoded``), so a cold cache never
+    costs a query per row.
+    """
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            from .dimensions import decoded
+            self._result_cache = list(decoded(self._iterable_class(self)))
+        super()._fetch_all()
+
+    def _iterator(self, use_chunked_fetch, chunk_size):
+        from .dimensions import DECODE_CHUNK_SIZE, decoded
+        yield from decoded(super()._iterator(use_chunked_fetch, chunk_size), chunk_size or DECODE_CHUNK_SIZE)
+
+    async def aiterator(self, chunk_size=2000):
+        # Every chunk is read and decoded on a worker thread
+        if chunk_size <= 0:
+            raise ValueError('Chunk size must be strictly positive.')
+        use_chunked_fetch = not connections[self.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS')
+        rows = self._iterator(use_chunked_fetch, chunk_size)
+        next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+        while chunk := await next_chunk():
+            for row in chunk:
+                yield row
+
+
+class DimensionPatternLookup(lookups.Lookup):
+    """
+    Text or comparison lookup (contains, startswith, gt, range, ...) on a
+    dimension: matched against the dictionary's strings, then applied to the
+    event column as ``key IN (...)``.
+    """
+
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        from .models import DimensionValue
+
+        field = self.lhs.output_field
+        keys = DimensionValue.objects.filter(
+            kind=field.kind, **{f'value__{self.lookup_name}': self.rhs}
+        ).values('id')
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        sub_sql, sub_params = keys.query.get_compiler(connection=connection).as_sql()
+        return f'{lhs_sql} IN ({sub_sql})', (*lhs_params, *sub_params)
+
+
+for _name in ('iexact', 'contains', 'icontains', 'startswith', 'istartswith',
+              'endswith', 'iendswith', 'regex', 'iregex',
+              'gt', 'gte', 'lt', 'lte', 'range'):
+    DimensionField.register_lookup(
+        type(f'Dimension{_name.capitalize()}', (DimensionPatternLookup,), {'lookup_name': _name})
+    )
@@ -0,0 +1,185 @@
+"""
+Funnels: how many visitors went through an ordered list of steps, each
+step an event matching a predicate on event_name, path and the UTM
+fields, all within a conversion window of the visitor's first step.
+
+Funnels are counted per day of entry. For one day, the events matching
+any step from the visitors who performed the first step that day are read
+in (visitor, timestamp) order, up to a window past the end of the day,
+and each visitor's stream goes once through a small state machine. A
+visitor is counted once per day they enter; a range sums its days.
+
+Every day's counts are cached (see ``api.caching``) under the generations
+of the days its events can fall in, so a multi-week funnel recomputes
+only the days that received events since, normally just the newest.
+A report covers at most FUNNEL_MAX_DAYS days of entry; days past the raw
+event retention count nothing and are not queried.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import reduce
+from itertools import groupby
+from operator import itemgetter, or_
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .caching import KEY_PREFIX, get_or_compute, window_generation
+from .models import Event
+from .retention import cutoff
+from .rollups import day_bounds
+
+STEP_FIELDS = ('event_name', 'path', 'utm_source', 'utm_medium', 'utm_campaign')
+MAX_STEPS = 10
+DEFAULT_WINDOW = timedelta(hours=1)
+ITERATOR_CHUNK_SIZE = 5000
+
+
+class Funnel:
+    """An ordered list of step predicates (field -> value) and a conversion window."""
+
+    def __init__(self, steps, window=DEFAULT_WINDOW):
+        self.steps = [dict(step) for step in steps]
+        self.window = window
+        self.fields = [field for field in STEP_FIELDS if any(field in step for step in self.steps)]
+        # Per step, last first: (column position in the row, value) pairs
+        self._predicates = [
+            (index, [(2 + self.fields.index(field), value) for field, value in step.items()])
+            for index, step in reversed(list(enumerate(self.steps)))
+        ]
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        Build the funnel from the ``steps`` (a JSON array of objects) and
+        ``window`` (seconds) query parameters. Raises ValidationError.
+        """
+        try:
+            steps = json.loads(params.get('steps') or '')
+        except ValueError:
+            raise ValidationError({'steps': 'A JSON array of step objects is required.'})
+        if not isinstance(steps, list) or not 2 <= len(steps) <= MAX_STEPS:
+            raise ValidationError({'steps': f'Between 2 and {MAX_STEPS} steps are required.'})
+        for step in steps:
+            if (
+                not isinstance(step, dict) or not step
+                or not set(step) <= set(STEP_FIELDS)
+                or not all(isinstance(value, str) for value in step.values())
+            ):
+                raise ValidationError({
+                    'steps': f"Each step maps some of {', '.join(STEP_FIELDS)} to a string."
+                })
+
+        max_seconds = settings.FUNNEL_MAX_WINDOW_HOURS * 3600
+        try:
+            seconds = int(params.get('window', DEFAULT_WINDOW.total_seconds()))
+        except ValueError:
+            raise ValidationError({'window': 'A whole number of seconds is required.'})
+        # Checked before building the timedelta, which overflows on huge values
+        if not 0 < seconds <= max_seconds:
+            raise ValidationError({'window': f'Must be between 1 and {max_seconds} seconds.'})
+        return cls(steps, timedelta(seconds=seconds))
+
+    @property
+    def key(self):
+        """Stable identifier of the funnel definition, for cache keys."""
+        definition = json.dumps([self.steps, self.window.total_seconds()], sort_keys=True)
+        return hashlib.sha1(definition.encode()).hexdigest()
+
+    def _matches(self, row):
+        """Indexes of the steps an event row matches, last step first."""
+        return [
+            index for index, predicate in self._predicates
+            if all(row[position] == value for position, value in predicate)
+        ]
+
+    def _depth(self, rows, entry_end):
+        """
+        Steps one visitor completed, from their events in timestamp order.
+
+        ``started[i]`` is the latest first-step time of a sequence that has
+        reached step ``i``: the latest start leaves the most of the window
+        for the following steps, so no other sequence can get further.
+        Steps are tried last first so one event never completes two.
+        """
+        started = [None] * len(self.steps)
+        for row in rows:
+            timestamp = row[1]
+            for index in self._matches(row):
+                if index == 0:
+                    if timestamp < entry_end:
+                        started[0] = timestamp
+                elif started[index - 1] is not None and timestamp - started[index - 1] <= self.window:
+                    started[index] = started[index - 1]
+        return sum(1 for start in started if start is not None)
+
+    def count_day(self, day):
+        """Visitors entering on ``day`` that completed each step: a list of counts."""
+        start, end = day_bounds(day)
+        entrants = Event.objects.filter(
+            timestamp__gte=start, timestamp__lt=end, user_id__isnull=False, **self.steps[0]
+        ).values('user_id')
+        rows = (
+            Event.objects
+            .filter(reduce(or_, (Q(**step) for step in self.steps)))
+            .filter(timestamp__gte=start, timestamp__lt=end + self.window, user_id__in=entrants)
+            .order_by('user_id', 'timestamp', 'id')
+            .values_list('user_id', 'timestamp', *self.fields)
+        )
+        counts = [0] * len(self.steps)
+        for _, events in groupby(rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE), key=itemgetter(0)):
+            for index in range(self._depth(events, end)):
+                counts[index] += 1
+        return counts
+
+    def cached_count_day(self, day):
+        """``count_day`` through the analytics cache."""
+        if not settings.ANALYTICS_CACHE_ENABLED:
+            return self.count_day(day)
+        _, end = day_bounds(day)
+        last_day = timezone.localtime(end + self.window - timedelta(microseconds=1)).date()
+        return get_or_compute(
+            f'{KEY_PREFIX}:funnel:{self.key}:{day.isoformat()}',
+            window_generation(day, last_day),
+            lambda: (self.count_day(day), True),
+            timeout=settings.FUNNEL_CACHE_TIMEOUT,
+        )
+
+    def report(self, time_range):
+        """
+        Per-step totals and conversion over the entry days of ``time_range``.
+        Raises ValidationError past FUNNEL_MAX_DAYS days.
+        """
+        if (time_range.end_date - time_range.start_date).days >= settings.FUNNEL_MAX_DAYS:
+            raise ValidationError({'days': f'At most {settings.FUNNEL_MAX_DAYS} days of entry are supported.'})
+        kept_from = cutoff(settings.RETENTION_RAW_DAYS)
+
+        days = []
+        day = time_range.start_date
+        while day <= time_range.end_date:
+            if kept_from is not None and day < kept_from:
+                counts = [0] * len(self.steps)
+            else:
+                counts = self.cached_count_day(day)
+            days.append({'date': day, 'counts': counts})
+            day += timedelta(days=1)
+
+        totals = [sum(counts) for counts in zip(*(d['counts'] for d in days))] or [0] * len(self.steps)
+        results = []
+        for index, (step, count) in enumerate(zip(self.steps, totals)):
+            previous = totals[index - 1] if index else count
+            results.append({
+                'step': index + 1,
+                'filters': step,
+                'visitors': count,
+                'conversion_rate': (count * 100.0) / totals[0] if totals[0] else 0,
+                'step_conversion_rate': (count * 100.0) / previous if previous else 0,
+            })
+        return {
+            'window': int(self.window.total_seconds()),
+            'results': results,
+            'days': days,
+        }
@@ -0,0 +1,191 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Event, TopKSketch
+from .rollups import day_bounds
+from .signals import events_ingested
+from .sketches import worker_shard
+
+# Pageview dimensions tracked per day. Paths carry the page title as a label.
+DIMENSIONS = ('path', 'referrer', 'utm_source', 'utm_campaign', 'country')
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary holding at most ``capacity`` counters.
+
+    Each counter is ``[count, error, label]``: ``count`` never underestimates
+    the true frequency and ``count - error`` never overestimates it. Any
+    value not in a full summary occurred at most ``min_count()`` times.
+    Summaries merge (Agarwal et al., "Mergeable Summaries"), so per-day,
+    per-process summaries combine into one for any date range.
+    """
+
+    def __init__(self, capacity, counters=None):
+        self.capacity = capacity
+        self.counters = {item: list(c) for item, c in (counters or {}).items()}
+
+    def is_full(self):
+        return len(self.counters) >= self.capacity
+
+    def min_count(self):
+        if not self.is_full():
+            return 0
+        return min(c[0] for c in self.counters.values())
+
+    def add(self, item, weight=1, label=None):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif not self.is_full():
+            self.counters[item] = [weight, 0, label]
+            return
+        else:
+            # Evict the smallest counter; the newcomer inherits its count as error
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            counter = self.counters[item] = [floor + weight, floor, None]
+        if label is not None:
+            counter[2] = label
+
+    def merge(self, other):
+        """Return the summary of the union of both streams."""
+        mine, theirs = self.min_count(), other.min_count()
+        combined = {}
+        for item in self.counters.keys() | other.counters.keys():
+            a = self.counters.get(item, [mine, mine, None])
+            b = other.counters.get(item, [theirs, theirs, None])
+            combined[item] = [a[0] + b[0], a[1] + b[1], b[2] or a[2]]
+        capacity = max(self.capacity, other.capacity)
+        top = sorted(combined.items(), key=lambda kv: kv[1][0], reverse=True)[:capacity]
+        return SpaceSaving(capacity, dict(top))
+
+    def top(self, n):
+        """``[(item, count, error, label)]`` for the ``n`` largest counters."""
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(item, count, error, label) for item, (count, error, label) in ranked]
+
+
+def _collect(rows):
+    """
+    Exact per-(day, dimension) counts and latest labels from
+    (timestamp, title, *DIMENSIONS) pageview rows.
+    """
+    counts = defaultdict(Counter)
+    labels = {}
+    totals = Counter()
+    for timestamp, title, *values in rows:
+        day = timezone.localtime(timestamp).date()
+        for dimension, value in zip(DIMENSIONS, values):
+            totals[(day, dimension)] += 1
+            if value:
+                counts[(day, dimension)][value] += 1
+                if dimension == 'path' and title:
+                    labels[value] = title
+    return counts, labels, totals
+
+
+def record_events(events):
+    """Fold freshly inserted pageviews into the per-day heavy-hitter summaries."""
+    counts, labels, totals = _collect(
+        (e.timestamp, e.title, *(getattr(e, d) for d in DIMENSIONS))
+        for e in events if e.event_name == 'pageview'
+    )
+    if not totals:
+        return
+
+    # Merged into this worker's shard rows (see api.sketches.worker_shard)
+    keys = sorted(totals)
+    shard = worker_shard()
+    TopKSketch.objects.bulk_create(
+        [TopKSketch(day=day, dimension=dimension, shard=shard) for day, dimension in keys],
+        ignore_conflicts=True
+    )
+    rows = (
+        TopKSketch.objects.select_for_update()
+        .filter(shard=shard, day__in={day for day, _ in keys}, dimension__in={d for _, d in keys})
+        .order_by('day', 'dimension')
+    )
+    changed = []
+    for row in rows:
+        key = (row.day, row.dimension)
+        if key not in totals:
+            continue
+        summary = SpaceSaving(settings.TOPK_CAPACITY, row.counters)
+        for value, n in counts[key].most_common():
+            summary.add(value, n, labels.get(value) if row.dimension == 'path' else None)
+        row.counters = summary.counters
+        row.total += totals[key]
+        changed.append(row)
+    TopKSketch.objects.bulk_update(changed, ['counters', 'total'])
+
+
+@receiver(events_ingested, dispatch_uid='api.heavy_hitters.record_events')
+def _on_events_ingested(sender, events, **kwargs):
+    record_events(events)
+
+
+def rebuild_day(day):
+    """Recompute the heavy-hitter summaries of one calendar day from raw pageviews."""
+    start, end = day_bounds(day)
+    rows = (
+        Event.objects.filter(timestamp__gte=start, timestamp__lt=end, event_name='pageview')
+        .values_list('timestamp', 'title', *DIMENSIONS)
+        .order_by()
+        .iterator(chunk_size=10000)
+    )
+    counts, labels, totals = _collect(rows)
+
+    sketches = []
+    for (d, dimension), total in totals.items():
+        # Exact counts truncated to the top ``capacity`` values form a valid
+        # summary: every dropped value is bounded by the smallest kept count
+        top = counts[(d, dimension)].most_common(settings.TOPK_CAPACITY)
+        counters = {
+            value: [n, 0, labels.get(value) if dimension == 'path' else None]
+            for value, n in top
+        }
+        sketches.append(TopKSketch(day=d, dimension=dimension, total=total, counters=counters))
+
+    with transaction.atomic():
+        TopKSketch.objects.filter(day=day).delete()
+        TopKSketch.objects.bulk_create(sketches)
+
+
+def top_values(dimension, start_date, limit, end_date=None):
+    """
+    Approximate top ``limit`` values of ``dimension`` among pageviews over
+    [start_date, end_date], merged from the per-day, per-shard summaries.
+
+    Returns ``(rows, total, max_error)`` where rows are dicts with ``value``,
+    ``count`` (an upper bound), ``error`` (count minus error is a lower bound)
+    and ``label``; ``max_error`` bounds the count of any value not listed.
+    """
+    end_date = end_date or timezone.localdate()
+    summary = SpaceSaving(settings.TOPK_CAPACITY)
+    total = 0
+    for counters, day_total in TopKSketch.objects.filter(
+        dimension=dimension, day__gte=start_date, day__lte=end_date
+    ).values_list('counters', 'total'):
+        summary = summary.merge(SpaceSaving(settings.TOPK_CAPACITY, counters))
+        total += day_total
+
+    rows = [
+        {'value': value, 'count': count, 'error': error, 'label': label}
+        for value, count, error, label in summary.top(limit)
+    ]
+    return rows, total, summary.min_count()
+
+
+def fold_day(day):
+    """
+    Summarize one day's raw pageviews before the raw rows are deleted, if
+    the day has no summaries yet. Summaries cannot tell which pageviews
+    they have seen, so days summarized at ingest are left as they are.
+    """
+    if not TopKSketch.objects.filter(day=day).exists():
+        rebuild_day(day)
@@ -0,0 +1,53 @@
+from django.db import transaction
+from rest_framework import status
+
+from .dimensions import interned
+from .models import Event
+from .serializers import validate_event
+from .signals import events_ingested
+
+
+def store_events(events):
+    """
+    Persist a list of validated, unsaved Event instances with a single
+    multi-row INSERT and return them with primary keys populated.
+
+    Derived data (rollups etc.) is updated by ``events_ingested`` receivers
+    in the same transaction, so it never disagrees with the raw table.
+    """
+    if not events:
+        return []
+    # Dimension strings are resolved to dictionary keys in bulk up front
+    with transaction.atomic(), interned(events):
+        events = Event.objects.bulk_create(events)
+        events_ingested.send(sender=Event, events=events)
+    return events
+
+
+def validate_batch(items, accepted_status):
+    """
+    Validate raw event dicts one by one without touching the database.
+
+    Returns ``(results, pending)``: one status entry per item, in order, and
+    ``(result, event)`` pairs of the unsaved Events for the valid items, whose
+    result entries carry ``accepted_status``.
+    """
+    results = []
+    pending = []
+    for item in items:
+        validated, errors = validate_event(item)
+        if not errors:
+            results.append({'status': accepted_status})
+            pending.append((results[-1], Event(**validated)))
+        else:
+            results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': errors})
+    return results, pending
+
+
+def batch_status(accepted, rejected, accepted_status):
+    """Overall status of a batch: all accepted, some accepted (207) or none (400)."""
+    if not rejected:
+        return accepted_status
+    if accepted:
+        return status.HTTP_207_MULTI_STATUS
+    return status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,297 @@
+"""
+In-memory live counters: active visitors, pageviews per minute and top
+paths over the last few minutes, fed by the track endpoints as events
+arrive and read by the live endpoints without touching the database.
+
+Each process keeps one bucket per minute of arrival time holding the event
+and pageview counts, a HyperLogLog of the visitors and a Space-Saving
+summary of the paths. Both summaries merge, so with LIVE_COUNTERS_SHARED
+every process publishes its buckets to the analytics cache and a snapshot
+merges the buckets of all of them.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .heavy_hitters import SpaceSaving
+from .sketches import HyperLogLog
+
+# Visitors seen within this many minutes count as active
+ACTIVE_MINUTES = 5
+# Minutes of history kept, and the windows top paths are reported over
+WINDOW_MINUTES = 30
+TOP_PATH_WINDOWS = (5, 30)
+
+# Counters per minute bucket in the top paths summaries
+PATHS_CAPACITY = 100
+
+# Shared mode: processes claim one of these slots in the cache and publish
+# their buckets under it
+MAX_PROCESSES = 64
+KEY_PREFIX = 'live'
+
+logger = logging.getLogger(__name__)
+
+
+def _cache():
+    return caches[settings.ANALYTICS_CACHE_ALIAS]
+
+
+class Bucket:
+    """Counters of the events that arrived within one minute."""
+
+    def __init__(self, events=0, pageviews=0, visitors=None, paths=None):
+        self.events = events
+        self.pageviews = pageviews
+        self.visitors = HyperLogLog(visitors)
+        self.paths = SpaceSaving(PATHS_CAPACITY, paths)
+
+    def add(self, event):
+        self.events += 1
+        if event.user_id:
+            self.visitors.add(event.user_id)
+        if event.event_name == 'pageview':
+            self.pageviews += 1
+            if event.path:
+                self.paths.add(event.path, label=event.title or None)
+
+    def dump(self, visitors=True):
+        """Picklable state; the 4 KB visitor registers only when asked for."""
+        return (
+            self.events,
+            self.pageviews,
+            bytes(self.visitors) if visitors else None,
+            self.paths.counters,
+        )
+
+
+class LiveCounters:
+    """
+    Sliding window of per-minute Buckets for this process.
+
+    ``record`` is O(1) per event under a lock; ``snapshot`` merges at most
+    WINDOW_MINUTES buckets (per process in shared mode) and is reused for
+    LIVE_PUSH_INTERVAL seconds, so any number of watchers costs one merge
+    per interval.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_at = 0
+        self._snapshot_lock = threading.Lock()
+        self._dirty = False
+        self._slot = None
+        self._token = None
+        self._publisher = None
+
+    def record(self, events, now=None):
+        """Count freshly accepted events in the bucket of the current minute."""
+        if not events:
+            return
+        minute = int((now or time.time()) // 60)
+        with self._lock:
+            bucket = self._buckets.get(minute)
+            if bucket is None:
+                bucket = self._buckets[minute] = Bucket()
+                self._prune(minute)
+            for event in events:
+                bucket.add(event)
+            self._dirty = True
+        if settings.LIVE_COUNTERS_SHARED:
+            self._ensure_publishing()
+
+    def _prune(self, minute):
+        for old in [m for m in self._buckets if m <= minute - WINDOW_MINUTES]:
+            del self._buckets[old]
+
+    def _dump(self, minute):
+        """This process's buckets, with visitor sketches for the active window only."""
+        with self._lock:
+            self._prune(minute)
+            return {
+                m: bucket.dump(visitors=m > minute - ACTIVE_MINUTES)
+                for m, bucket in self._buckets.items()
+            }
+
+    def snapshot(self, now=None):
+        """The counters over the window ending at ``now``, as a JSON-ready dict."""
+        now = now or time.time()
+        with self._snapshot_lock:
+            if self._snapshot is None or now - self._snapshot_at >= settings.LIVE_PUSH_INTERVAL:
+                minute = int(now // 60)
+                if settings.LIVE_COUNTERS_SHARED:
+                    dumps = self._published_dumps(minute)
+                else:
+                    dumps = [self._dump(minute)]
+                self._snapshot = _merge(dumps, minute, now)
+                self._snapshot_at = now
+            return self._snapshot
+
+    # Shared mode
+
+    def _ensure_publishing(self):
+        if self._publisher is None or not self._publisher.is_alive():
+            with self._lock:
+                if self._publisher is None or not self._publisher.is_alive():
+                    self._publisher = threading.Thread(
+                        target=self._publish_forever, name='live-counters-publisher', daemon=True
+                    )
+                    self._publisher.start()
+
+    def _publish_forever(self):
+        # Drawn here rather than at import, so forked workers never share a slot
+        self._token = uuid.uuid4().hex
+        self._slot = None
+        while True:
+            try:
+                self.publish()
+            except Exception:
+                # Best effort: the next tick publishes everything again
+                logger.exception('Publishing live counters failed')
+            time.sleep(settings.LIVE_PUSH_INTERVAL)
+
+    def _claim_slot(self, cache, timeout):
+        if self._slot is not None and cache.get(_slot_key(self._slot)) == self._token:
+            cache.touch(_slot_key(self._slot), timeout)
+            return self._slot
+        self._slot = None
+        for slot in range(MAX_PROCESSES):
+            if cache.add(_slot_key(slot), self._token, timeout=timeout):
+                self._slot = slot
+                self._dirty = True
+                return slot
+        return None
+
+    def publish(self, now=None):
+        """Write this process's buckets to its slot in the shared cache."""
+        cache = _cache()
+        # A slot outlives a few missed publications, not a dead process
+        timeout = max(int(settings.LIVE_PUSH_INTERVAL * 5), 5)
+        slot = self._claim_slot(cache, timeout)
+        if slot is None:
+            return
+        if not self._dirty:
+            cache.touch(_data_key(slot), timeout)
+            return
+        self._dirty = False
+        cache.set(_data_key(slot), self._dump(int((now or time.time()) // 60)), timeout=timeout)
+
+    def _published_dumps(self, minute):
+        cache = _cache()
+        published = cache.get_many([_data_key(slot) for slot in range(MAX_PROCESSES)])
+        # Our own buckets are always current, published or not
+        if self._slot is not None:
+            published.pop(_data_key(self._slot), None)
+        return [*published.values(), self._dump(minute)]
+
+
+def _slot_key(slot):
+    return f'{KEY_PREFIX}:slot:{slot}'
+
+
+def _data_key(slot):
+    return f'{KEY_PREFIX}:data:{slot}'
+
+
+def _merge(dumps, minute, now):
+    """Combine per-process bucket dumps into the live counters payload."""
+    buckets = {}
+    for dump in dumps:
+        for m, state in dump.items():
+            if m <= minute - WINDOW_MINUTES or m > minute:
+                continue
+            bucket = Bucket(*state)
+            other = buckets.get(m)
+            if other is not None:
+                bucket.events += other.events
+                bucket.pageviews += other.pageviews
+                bucket.visitors.update(other.visitors)
+                bucket.paths = bucket.paths.merge(other.paths)
+            buckets[m] = bucket
+
+    active = [b.visitors for m, b in buckets.items() if m > minute - ACTIVE_MINUTES]
+    top_paths = {}
+    for window in TOP_PATH_WINDOWS:
+        summary = SpaceSaving(PATHS_CAPACITY)
+        for m, bucket in buckets.items():
+            if m > minute - window:
+                summary = summary.merge(bucket.paths)
+        top_paths[f'{window}m'] = [
+            {'path': path, 'title': label, 'views': count, 'error': error}
+            for path, count, error, label in summary.top(settings.LIVE_TOP_PATHS)
+        ]
+
+    per_minute = []
+    for m in range(minute - WINDOW_MINUTES + 1, minute + 1):
+        bucket = buckets.get(m)
+        per_minute.append({
+            'minute': _minute_start(m),
+            'events': bucket.events if bucket else 0,
+            'pageviews': bucket.pageviews if bucket else 0,
+        })
+
+    return {
+        'generated_at': datetime.fromtimestamp(now, dt_timezone.utc).isoformat(),
+        'active_visitors': HyperLogLog.union(active).count(),
+        'active_minutes': ACTIVE_MINUTES,
+        'pageviews_per_minute': per_minute,
+        'top_paths': top_paths,
+    }
+
+
+def _minute_start(minute):
+    return datetime.fromtimestamp(minute * 60, dt_timezone.utc).isoformat()
+
+
+_counters = LiveCounters()
+
+
+def record(events):
+    """Feed accepted events to this process's live counters."""
+    _counters.record(events)
+
+
+def snapshot():
+    """Current live counters of this process (or of all, when shared)."""
+    return _counters.snapshot()
+
+
+def _sse_message(data):
+    return f'event: counters\ndata: {json.dumps(data)}\n\n'
+
+
+def stream():
+    """
+    Server-Sent Events carrying a snapshot every LIVE_PUSH_INTERVAL seconds
+    for LIVE_STREAM_SECONDS; the client's EventSource then reconnects.
+    Blocks a thread per watcher: under ASGI use ``astream``.
+    """
+    deadline = time.monotonic() + settings.LIVE_STREAM_SECONDS
+    yield f'retry: {int(settings.LIVE_PUSH_INTERVAL * 1000)}\n\n'
+    while True:
+        yield _sse_message(snapshot())
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(settings.LIVE_PUSH_INTERVAL)
+
+
+async def astream():
+    """``stream`` for async views: watchers wait on the event loop, not on threads."""
+    deadline = time.monotonic() + settings.LIVE_STREAM_SECONDS
+    yield f'retry: {int(settings.LIVE_PUSH_INTERVAL * 1000)}\n\n'
+    while True:
+        # Shared snapshots read the cache, so never on the loop itself
+        yield _sse_message(await sync_to_async(snapshot, thread_sensitive=False)())
+        if time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(settings.LIVE_PUSH_INTERVAL)
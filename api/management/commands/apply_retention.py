@@ -0,0 +1,73 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api import retention
+from api.caching import invalidate_days, local_cache_warning
+
+class Command(BaseCommand):
+    help = 'Fold expiring raw events into the daily aggregates, then delete them and expired aggregates in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-days', type=int, help='Days of raw events to keep (default: RETENTION_RAW_DAYS)')
+        parser.add_argument('--hourly-days', type=int, help='Days of hourly rollups to keep (default: RETENTION_HOURLY_DAYS)')
+        parser.add_argument('--aggregate-days', type=int,
+                            help='Days of daily rollups, sketches and sessions to keep (default: RETENTION_AGGREGATE_DAYS)')
+        parser.add_argument('--batch-size', type=int, help='Primary keys per DELETE (default: RETENTION_BATCH_SIZE)')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between DELETE batches')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the raw event days and aggregate rows that would be removed')
+        parser.add_argument('--follow', type=int, metavar='SECONDS', help='Keep running, applying the policy every SECONDS')
+
+    def handle(self, *args, **options):
+        days = {
+            tier: options[f'{tier}_days'] if options[f'{tier}_days'] is not None else getattr(settings, f'RETENTION_{tier.upper()}_DAYS')
+            for tier in ('raw', 'hourly', 'aggregate')
+        }
+        if any(d is not None and d < 1 for d in days.values()):
+            raise CommandError("Retention periods must be at least one day")
+        for tier in ('hourly', 'aggregate'):
+            if days[tier] is not None and (days['raw'] is None or days[tier] < days['raw']):
+                raise CommandError(f"--{tier}-days must not be shorter than --raw-days")
+        if all(d is None for d in days.values()):
+            self.stdout.write("No retention configured; keeping everything.")
+            return
+
+        if not options['dry_run']:
+            warning = local_cache_warning()
+            if warning:
+                self.stderr.write(self.style.WARNING(warning))
+
+        while True:
+            self._apply(days, options)
+            if not options['follow']:
+                return
+            time.sleep(options['follow'])
+
+    def _apply(self, days, options):
+        batch = {'batch_size': options['batch_size'], 'pause': options['pause']}
+        raw_from = retention.cutoff(days['raw'])
+        hourly_from = retention.cutoff(days['hourly'])
+        aggregate_from = retention.cutoff(days['aggregate'])
+        expiring = retention.expiring_days(raw_from) if raw_from is not None else []
+        if options['dry_run']:
+            if raw_from is not None:
+                self.stdout.write(f"Would fold and delete raw events of {len(expiring)} days before {raw_from}")
+            for queryset in retention.expired_aggregates(hourly_from, aggregate_from):
+                self.stdout.write(f"Would delete {queryset.count()} expired {queryset.model.__name__} rows")
+            return
+
+        if raw_from is not None:
+            total = 0
+            for day in expiring:
+                # Days past the aggregate retention are not worth folding
+                fold = aggregate_from is None or day >= aggregate_from
+                folded, deleted = retention.expire_raw_day(day, fold=fold, **batch)
+                total += deleted
+                self.stdout.write(f"{day}: folded {folded} missing events, deleted {deleted} raw events")
+            # Results read from raw events (exact visitors, top pages) change
+            invalidate_days(expiring)
+            self.stdout.write(self.style.SUCCESS(f"Deleted {total} raw events before {raw_from}"))
+
+        deleted = retention.expire_aggregates(hourly_from, aggregate_from, **batch)
+        for name, count in deleted.items():
+            self.stdout.write(f"Deleted {count} expired {name} rows")
@@ -0,0 +1,110 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+from api import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Measure throughput and p50/p95/p99 latency of the ingest and analytics endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Requests per benchmark')
+        parser.add_argument('--concurrency', type=int, default=1, help='Requests in flight at once')
+        parser.add_argument('--days', type=int, default=30, help='days parameter of the analytics requests')
+        parser.add_argument('--batch-size', type=int, default=100, help='Events per track_batch request; the serialization benchmark uses requests x batch size events')
+        parser.add_argument('--only', type=str, help='Comma-separated benchmarks to run (default: all)')
+        parser.add_argument('--skip-ingest', action='store_true', help='Do not run the ingest benchmarks, which write events')
+        parser.add_argument('--cache', action='store_true', help='Leave the analytics result cache on (in-process runs)')
+        parser.add_argument('--base-url', type=str, help='Benchmark a running server, e.g. http://localhost:8000, instead of in process')
+        parser.add_argument('--label', type=str, default='', help='Free-form name stored with the results')
+        parser.add_argument('--output', type=str, help='Results file (default: benchmarks/<time>-<commit>.json)')
+        parser.add_argument('--compare', type=str, metavar='FILE', help='Print the change against an earlier results file')
+
+    def handle(self, *args, **options):
+        names = list(benchmark.INGEST_BENCHMARKS) + list(benchmark.ANALYTICS_BENCHMARKS)
+        if options['skip_ingest']:
+            names = list(benchmark.ANALYTICS_BENCHMARKS)
+        if not options['base_url']:
+            names.append(benchmark.SERIALIZATION_BENCHMARK)
+        if options['only']:
+            names = options['only'].split(',')
+            known = benchmark.INGEST_BENCHMARKS + tuple(benchmark.ANALYTICS_BENCHMARKS) + (benchmark.SERIALIZATION_BENCHMARK,)
+            unknown = [n for n in names if n not in known]
+            if unknown:
+                raise CommandError(f"Unknown benchmarks: {', '.join(unknown)}")
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        if options['base_url']:
+            transport = benchmark.HTTPTransport(options['base_url'])
+            overrides = {}
+        else:
+            transport = benchmark.InProcessTransport()
+            # Measure the queries, not cache hits
+            overrides = {} if options['cache'] else {'ANALYTICS_CACHE_ENABLED': False}
+
+        recorded = {
+            key: options[key]
+            for key in ('requests', 'concurrency', 'days', 'batch_size', 'cache', 'base_url')
+        }
+        results = benchmark.metadata(options['label'], recorded)
+        results['results'] = {}
+
+        with override_settings(**overrides):
+            for i, name in enumerate(names):
+                if name == benchmark.SERIALIZATION_BENCHMARK:
+                    result = benchmark.bench_serialization(options['requests'] * options['batch_size'], seed=i)
+                elif name in benchmark.INGEST_BENCHMARKS:
+                    result = benchmark.bench_ingest(
+                        transport, name, options['requests'], options['concurrency'],
+                        options['batch_size'], seed=i
+                    )
+                else:
+                    result = benchmark.bench_endpoint(
+                        transport, name, options['requests'], options['concurrency'], options['days']
+                    )
+                results['results'][name] = result
+                self._report(name, result)
+
+        output = options['output'] or os.path.join(
+            'benchmarks',
+            f"{timezone.now():%Y%m%d-%H%M%S}-{results['commit'] or 'nocommit'}.json"
+        )
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if baseline:
+            self.stdout.write(f"Change against {options['compare']} ({baseline.get('commit')}):")
+            for name, metric, before, after, change in benchmark.compare(baseline, results):
+                self.stdout.write(f"  {name:<16} {metric:<4} {before:>10} -> {after:>10}  {change:+.1f}%")
+
+    def _report(self, name, result):
+        if name == benchmark.SERIALIZATION_BENCHMARK:
+            for stage in ('validate', 'represent', 'render'):
+                numbers = result[stage]
+                self.stdout.write(
+                    f"{name + ' ' + stage:<24} {numbers['serializer_events_per_cpu_s']:>10} -> "
+                    f"{numbers['fast_events_per_cpu_s']:>10} events/CPU s  x{numbers['speedup']}"
+                )
+            return
+        latency = result['latency_ms']
+        line = (
+            f"{name:<16} {result['throughput_rps']:>8} req/s  "
+            f"p50 {latency['p50']:>8} ms  p95 {latency['p95']:>8} ms  p99 {latency['p99']:>8} ms"
+        )
+        if 'events_per_s' in result:
+            line += f"  {result['events_per_s']} events/s"
+        if result['errors']:
+            line += f"  {result['errors']} errors"
+            self.stdout.write(self.style.WARNING(line))
+        else:
+            self.stdout.write(line)
@@ -0,0 +1,217 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from api.models import Event
+
+# Same layout as events_data.csv so exports can be re-imported
+DEFAULT_COLUMNS = [
+    'event_name', 'received_at', 'timestamp', 'url', 'path', 'referrer', 'title',
+    'utm_source', 'utm_medium', 'utm_campaign', 'country', 'region',
+]
+
+
+class SplitCSVWriter:
+    """
+    CSV writer that starts a new numbered file (with its own header) once the
+    current one reaches ``max_bytes`` on disk, optionally gzip-compressed.
+    ``on_close`` is called with the path of every completed file.
+
+    Numbered files (``max_bytes`` or ``numbered``) count up from
+    ``first_number`` and are never overwritten. ``checkpoint()`` makes the
+    rows written so far durable, ending the current gzip member so the file
+    is valid up to the returned size; ``resume()`` reopens a file cut short
+    after a checkpoint and appends to it.
+    """
+
+    def __init__(self, output, header, compress=False, max_bytes=None, on_close=None,
+                 numbered=False, first_number=1):
+        self.output = output
+        self.header = header
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.on_close = on_close
+        self.numbered = numbered or bool(max_bytes)
+        self.number = first_number
+        self.paths = []
+        self._raw = None
+        self._text = None
+        self._writer = None
+
+    def _path(self, number):
+        path = self.output
+        if self.numbered:
+            base, ext = os.path.splitext(path)
+            path = f"{base}-{number:04d}{ext}"
+        if self.compress and not path.endswith('.gz'):
+            path += '.gz'
+        return path
+
+    def _open(self):
+        path = self._path(self.number)
+        self._raw = open(path, 'xb' if self.numbered else 'wb')
+        self.number += 1
+        self.paths.append(path)
+        self._start()
+        self._writer.writerow(self.header)
+
+    def _start(self):
+        stream = gzip.GzipFile(fileobj=self._raw, mode='wb') if self.compress else self._raw
+        self._text = io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+        self._writer = csv.writer(self._text)
+
+    def _end(self):
+        stream = self._text.detach()
+        if self.compress:
+            # Writes the member's trailer; the file itself stays open
+            stream.close()
+        self._text = self._writer = None
+
+    def resume(self, path, size):
+        """Continue ``path`` from its first ``size`` bytes, dropping anything after them."""
+        self._raw = open(path, 'r+b')
+        self._raw.truncate(size)
+        self._raw.seek(size)
+        self.paths.append(path)
+
+    def writerow(self, row):
+        if self._raw is None:
+            self._open()
+        elif self._writer is None:
+            self._start()
+        self._writer.writerow(row)
+        if self.max_bytes and self._raw.tell() >= self.max_bytes:
+            self.close()
+
+    def checkpoint(self):
+        """Flush the open file to disk; returns its (path, size), or None between files."""
+        if self._raw is None:
+            return None
+        if self._writer is not None:
+            self._end()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        return self.paths[-1], self._raw.tell()
+
+    def close(self):
+        if self._raw is None:
+            return
+        if self._writer is not None:
+            self._end()
+        self._raw.close()
+        self._raw = None
+        if self.on_close:
+            self.on_close(self.paths[-1])
+
+
+class Command(BaseCommand):
+    help = 'Stream events to CSV in constant memory, optionally gzipped, split and incremental'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='events_data.csv', help='Output file (numbered when --max-bytes or --state is set)')
+        parser.add_argument('--start', type=str, help='Export events at or after this timestamp (ISO 8601)')
+        parser.add_argument('--end', type=str, help='Export events before this timestamp (ISO 8601)')
+        parser.add_argument('--columns', type=str, help=f"Comma-separated columns (default: {','.join(DEFAULT_COLUMNS)})")
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output files')
+        parser.add_argument('--max-bytes', type=int, help='Start a new file once the current one reaches this size')
+        parser.add_argument('--state', type=str, help='JSON file recording the last exported event; the next run resumes after it')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched per round trip from the server-side cursor')
+
+    def handle(self, *args, **options):
+        columns = options['columns'].split(',') if options['columns'] else DEFAULT_COLUMNS
+        known = {f.name for f in Event._meta.concrete_fields}
+        unknown = [c for c in columns if c not in known]
+        if unknown:
+            raise CommandError(f"Unknown columns: {', '.join(unknown)}")
+
+        # Keyset order (timestamp, id) lets an interrupted or nightly run
+        # continue exactly after the last row it wrote.
+        queryset = Event.objects.order_by('timestamp', 'id')
+        if options['start']:
+            queryset = queryset.filter(timestamp__gte=self._parse_timestamp(options['start']))
+        if options['end']:
+            queryset = queryset.filter(timestamp__lt=self._parse_timestamp(options['end']))
+
+        state_file = options['state']
+        state = {}
+        if state_file and os.path.exists(state_file):
+            with open(state_file) as f:
+                state = json.load(f)
+            last_timestamp = parse_datetime(state['timestamp'])
+            queryset = queryset.filter(
+                Q(timestamp__gt=last_timestamp) | Q(timestamp=last_timestamp, id__gt=state['id'])
+            )
+            self.stdout.write(f"Resuming after event {state['id']} ({state['timestamp']})")
+        previous_files = state.get('files', [])
+
+        last = {}
+
+        def save_state(open_file=None):
+            """Record the last exported event and the files written, the last one possibly still open."""
+            if not (state_file and last):
+                return
+            files = previous_files + [path for path in writer.paths if path not in previous_files]
+            with open(state_file + '.tmp', 'w') as f:
+                json.dump({**last, 'files': files, 'open_size': open_file[1] if open_file else None}, f)
+            os.replace(state_file + '.tmp', state_file)
+
+        def file_closed(path):
+            self.stdout.write(f"Wrote {path}")
+            save_state()
+
+        # Incremental runs number their files so that one never overwrites another
+        writer = SplitCSVWriter(
+            options['output'], columns,
+            compress=options['gzip'], max_bytes=options['max_bytes'], on_close=file_closed,
+            numbered=bool(state_file), first_number=len(previous_files) + 1,
+        )
+        if state.get('open_size') is not None and previous_files:
+            # An interrupted run: drop whatever it wrote after its last checkpoint
+            writer.resume(previous_files[-1], state['open_size'])
+
+        datetime_columns = {
+            i for i, c in enumerate(columns)
+            if Event._meta.get_field(c).get_internal_type() == 'DateTimeField'
+        }
+
+        started = time.monotonic()
+        rows_exported = 0
+        # iterator() streams through a server-side cursor on PostgreSQL
+        rows = queryset.values_list('id', 'timestamp', *columns).iterator(chunk_size=options['chunk_size'])
+        try:
+            for event_id, event_timestamp, *values in rows:
+                for i in datetime_columns:
+                    if values[i] is not None:
+                        values[i] = timezone.localtime(values[i]).strftime('%Y-%m-%d %H:%M:%S')
+                last = {'id': event_id, 'timestamp': event_timestamp.isoformat()}
+                writer.writerow(values)
+                rows_exported += 1
+                if rows_exported % options['chunk_size'] == 0:
+                    save_state(writer.checkpoint())
+        except FileExistsError as exc:
+            raise CommandError(f"{exc.filename} already exists; remove it or choose another --output")
+        finally:
+            writer.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully exported {rows_exported} rows to {len(writer.paths)} file(s) in {elapsed:.1f}s"
+        ))
+
+    def _parse_timestamp(self, value):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            try:
+                parsed = datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time.min)
+            except ValueError:
+                raise CommandError(f"Invalid timestamp: {value}")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
@@ -0,0 +1,104 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from api.caching import local_cache_warning
+from api.ingest import store_events
+from api.models import Event
+from api.synthetic import EventGenerator
+
+# Same layout as import_sample_data reads, plus the visitor id
+CSV_COLUMNS = [
+    'event_name', 'received_at', 'timestamp', 'url', 'path', 'referrer', 'title',
+    'utm_source', 'utm_medium', 'utm_campaign', 'country', 'region', 'user_id',
+]
+
+
+def generate(count, seed, generator_options, batch_size, csv_file=None):
+    """
+    Worker entry point: store ``count`` synthetic events through the ingest
+    path in batches (or write them to ``csv_file``). Returns the count.
+    """
+    events = EventGenerator(seed=seed, **generator_options).events(count)
+    if csv_file:
+        with open(csv_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for event in events:
+                payload = EventGenerator.payload(event)
+                writer.writerow([payload.get(column, '') for column in CSV_COLUMNS])
+        return count
+
+    batch = []
+    for event in events:
+        batch.append(Event(**event))
+        if len(batch) >= batch_size:
+            store_events(batch)
+            batch = []
+    store_events(batch)
+    return count
+
+
+class Command(BaseCommand):
+    help = 'Generate realistic synthetic events (Zipfian pages, visits, UTM and country mixes) for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10000, help='Number of events to generate')
+        parser.add_argument('--days', type=int, default=30, help='Spread the events over this many days up to today')
+        parser.add_argument('--users', type=int, help='Distinct visitors (default: one per 20 events)')
+        parser.add_argument('--paths', type=int, default=500, help='Distinct page paths')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same events')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Events per bulk INSERT and transaction')
+        parser.add_argument('--workers', type=int, default=1, help='Generate in this many parallel processes')
+        parser.add_argument('--csv', type=str, metavar='FILE',
+                            help='Write CSV for import_sample_data instead of the database; '
+                                 'with several workers one FILE-<n>.csv per worker')
+
+    def handle(self, *args, **options):
+        total = options['events']
+        workers = max(1, min(options['workers'], total))
+        if total < 1:
+            raise CommandError("--events must be positive")
+        generator_options = {
+            'days': options['days'],
+            'users': options['users'] or max(total // 20, 1),
+            'paths': options['paths'],
+        }
+
+        # Each worker gets its own seed and share of the events
+        shares = [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+        csv_files = [None] * workers
+        if options['csv']:
+            base, ext = os.path.splitext(options['csv'])
+            csv_files = [options['csv']] if workers == 1 else [f"{base}-{i}{ext or '.csv'}" for i in range(workers)]
+        else:
+            warning = local_cache_warning()
+            if warning:
+                self.stderr.write(self.style.WARNING(warning))
+        jobs = [
+            (shares[i], options['seed'] * 1000 + i, generator_options, options['batch_size'], csv_files[i])
+            for i in range(workers)
+        ]
+
+        target = ', '.join(csv_files) if options['csv'] else 'the database'
+        self.stdout.write(f"Generating {total} events over {options['days']} days into {target}...")
+        started = time.monotonic()
+
+        if workers > 1:
+            # Children must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                created = sum(pool.map(generate, *zip(*jobs)))
+        else:
+            created = generate(*jobs[0])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {created} events in {elapsed:.1f}s, "
+            f"{created / elapsed if elapsed else 0:.0f} events/s"
+        ))
+        if not options['csv']:
+            self.stdout.write("Run `manage.py sessionize` to build sessions for the new events.")
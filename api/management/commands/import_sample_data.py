@@ -1,64 +1,210 @@
 import os
 import csv
+import json
+import time
 import datetime
-from django.core.management.base import BaseCommand
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, OperationalError, connections
+from django.utils import timezone
+from api.caching import local_cache_warning
+from api.ingest import store_events
 from api.models import Event
 
+MAX_ERROR_SAMPLES = 5
+
+
+def parse_timestamp(value):
+    """Parse 'YYYY-MM-DD HH:MM:SS' (or any ISO 8601 form) into an aware datetime."""
+    # fromisoformat is implemented in C and much faster than strptime
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def row_to_event(row):
+    return Event(
+        event_name=row.get('event_name', ''),
+        timestamp=parse_timestamp(row.get('timestamp', '')),
+        received_at=parse_timestamp(row.get('received_at', '')),
+        url=row.get('url', ''),
+        path=row.get('path', ''),
+        referrer=row.get('referrer', None) or None,  # Convert empty strings to None
+        title=row.get('title', None) or None,
+        utm_source=row.get('utm_source', None) or None,
+        utm_medium=row.get('utm_medium', None) or None,
+        utm_campaign=row.get('utm_campaign', None) or None,
+        country=row.get('country', None) or None,
+        region=row.get('region', None) or None,
+        user_id=row.get('user_id', None) or None,
+    )
+
+
+class FileImport:
+    """
+    Loads one CSV file in batches of ``batch_size`` rows, each batch inserted
+    with a single bulk INSERT in its own transaction. With ``resume`` the
+    number of committed rows is kept in ``<csv_file>.checkpoint`` so an
+    interrupted import continues after the last committed batch.
+
+    Rows the database rejects are counted as errors; losing the connection
+    (OperationalError) aborts the import without moving the checkpoint past
+    the rows that were not stored.
+    """
+
+    def __init__(self, csv_file, batch_size, resume):
+        self.csv_file = csv_file
+        self.batch_size = batch_size
+        self.checkpoint_file = f"{csv_file}.checkpoint" if resume else None
+        self.created = 0
+        self.errors = 0
+        self.skipped = 0
+        self.error_samples = []
+
+    def _record_error(self, line, error):
+        self.errors += 1
+        if len(self.error_samples) < MAX_ERROR_SAMPLES:
+            self.error_samples.append(f"line {line}: {error}")
+
+    def _load_checkpoint(self):
+        if self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file) as f:
+                return json.load(f)['rows']
+        return 0
+
+    def _save_checkpoint(self, rows):
+        if self.checkpoint_file:
+            with open(self.checkpoint_file + '.tmp', 'w') as f:
+                json.dump({'rows': rows}, f)
+            os.replace(self.checkpoint_file + '.tmp', self.checkpoint_file)
+
+    def _flush(self, batch):
+        events = [event for _, event in batch]
+        try:
+            store_events(events)
+            self.created += len(events)
+        except OperationalError:
+            raise
+        except DatabaseError:
+            # Isolate the offending rows instead of losing the whole batch
+            for line, event in batch:
+                event.pk = None
+                try:
+                    store_events([event])
+                    self.created += 1
+                except OperationalError:
+                    # The rows before this one are stored or counted as errors
+                    self._save_checkpoint(line - 2)
+                    raise
+                except DatabaseError as e:
+                    self._record_error(line, e)
+
+    def run(self):
+        done = self._load_checkpoint()
+        self.skipped = done
+        rows = done
+        batch = []
+
+        with open(self.csv_file, 'r', newline='') as file:
+            reader = csv.DictReader(file)
+            for line, row in enumerate(reader, start=2):
+                if line - 2 < done:
+                    continue
+                rows += 1
+                try:
+                    batch.append((line, row_to_event(row)))
+                except Exception as e:
+                    self._record_error(line, e)
+
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+                    self._save_checkpoint(rows)
+
+            self._flush(batch)
+
+        if self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+        return self
+
+
+def import_file(csv_file, batch_size, resume):
+    """Worker entry point: import one file and return its FileImport summary."""
+    started = time.monotonic()
+    result = FileImport(csv_file, batch_size, resume).run()
+    result.elapsed = time.monotonic() - started
+    return result
+
+
 class Command(BaseCommand):
-    help = 'Import sample events data from a CSV file'
+    help = 'Bulk import events data from one or more CSV files'
 
     def add_arguments(self, parser):
-        parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+        parser.add_argument('csv_file', type=str, nargs='+', help='Path to the CSV file(s)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT and transaction')
+        parser.add_argument('--workers', type=int, default=1, help='Load this many files in parallel processes')
+        parser.add_argument('--resume', action='store_true', help='Checkpoint progress and continue an interrupted import')
 
     def handle(self, *args, **options):
-        csv_file = options['csv_file']
-        
-        if not os.path.exists(csv_file):
-            self.stdout.write(self.style.ERROR(f"File {csv_file} does not exist"))
+        csv_files = []
+        for csv_file in options['csv_file']:
+            if not os.path.exists(csv_file):
+                self.stdout.write(self.style.ERROR(f"File {csv_file} does not exist"))
+            else:
+                csv_files.append(csv_file)
+        if not csv_files:
             return
-        
-        self.stdout.write(f"Importing data from {csv_file}...")
-        
-        # Create directory structure if it doesn't exist
-        os.makedirs('api/management/commands', exist_ok=True)
-        
-        events_created = 0
-        
-        with open(csv_file, 'r') as file:
-            reader = csv.DictReader(file)
-            
-            for row in reader:
-                try:
-                    # Parse timestamps
-                    timestamp = datetime.datetime.strptime(
-                        row.get('timestamp', ''), 
-                        '%Y-%m-%d %H:%M:%S'
-                    )
-                    
-                    received_at = datetime.datetime.strptime(
-                        row.get('received_at', ''), 
-                        '%Y-%m-%d %H:%M:%S'
-                    )
-                    
-                    # Create Event object
-                    Event.objects.create(
-                        event_name=row.get('event_name', ''),
-                        timestamp=timestamp,
-                        received_at=received_at,
-                        url=row.get('url', ''),
-                        path=row.get('path', ''),
-                        referrer=row.get('referrer', None) or None,  # Convert empty strings to None
-                        title=row.get('title', None) or None,
-                        utm_source=row.get('utm_source', None) or None,
-                        utm_medium=row.get('utm_medium', None) or None,
-                        utm_campaign=row.get('utm_campaign', None) or None,
-                        country=row.get('country', None) or None,
-                        region=row.get('region', None) or None,
-                    )
-                    
-                    events_created += 1
-                    
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(f"Error importing row: {row}\nError: {e}"))
-        
-        self.stdout.write(self.style.SUCCESS(f"Successfully imported {events_created} events"))
\ No newline at end of file
+
+        self.stdout.write(f"Importing data from {', '.join(csv_files)}...")
+        warning = local_cache_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+
+        self.total_created = 0
+        self.total_errors = 0
+        started = time.monotonic()
+        jobs = [(csv_file, options['batch_size'], options['resume']) for csv_file in csv_files]
+        workers = min(options['workers'], len(csv_files))
+
+        try:
+            if workers > 1:
+                # Children must open their own database connections
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                    results = pool.map(import_file, *zip(*jobs))
+                    for result in results:
+                        self._report(result)
+            else:
+                for job in jobs:
+                    self._report(import_file(*job))
+        except OperationalError as e:
+            resume = "" if options['resume'] else " with --resume"
+            raise CommandError(
+                f"Database unavailable: {e}. Run the import again{resume} to continue "
+                f"after the last committed batch."
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully imported {self.total_created} events "
+            f"({self.total_errors} errors) in {elapsed:.1f}s, "
+            f"{self.total_created / elapsed if elapsed else 0:.0f} rows/s"
+        ))
+
+    def _report(self, result):
+        self.total_created += result.created
+        self.total_errors += result.errors
+        rate = result.created / result.elapsed if result.elapsed else 0
+        resumed = f", resumed after {result.skipped} rows" if result.skipped else ""
+        self.stdout.write(
+            f"{result.csv_file}: {result.created} events, {result.errors} errors "
+            f"in {result.elapsed:.1f}s ({rate:.0f} rows/s{resumed})"
+        )
+        for sample in result.error_samples:
+            self.stdout.write(self.style.WARNING(f"  {sample}"))
+        if result.errors > len(result.error_samples):
+            self.stdout.write(self.style.WARNING(
+                f"  ... and {result.errors - len(result.error_samples)} more errors"
+            ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.partitions import (
+    PartitioningError, convert_to_partitioned, drop_expired_partitions,
+    ensure_partitions, is_partitioned, list_partitions,
+)
+
+class Command(BaseCommand):
+    help = 'Manage PostgreSQL range partitions of the events table (run daily from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Rebuild the existing events table as a partitioned table (takes an exclusive lock)')
+        parser.add_argument('--interval', choices=['month', 'day'],
+                            help='Partition size used by --convert and for new partitions')
+        parser.add_argument('--ahead', type=int, help='Number of upcoming partitions to create')
+        parser.add_argument('--retention-days', type=int,
+                            help='Drop partitions that end more than this many days ago')
+        parser.add_argument('--list', action='store_true', help='Print the current partitions')
+
+    def handle(self, *args, **options):
+        try:
+            if options['convert']:
+                self.stdout.write("Converting events table to a partitioned table...")
+                convert_to_partitioned(interval=options['interval'], ahead=options['ahead'])
+                self.stdout.write(self.style.SUCCESS("Events table is now partitioned"))
+            elif not is_partitioned():
+                raise CommandError("Events table is not partitioned; run with --convert first")
+            
+            created = ensure_partitions(ahead=options['ahead'], interval=options['interval'])
+            self.stdout.write(f"Partitions ensured through {created[-1]}")
+            
+            dropped = drop_expired_partitions(options['retention_days'])
+            for name in dropped:
+                self.stdout.write(self.style.WARNING(f"Dropped expired partition {name}"))
+            
+            if options['list']:
+                for name, start, end in list_partitions():
+                    self.stdout.write(f"{name}: {start} .. {end}")
+        except PartitioningError as e:
+            raise CommandError(str(e))
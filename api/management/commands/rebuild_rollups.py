@@ -0,0 +1,69 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from api.models import Event
+from api import heavy_hitters, retention, rollups, sketches
+from api.caching import invalidate_days, local_cache_warning
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild the rollups, visitor sketches and top-value summaries from raw events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First day to rebuild (YYYY-MM-DD). Defaults to the oldest event.')
+        parser.add_argument('--end', type=str, help='Last day to rebuild, inclusive (YYYY-MM-DD). Defaults to the newest event.')
+        parser.add_argument('--force', action='store_true',
+                            help='Also rebuild days before the oldest raw event or the raw retention, '
+                                 'discarding the aggregates kept for them')
+
+    def handle(self, *args, **options):
+        bounds = Event.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+        if bounds['first'] is None and not (options['start'] and options['end']):
+            self.stdout.write("No events to roll up.")
+            return
+        
+        try:
+            start = self._parse_day(options['start']) or timezone.localtime(bounds['first']).date()
+            end = self._parse_day(options['end']) or timezone.localtime(bounds['last']).date()
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        
+        if start > end:
+            raise CommandError("--start must not be after --end")
+        
+        # Days whose raw events were expired only live on in their aggregates:
+        # rebuilding them from raw events would wipe those
+        first_kept = retention.cutoff(settings.RETENTION_RAW_DAYS)
+        if bounds['first'] is not None:
+            oldest = timezone.localtime(bounds['first']).date()
+            first_kept = max(first_kept, oldest) if first_kept else oldest
+        if first_kept is not None and start < first_kept and not options['force']:
+            raise CommandError(
+                f"Raw events before {first_kept} are gone (retention); rebuilding those days would "
+                f"discard their rollups, sketches and top values. Use --start {first_kept} or --force."
+            )
+        
+        self.stdout.write(f"Rebuilding rollups from {start} to {end}...")
+        warning = local_cache_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+        
+        # One day per transaction keeps memory and lock time bounded.
+        total = 0
+        days = []
+        day = start
+        while day <= end:
+            total += rollups.rebuild_day(day)
+            sketches.rebuild_day(day)
+            heavy_hitters.rebuild_day(day)
+            days.append(day)
+            day += datetime.timedelta(days=1)
+        invalidate_days(days)
+        
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {total} events"))
+
+    def _parse_day(self, value):
+        if not value:
+            return None
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
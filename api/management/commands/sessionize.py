@@ -0,0 +1,38 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand
+from api.caching import local_cache_warning
+from api.sessionizer import reset, sessionize_batch
+
+class Command(BaseCommand):
+    help = 'Build the Session table incrementally from newly arrived events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gap', type=int, help='Inactivity gap in minutes that splits sessions')
+        parser.add_argument('--batch-size', type=int, help='Events consumed per transaction')
+        parser.add_argument('--rebuild', action='store_true', help='Delete all sessions and rebuild them from the first event')
+        parser.add_argument('--follow', type=int, metavar='SECONDS', help='Keep running, polling for new events every SECONDS')
+
+    def handle(self, *args, **options):
+        gap = datetime.timedelta(minutes=options['gap']) if options['gap'] else None
+        warning = local_cache_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+        
+        if options['rebuild']:
+            reset()
+            self.stdout.write("Cleared sessions, rebuilding from the first event...")
+        
+        while True:
+            consumed = 0
+            while True:
+                count = sessionize_batch(batch_size=options['batch_size'], gap=gap)
+                if not count:
+                    break
+                consumed += count
+            
+            self.stdout.write(self.style.SUCCESS(f"Sessionized {consumed} events"))
+            
+            if not options['follow']:
+                return
+            time.sleep(options['follow'])
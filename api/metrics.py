@@ -0,0 +1,275 @@
+"""
+In-process request and ingest metrics in the Prometheus text format.
+
+MetricsMiddleware opens a RequestStats for every request. A permanent
+execute wrapper on each database connection adds the time and SQL of every
+query run on behalf of that request to it, including queries run on other
+threads (the stats travel in a context variable, which sync_to_async and
+the dashboard pool carry along). When the response is done the stats go
+into per-view histograms. Requests slower than SLOW_REQUEST_MS are logged
+with their slowest queries.
+
+Metrics are kept per process: with several worker processes each one
+reports its own series at /metrics.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'webanalytics'
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+BATCH_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 5000)
+
+# Slowest queries kept per request for the slow request log, and the
+# length their SQL is cut to (multi-row INSERTs run to megabytes)
+SLOW_REQUEST_QUERIES = 5
+SLOW_SQL_MAX_CHARS = 1000
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of series, one per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = f'{PREFIX}_{name}'
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted(self._series.items())
+            lines.extend(self._render_series(series))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, series):
+        for key, value in series:
+            yield f'{self.name}{_labels(self.labelnames, key)} {_number(value)}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(key) or ([0] * (len(self.buckets) + 1), 0)
+            counts[index] += 1
+            self._series[key] = (counts, total + value)
+
+    def _render_series(self, series):
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                le = (('le', _number(bound)),)
+                yield f'{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}'
+
+
+class Gauge(Metric):
+    """A value read when /metrics is scraped, from ``function()``."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def _render_series(self, series):
+        yield f'{self.name} {_number(self.function())}'
+
+
+REGISTRY = []
+
+REQUESTS = Counter('requests_total', 'HTTP requests by view, method and status.', ('view', 'method', 'status'))
+REQUEST_SECONDS = Histogram(
+    'request_duration_seconds', 'Time to produce the response (first byte for streams).', ('view', 'method')
+)
+REQUEST_DB_SECONDS = Histogram(
+    'request_db_seconds', 'Database time spent on behalf of a request, summed over threads.', ('view',)
+)
+REQUEST_QUERIES = Histogram(
+    'request_db_queries', 'SQL queries run on behalf of a request.', ('view',), buckets=QUERY_BUCKETS
+)
+REQUEST_SERIALIZATION_SECONDS = Histogram(
+    'request_serialization_seconds', 'Time rendering DRF responses to bytes.', ('view',)
+)
+REQUEST_PYTHON_SECONDS = Histogram(
+    'request_python_seconds', 'Request time outside the database and rendering: view code and middleware.', ('view',)
+)
+INGEST_EVENTS = Counter(
+    'ingest_events_total', 'Tracked events by endpoint and outcome (accepted, rejected, throttled, dropped).',
+    ('endpoint', 'outcome')
+)
+INGEST_BATCH_SIZE = Histogram(
+    'ingest_batch_size', 'Events per track/batch request.', buckets=BATCH_BUCKETS
+)
+
+
+def _buffered_events():
+    from .buffer import get_buffer
+    return len(get_buffer()) if settings.TRACK_INGEST_MODE == 'buffered' else 0
+
+
+INGEST_BUFFERED = Gauge('ingest_buffered_events', 'Events waiting in the ingest buffer.', _buffered_events)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def record_ingest(endpoint, accepted=0, rejected=0, throttled=0, dropped=0, batch_size=None):
+    """
+    Count the outcome of one track request, or (endpoint 'buffer') of
+    buffered events dropped because they could not be stored.
+    """
+    outcomes = (('accepted', accepted), ('rejected', rejected), ('throttled', throttled), ('dropped', dropped))
+    for outcome, count in outcomes:
+        if count:
+            INGEST_EVENTS.inc(count, endpoint=endpoint, outcome=outcome)
+    if batch_size is not None:
+        INGEST_BATCH_SIZE.observe(batch_size)
+
+
+class RequestStats:
+    """Database and rendering time of one request, from any thread."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.slowest = []
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            entry = (seconds, self.queries, sql)
+            if len(self.slowest) < SLOW_REQUEST_QUERIES:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+
+_current = ContextVar('request_stats', default=None)
+
+
+def current():
+    return _current.get()
+
+
+def start_request():
+    """
+    Begin collecting stats for the current request; returns (stats, token).
+    Pass the token to ``end_request`` however the request ends.
+    """
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    """Stop attributing queries to the request started with ``token``."""
+    _current.reset(token)
+
+
+def finish_request(request, response, stats):
+    """Record the request's stats and log it if slow."""
+    total = time.perf_counter() - stats.started
+    match = getattr(request, 'resolver_match', None)
+    # Unmatched URLs share one label so scanners cannot blow up the series
+    view = (match.url_name or match.view_name) if match else 'unmatched'
+
+    REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+    REQUEST_SECONDS.observe(total, view=view, method=request.method)
+    REQUEST_DB_SECONDS.observe(stats.db_seconds, view=view)
+    REQUEST_QUERIES.observe(stats.queries, view=view)
+    REQUEST_SERIALIZATION_SECONDS.observe(stats.serialization_seconds, view=view)
+    REQUEST_PYTHON_SECONDS.observe(
+        max(total - stats.db_seconds - stats.serialization_seconds, 0), view=view
+    )
+
+    if total * 1000 >= settings.SLOW_REQUEST_MS:
+        slowest = sorted(stats.slowest, reverse=True)
+        logger.warning(
+            'Slow request %s %s (%s): %.0f ms total, %.0f ms in %d queries, %.0f ms rendering%s',
+            request.method, request.get_full_path(), view, total * 1000,
+            stats.db_seconds * 1000, stats.queries, stats.serialization_seconds * 1000,
+            ''.join(
+                f'\n  {seconds * 1000:.1f} ms: {sql[:SLOW_SQL_MAX_CHARS]}' + ('...' if len(sql) > SLOW_SQL_MAX_CHARS else '')
+                for seconds, _, sql in slowest
+            )
+        )
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created, dispatch_uid='api.metrics.instrument')
+def _instrument_connection(sender, connection, **kwargs):
+    if settings.METRICS_ENABLED and _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
@@ -0,0 +1,60 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """
+    Record latency, query count, database time and DRF rendering time of
+    every request in the api.metrics histograms (see /metrics), and log
+    requests slower than SLOW_REQUEST_MS with their slowest SQL.
+
+    Works in both sync and async stacks, so it never forces native async
+    views through a thread. Place it first to include the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            # Never leave the stats in the context for the next request
+            metrics.end_request(token)
+        metrics.finish_request(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        metrics.finish_request(request, response, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns: time the render
+        stats = metrics.current()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.serialization_seconds += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:37
+#
+# The rollup tables start empty: backfill events stored before this
+# migration with `manage.py rebuild_rollups` before enabling
+# ANALYTICS_USE_ROLLUPS.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_name', models.CharField(max_length=50)),
+                ('path', models.CharField(max_length=255)),
+                ('country', models.CharField(blank=True, default='', max_length=50)),
+                ('utm_source', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('bucket', models.DateField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'event_name', 'path', 'country', 'utm_source'), name='daily_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_name', models.CharField(max_length=50)),
+                ('path', models.CharField(max_length=255)),
+                ('country', models.CharField(blank=True, default='', max_length=50)),
+                ('utm_source', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('bucket', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'event_name', 'path', 'country', 'utm_source'), name='hourly_rollup_key')],
+            },
+        ),
+    ]
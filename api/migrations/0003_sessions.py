@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionizerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='user_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='Session',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=64)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('landing_path', models.CharField(max_length=255)),
+                ('exit_path', models.CharField(max_length=255)),
+                ('event_count', models.PositiveIntegerField(default=1)),
+                ('utm_source', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_bounce', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['started_at'], name='api_session_started_f41189_idx'), models.Index(fields=['user_id', 'ended_at'], name='api_session_user_id_18e87a_idx')],
+            },
+        ),
+    ]
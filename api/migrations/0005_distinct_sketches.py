@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_event_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistinctSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(max_length=20)),
+                ('dimension', models.CharField(blank=True, default='', max_length=120)),
+                ('registers', models.BinaryField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'metric', 'dimension'), name='distinct_sketch_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_distinct_sketches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopKSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(max_length=20)),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('counters', models.JSONField(default=dict)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'dimension'), name='topk_sketch_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,152 @@
+# Downtime: this migration rewrites every row of api_event once (a single
+# UPDATE setting all nine key columns) and drops and re-adds its indexes, in
+# one transaction holding an exclusive lock on the table. Reads and writes
+# of events wait until it commits, roughly as long as a full copy of the
+# table takes: run it in a maintenance window with ingestion stopped.
+
+import django.core.validators
+from django.db import migrations, models
+
+import api.fields
+
+# Event columns moved into the DimensionValue dictionary, with their lengths
+DIMENSIONS = {
+    'url': 255,
+    'path': 255,
+    'referrer': 255,
+    'title': 255,
+    'utm_source': 100,
+    'utm_medium': 100,
+    'utm_campaign': 100,
+    'country': 50,
+    'region': 50,
+}
+URL_DIMENSIONS = ('url', 'referrer')
+REQUIRED_DIMENSIONS = ('url', 'path')
+
+
+def dimension_field(name, null=True):
+    return api.fields.DimensionField(
+        kind=name,
+        max_length=DIMENSIONS[name],
+        blank=null,
+        null=null,
+        db_column=f'{name}_id',
+        validators=[django.core.validators.URLValidator()] if name in URL_DIMENSIONS else [],
+    )
+
+
+def encode(apps, schema_editor):
+    """
+    Copy the distinct strings into the dictionary, then point events at
+    them with a single UPDATE that sets every key column in one pass.
+    """
+    quote = schema_editor.quote_name
+    event = quote(apps.get_model('api', 'Event')._meta.db_table)
+    dictionary = quote(apps.get_model('api', 'DimensionValue')._meta.db_table)
+    for name in DIMENSIONS:
+        schema_editor.execute(
+            f"INSERT INTO {dictionary} ({quote('kind')}, {quote('value')}) "
+            f"SELECT DISTINCT %s, {quote(name)} FROM {event} WHERE {quote(name)} IS NOT NULL",
+            [name]
+        )
+    assignments = ', '.join(
+        f"{quote(name + '_id')} = ("
+        f"SELECT d.{quote('id')} FROM {dictionary} d "
+        f"WHERE d.{quote('kind')} = %s AND d.{quote('value')} = {event}.{quote(name)})"
+        for name in DIMENSIONS
+    )
+    schema_editor.execute(f"UPDATE {event} SET {assignments}", list(DIMENSIONS))
+
+
+def decode(apps, schema_editor):
+    quote = schema_editor.quote_name
+    event = quote(apps.get_model('api', 'Event')._meta.db_table)
+    dictionary = quote(apps.get_model('api', 'DimensionValue')._meta.db_table)
+    assignments = ', '.join(
+        f"{quote(name)} = ("
+        f"SELECT d.{quote('value')} FROM {dictionary} d "
+        f"WHERE d.{quote('id')} = {event}.{quote(name + '_id')})"
+        for name in DIMENSIONS
+    )
+    schema_editor.execute(f"UPDATE {event} SET {assignments}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_topk_sketches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DimensionValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=255)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'value'), name='dimension_value_key')],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='api_event_path_52daa8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='api_event_country_d17262_idx',
+        ),
+        *[
+            migrations.AddField(
+                model_name='event',
+                name=f'{name}_key',
+                field=dimension_field(name),
+            )
+            for name in DIMENSIONS
+        ],
+        # Nullable while encoded, so that unapplying can re-add and refill them
+        migrations.AlterField(
+            model_name='event',
+            name='url',
+            field=models.URLField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='path',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.RunPython(encode, decode),
+        *[
+            migrations.RemoveField(
+                model_name='event',
+                name=name,
+            )
+            for name in DIMENSIONS
+        ],
+        *[
+            migrations.RenameField(
+                model_name='event',
+                old_name=f'{name}_key',
+                new_name=name,
+            )
+            for name in DIMENSIONS
+        ],
+        *[
+            migrations.AlterField(
+                model_name='event',
+                name=name,
+                field=dimension_field(name, null=False),
+            )
+            for name in REQUIRED_DIMENSIONS
+        ],
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['path'], name='api_event_path_id_f2e7c4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['country'], name='api_event_country_fd132f_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_dimension_values'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='api_event_event_n_90a521_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='api_event_timesta_28a369_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='api_event_path_id_f2e7c4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='api_event_country_fd132f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_name', 'timestamp'], include=('path', 'title', 'country', 'user_id'), name='event_name_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['path', 'timestamp'], name='event_path_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['country', 'timestamp'], name='event_country_time_idx'),
+        ),
+    ]
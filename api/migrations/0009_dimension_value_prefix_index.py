@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_event_time_range_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dimensionvalue',
+            index=models.Index(fields=['kind', 'value'], name='dimension_value_prefix_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+    ]
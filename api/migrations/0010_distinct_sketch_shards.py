@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_dimension_value_prefix_index'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='distinctsketch',
+            name='distinct_sketch_key',
+        ),
+        migrations.AddField(
+            model_name='distinctsketch',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='distinctsketch',
+            constraint=models.UniqueConstraint(fields=('day', 'metric', 'dimension', 'shard'), name='distinct_sketch_key'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_distinct_sketch_shards'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='topksketch',
+            name='topk_sketch_key',
+        ),
+        migrations.AddField(
+            model_name='topksketch',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='topksketch',
+            constraint=models.UniqueConstraint(fields=('day', 'dimension', 'shard'), name='topk_sketch_key'),
+        ),
+    ]
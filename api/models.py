@@ -1,5 +1,8 @@
+from django.core.validators import URLValidator
 from django.db import models
 
+from .fields import DimensionField, DimensionQuerySet
+
 class Event(models.Model):
     """Model to store website visitor events/analytics data."""
     
@@ -15,28 +18,202 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     timestamp = models.DateTimeField()
     received_at = models.DateTimeField()
-    url = models.URLField(max_length=255)
-    path = models.CharField(max_length=255)
-    referrer = models.URLField(max_length=255, blank=True, null=True)
-    title = models.CharField(max_length=255, blank=True, null=True)
+    # Repeated strings are dictionary-encoded: see DimensionField
+    url = DimensionField(max_length=255, db_column='url_id', validators=[URLValidator()])
+    path = DimensionField(max_length=255, db_column='path_id')
+    referrer = DimensionField(max_length=255, blank=True, null=True, db_column='referrer_id', validators=[URLValidator()])
+    title = DimensionField(max_length=255, blank=True, null=True, db_column='title_id')
     
     # UTM parameters
-    utm_source = models.CharField(max_length=100, blank=True, null=True)
-    utm_medium = models.CharField(max_length=100, blank=True, null=True)
-    utm_campaign = models.CharField(max_length=100, blank=True, null=True)
+    utm_source = DimensionField(max_length=100, blank=True, null=True, db_column='utm_source_id')
+    utm_medium = DimensionField(max_length=100, blank=True, null=True, db_column='utm_medium_id')
+    utm_campaign = DimensionField(max_length=100, blank=True, null=True, db_column='utm_campaign_id')
     
     # Geo information
-    country = models.CharField(max_length=50, blank=True, null=True)
-    region = models.CharField(max_length=50, blank=True, null=True)
+    country = DimensionField(max_length=50, blank=True, null=True, db_column='country_id')
+    region = DimensionField(max_length=50, blank=True, null=True, db_column='region_id')
+    
+    # Anonymous visitor identifier set by the tracking snippet
+    user_id = models.CharField(max_length=64, blank=True, null=True)
+    
+    objects = DimensionQuerySet.as_manager()
     
     class Meta:
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['event_name']),
-            models.Index(fields=['timestamp']),
-            models.Index(fields=['path']),
-            models.Index(fields=['country']),
+            # Equality on a dimension plus a half-open time range (see
+            # api.queries). The pageview dashboards group by the included
+            # columns, so on PostgreSQL they never touch the heap.
+            models.Index(
+                fields=['event_name', 'timestamp'],
+                include=['path', 'title', 'country', 'user_id'],
+                name='event_name_time_idx',
+            ),
+            models.Index(fields=['path', 'timestamp'], name='event_path_time_idx'),
+            models.Index(fields=['country', 'timestamp'], name='event_country_time_idx'),
+            # Keyset pagination order of the events API; also serves
+            # time ranges without an equality filter
+            models.Index(fields=['timestamp', 'id'], name='event_timestamp_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_name} - {self.path} ({self.timestamp})"
+
+
+class DimensionValue(models.Model):
+    """
+    Dictionary of the distinct strings of each dictionary-encoded Event
+    column (``kind`` is the column name); events store the integer id.
+    """
+    
+    kind = models.CharField(max_length=20)
+    value = models.CharField(max_length=255)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'value'], name='dimension_value_key'),
+        ]
+        indexes = [
+            # Prefix matches (value LIKE 'term%') whatever the database collation
+            models.Index(
+                fields=['kind', 'value'],
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+                name='dimension_value_prefix_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind}: {self.value}"
+
+
+class Rollup(models.Model):
+    """
+    Pre-aggregated event counts per time bucket and dimension combination.
+    
+    Dimensions that are NULL on the raw event are stored as '' so that the
+    unique key can be used for incremental upserts.
+    """
+    
+    event_name = models.CharField(max_length=50)
+    path = models.CharField(max_length=255)
+    country = models.CharField(max_length=50, blank=True, default='')
+    utm_source = models.CharField(max_length=100, blank=True, default='')
+    count = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+
+
+class HourlyRollup(Rollup):
+    """Event counts per hour."""
+    
+    bucket = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bucket', 'event_name', 'path', 'country', 'utm_source'],
+                name='hourly_rollup_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:00} {self.event_name} {self.path}: {self.count}"
+
+
+class DailyRollup(Rollup):
+    """Event counts per day."""
+    
+    bucket = models.DateField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bucket', 'event_name', 'path', 'country', 'utm_source'],
+                name='daily_rollup_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.bucket} {self.event_name} {self.path}: {self.count}"
+
+
+
+class Session(models.Model):
+    """
+    One visit: consecutive events of a visitor separated by less than the
+    sessionizer inactivity gap. Built incrementally by api.sessionizer.
+    """
+    
+    user_id = models.CharField(max_length=64)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    landing_path = models.CharField(max_length=255)
+    exit_path = models.CharField(max_length=255)
+    event_count = models.PositiveIntegerField(default=1)
+    utm_source = models.CharField(max_length=100, blank=True, null=True)
+    is_bounce = models.BooleanField(default=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['started_at']),
+            models.Index(fields=['user_id', 'ended_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.landing_path} -> {self.exit_path} ({self.started_at})"
+
+
+class SessionizerCheckpoint(models.Model):
+    """Single-row table holding the id of the last event the sessionizer consumed."""
+    
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+
+class DistinctSketch(models.Model):
+    """
+    HyperLogLog registers estimating the distinct visitors of one day, for
+    all events (dimension '') or a single slice such as 'event:pageview'.
+    Sketches of different days merge losslessly; see api.sketches.
+    Concurrent writers update separate ``shard`` rows, unioned when read.
+    """
+    
+    day = models.DateField()
+    metric = models.CharField(max_length=20)
+    dimension = models.CharField(max_length=120, blank=True, default='')
+    shard = models.PositiveSmallIntegerField(default=0)
+    registers = models.BinaryField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'metric', 'dimension', 'shard'], name='distinct_sketch_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.metric} {self.dimension or '(all)'}"
+
+
+
+class TopKSketch(models.Model):
+    """
+    Space-Saving summary of the most frequent values of one dimension (path,
+    country, referrer, ...) among the pageviews of one day; see
+    api.heavy_hitters. ``total`` is the number of pageviews observed.
+    Concurrent writers update separate ``shard`` rows, merged when read.
+    """
+    
+    day = models.DateField()
+    dimension = models.CharField(max_length=20)
+    shard = models.PositiveSmallIntegerField(default=0)
+    total = models.PositiveBigIntegerField(default=0)
+    counters = models.JSONField(default=dict)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'dimension', 'shard'], name='topk_sketch_key'),
         ]
     
     def __str__(self):
-        return f"{self.event_name} - {self.path} ({self.timestamp})"
\ No newline at end of file
+        return f"{self.day} top {self.dimension}"
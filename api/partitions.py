@@ -0,0 +1,254 @@
+"""
+Native PostgreSQL range partitioning of the events table on ``timestamp``.
+
+Partitions are named ``<table>_pYYYY_MM`` (monthly) or ``<table>_pYYYY_MM_DD``
+(daily) so their bounds can be recovered from the name. A DEFAULT partition
+catches rows outside every range, e.g. when partitions were not created ahead
+of time, so ingest never fails on a missing partition; creating the missing
+partition later moves those rows into it.
+"""
+import re
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Event
+
+INTERVALS = ('month', 'day')
+
+
+class PartitioningError(Exception):
+    """Raised when the events table cannot be (re)partitioned as requested."""
+
+
+def _table():
+    return Event._meta.db_table
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _floor(day, interval):
+    return day.replace(day=1) if interval == 'month' else day
+
+
+def _next(day, interval):
+    if interval == 'day':
+        return day + timedelta(days=1)
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _previous(day, interval):
+    if interval == 'day':
+        return day - timedelta(days=1)
+    return (day.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def _partition_name(start, interval):
+    suffix = start.strftime('%Y_%m') if interval == 'month' else start.strftime('%Y_%m_%d')
+    return f'{_table()}_p{suffix}'
+
+
+def _bound(day):
+    """Timestamp literal for the start of ``day`` in the project time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min)).isoformat()
+
+
+def _check_vendor():
+    if connection.vendor != 'postgresql':
+        raise PartitioningError('Event partitioning requires PostgreSQL.')
+
+
+def is_partitioned():
+    _check_vendor()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c "
+            "WHERE c.oid = to_regclass(%s)",
+            [_table()]
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions():
+    """Return ``[(name, start_date, end_date)]`` for the ranged partitions, oldest first."""
+    _check_vendor()
+    pattern = re.compile(rf'^{re.escape(_table())}_p(\d{{4}})_(\d{{2}})(?:_(\d{{2}}))?$')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [_table()]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = pattern.match(name)
+        if not match:
+            continue
+        year, month, day = match.groups()
+        interval = 'day' if day else 'month'
+        start = date(int(year), int(month), int(day or 1))
+        partitions.append((name, start, _next(start, interval)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_partition(start, interval):
+    """
+    Create the partition covering ``start`` unless it already exists.
+
+    PostgreSQL refuses to create a partition while the DEFAULT partition
+    holds rows of its range, so those rows are first moved to a temporary
+    table and re-inserted through the parent once the partition exists,
+    all in one transaction.
+    """
+    start = _floor(start, interval)
+    end = _next(start, interval)
+    name = _partition_name(start, interval)
+    table = _table()
+    default = f'{table}_default'
+    staging = f'{name}_staging'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s), to_regclass(%s)", [name, default])
+        exists, has_default = cursor.fetchone()
+        if exists is not None:
+            return
+        if has_default is not None:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {_quote(staging)} (LIKE {_quote(table)}) ON COMMIT DROP"
+            )
+            cursor.execute(
+                f"WITH moved AS ("
+                f"DELETE FROM {_quote(default)} "
+                f"WHERE {_quote('timestamp')} >= %s AND {_quote('timestamp')} < %s RETURNING *"
+                f") INSERT INTO {_quote(staging)} SELECT * FROM moved",
+                [_bound(start), _bound(end)]
+            )
+        cursor.execute(
+            f"CREATE TABLE {_quote(name)} "
+            f"PARTITION OF {_quote(table)} "
+            f"FOR VALUES FROM ('{_bound(start)}') TO ('{_bound(end)}')"
+        )
+        if has_default is not None:
+            cursor.execute(f"INSERT INTO {_quote(table)} SELECT * FROM {_quote(staging)}")
+
+
+def ensure_partitions(ahead=None, interval=None, since=None):
+    """
+    Create partitions from ``since`` (default: today) through ``ahead``
+    intervals into the future. Returns the names that now cover the range.
+
+    ``since`` is capped at EVENT_PARTITIONS_BEHIND intervals before the
+    current one, so that a single bogus old timestamp cannot make this
+    create thousands of partitions; rows before that stay in DEFAULT.
+    """
+    interval = interval or settings.EVENT_PARTITION_INTERVAL
+    if interval not in INTERVALS:
+        raise PartitioningError(f'Unknown partition interval {interval!r}.')
+    ahead = settings.EVENT_PARTITIONS_AHEAD if ahead is None else ahead
+    today = timezone.localdate()
+    earliest = _floor(today, interval)
+    for _ in range(settings.EVENT_PARTITIONS_BEHIND):
+        earliest = _previous(earliest, interval)
+    day = max(_floor(since or today, interval), earliest)
+    last = _floor(today, interval)
+    for _ in range(ahead):
+        last = _next(last, interval)
+
+    names = []
+    with transaction.atomic():
+        while day <= last:
+            create_partition(day, interval)
+            names.append(_partition_name(day, interval))
+            day = _next(day, interval)
+    return names
+
+
+def convert_to_partitioned(interval=None, ahead=None):
+    """
+    Rebuild the events table as a partitioned table, copying every row.
+
+    Runs in a single transaction and holds an exclusive lock on the table
+    for the duration of the copy, so run it in a maintenance window. The
+    primary key becomes (id, timestamp) because PostgreSQL requires the
+    partition key in every unique constraint; ids stay unique through the
+    identity sequence.
+    """
+    interval = interval or settings.EVENT_PARTITION_INTERVAL
+    if is_partitioned():
+        raise PartitioningError(f'{_table()} is already partitioned.')
+
+    table = _table()
+    old = f'{table}_unpartitioned'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname <> %s",
+            [table, f'{table}_pkey']
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(f"SELECT MIN({_quote('timestamp')}) FROM {_quote(table)}")
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(old)}")
+        cursor.execute(
+            f"ALTER TABLE {_quote(old)} RENAME CONSTRAINT {_quote(f'{table}_pkey')} "
+            f"TO {_quote(f'{old}_pkey')}"
+        )
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {_quote(name)}")
+        cursor.execute(
+            f"CREATE TABLE {_quote(table)} "
+            f"(LIKE {_quote(old)} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({_quote('timestamp')})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(f'{table}_pkey')} "
+            f"PRIMARY KEY (id, {_quote('timestamp')})"
+        )
+        for _, definition in indexes:
+            # Created on the parent, these cascade to every partition
+            cursor.execute(definition)
+        cursor.execute(
+            f"CREATE TABLE {_quote(f'{table}_default')} PARTITION OF {_quote(table)} DEFAULT"
+        )
+
+        since = timezone.localtime(oldest).date() if oldest else None
+        ensure_partitions(ahead=ahead, interval=interval, since=since)
+
+        cursor.execute(f"INSERT INTO {_quote(table)} SELECT * FROM {_quote(old)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {_quote(table)}), 0) + 1, false)",
+            [table]
+        )
+        cursor.execute(f"DROP TABLE {_quote(old)}")
+
+
+def drop_expired_partitions(retention_days=None):
+    """
+    Detach and drop partitions that lie entirely before the retention
+    cutoff. This is a catalog operation instead of a DELETE: no row-level
+    locks, no dead tuples, no index maintenance. Returns the dropped names.
+    """
+    retention_days = settings.EVENT_RETENTION_DAYS if retention_days is None else retention_days
+    if not retention_days:
+        return []
+
+    cutoff = timezone.localdate() - timedelta(days=retention_days)
+    dropped = []
+    for name, _, end in list_partitions():
+        if end > cutoff:
+            break
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {_quote(_table())} DETACH PARTITION {_quote(name)}")
+            cursor.execute(f"DROP TABLE {_quote(name)}")
+        dropped.append(name)
+    return dropped
@@ -0,0 +1,134 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class TimeRange:
+    """
+    Half-open ``[start, end)`` range of aware timestamps in the project time
+    zone. Either bound may be None for an open range.
+
+    Views filter raw columns with ``column >= start AND column < end`` so
+    that PostgreSQL can use (composite) indexes on the timestamp and prune
+    partitions, instead of casting every row with ``column::date``.
+    """
+
+    def __init__(self, start=None, end=None):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def last_days(cls, days, today=None):
+        """``days`` whole days before ``today`` through the end of ``today``."""
+        today = today or timezone.localdate()
+        return cls(_midnight(today - timedelta(days=days)), _midnight(today + timedelta(days=1)))
+
+    @classmethod
+    def from_params(cls, params, default_days=None):
+        """
+        Build the range from ``start_date``/``end_date`` (dates or ISO 8601
+        datetimes) and ``days`` query parameters.
+
+        A date ``end_date`` includes that whole day; a datetime one is
+        exclusive. Without ``start_date`` the range covers the last ``days``
+        days (default ``default_days``); with ``default_days=None`` missing
+        bounds are left open. Otherwise ``days`` and the span of the range
+        are limited to ANALYTICS_MAX_DAYS. Raises ValidationError on
+        malformed or out-of-range values.
+        """
+        start = _parse_bound(params, 'start_date')
+        end = _parse_bound(params, 'end_date', end=True)
+        if default_days is None:
+            return cls(start, end)
+
+        max_days = settings.ANALYTICS_MAX_DAYS
+        if start is None:
+            try:
+                days = int(params.get('days', default_days))
+            except ValueError:
+                raise ValidationError({'days': 'A whole number of days is required.'})
+            if not 1 <= days <= max_days:
+                raise ValidationError({'days': f'Must be between 1 and {max_days}.'})
+            start = cls.last_days(days).start
+        if end is None:
+            end = _midnight(timezone.localdate() + timedelta(days=1))
+        if start >= end:
+            raise ValidationError({'end_date': 'Must be after start_date.'})
+        # ``days`` covers days + 1 calendar days, through the end of today
+        if end - start > timedelta(days=max_days + 1):
+            raise ValidationError({'start_date': f'The range spans more than {max_days} days.'})
+        return cls(start, end)
+
+    @property
+    def start_date(self):
+        """First calendar day touched by the range."""
+        return timezone.localtime(self.start).date() if self.start else None
+
+    @property
+    def end_date(self):
+        """Last calendar day touched by the range (inclusive)."""
+        return timezone.localtime(self.end - timedelta(microseconds=1)).date() if self.end else None
+
+    def filter(self, queryset, field='timestamp'):
+        """Restrict ``queryset`` to rows whose datetime ``field`` lies in the range."""
+        if self.start is not None:
+            queryset = queryset.filter(**{f'{field}__gte': self.start})
+        if self.end is not None:
+            queryset = queryset.filter(**{f'{field}__lt': self.end})
+        return queryset
+
+    def filter_days(self, queryset, field='bucket'):
+        """
+        Restrict ``queryset`` to rows whose date ``field`` is a day touched by
+        the range, for day-granular tables such as DailyRollup.
+        """
+        if self.start is not None:
+            queryset = queryset.filter(**{f'{field}__gte': self.start_date})
+        if self.end is not None:
+            queryset = queryset.filter(**{f'{field}__lte': self.end_date})
+        return queryset
+
+    def __repr__(self):
+        return f'TimeRange({self.start!r}, {self.end!r})'
+
+
+def _parse_bound(params, name, end=False):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+        parsed = None if day else parse_datetime(value)
+    except ValueError:
+        day = parsed = None
+    try:
+        if day is not None:
+            return _midnight(day + timedelta(days=1) if end else day)
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+    except OverflowError:
+        # The first or last representable day, shifted past the limits
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Enter a date (YYYY-MM-DD) or an ISO 8601 datetime.'})
+    return parsed
+
+
+def parse_limit(params, default, maximum):
+    """
+    The ``limit`` query parameter (``default`` when absent or empty),
+    clamped to [1, ``maximum``]. Raises ValidationError unless it is a
+    whole number.
+    """
+    try:
+        limit = int(params.get('limit') or default)
+    except ValueError:
+        raise ValidationError({'limit': 'A whole number is required.'})
+    return min(max(limit, 1), maximum)
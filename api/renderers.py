@@ -0,0 +1,29 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed, several
+    times faster than the json module on large pages of events.
+
+    The output matches DRF's compact UTF-8 JSON: datetimes, decimals and
+    other non-JSON types go through DRF's encoder. Indented responses
+    (``; indent=`` in the Accept header), values orjson rejects and
+    installs without orjson use the stock renderer.
+    """
+    _option = orjson.OPT_PASSTHROUGH_DATETIME if orjson else None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self._option)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer: keep the output embeddable in JS
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,105 @@
+"""
+Tiered retention: raw events are kept for RETENTION_RAW_DAYS, hourly
+rollups for RETENTION_HOURLY_DAYS, and the daily aggregates (daily rollups,
+visitor sketches, top-value summaries and sessions) for
+RETENTION_AGGREGATE_DAYS.
+
+Expiring raw events are handled one calendar day at a time, oldest first.
+The day is first folded into the aggregates (a no-op for days ingest
+already recorded), then its rows are deleted in primary-key windows of
+RETENTION_BATCH_SIZE, one short transaction each. Ingest keeps running
+meanwhile: late events for a folded day carry their own rollup updates,
+and rows that commit during the delete are removed on the next run.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import heavy_hitters, rollups, sketches
+from .models import DailyRollup, DistinctSketch, Event, HourlyRollup, Session, SessionizerCheckpoint, TopKSketch
+from .rollups import day_bounds
+
+
+def cutoff(days, today=None):
+    """First day kept by a ``days`` retention, or None to keep everything."""
+    if days is None:
+        return None
+    return (today or timezone.localdate()) - timedelta(days=days)
+
+
+def delete_in_batches(queryset, batch_size=None, pause=0.0):
+    """
+    Delete the rows of ``queryset`` in windows of ``batch_size`` primary
+    keys, each its own short transaction. Returns the number deleted.
+    """
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return 0
+    deleted = 0
+    for low in range(bounds['low'], bounds['high'] + 1, batch_size):
+        count, _ = queryset.filter(pk__gte=low, pk__lt=low + batch_size).delete()
+        deleted += count
+        if count and pause:
+            time.sleep(pause)
+    return deleted
+
+
+def expiring_days(keep_from):
+    """Days with raw events before ``keep_from``, oldest first."""
+    oldest = Event.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return []
+    day = timezone.localtime(oldest).date()
+    return [day + timedelta(days=i) for i in range((keep_from - day).days)]
+
+
+def fold_day(day):
+    """Record one day's raw events in every aggregate; returns the events added to the rollups."""
+    folded = rollups.fold_day(day)
+    sketches.fold_day(day)
+    heavy_hitters.fold_day(day)
+    return folded
+
+
+def expire_raw_day(day, batch_size=None, pause=0.0, fold=True):
+    """
+    Fold one day into the aggregates (unless ``fold`` is false, for days
+    past the aggregate retention too) and delete its raw events. Events
+    the sessionizer has not consumed yet are kept. Returns (folded, deleted).
+    """
+    folded = fold_day(day) if fold else 0
+    start, end = day_bounds(day)
+    events = Event.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    checkpoint = SessionizerCheckpoint.objects.filter(pk=1).first()
+    if checkpoint is not None:
+        events = events.filter(id__lte=checkpoint.last_event_id)
+    return folded, delete_in_batches(events, batch_size, pause)
+
+
+def expired_aggregates(hourly_from=None, aggregate_from=None):
+    """Querysets of the aggregates older than their tier's first kept day."""
+    querysets = []
+    if hourly_from is not None:
+        start, _ = day_bounds(hourly_from)
+        querysets.append(HourlyRollup.objects.filter(bucket__lt=start))
+    if aggregate_from is not None:
+        start, _ = day_bounds(aggregate_from)
+        querysets += [
+            DailyRollup.objects.filter(bucket__lt=aggregate_from),
+            DistinctSketch.objects.filter(day__lt=aggregate_from),
+            TopKSketch.objects.filter(day__lt=aggregate_from),
+            Session.objects.filter(ended_at__lt=start),
+        ]
+    return querysets
+
+
+def expire_aggregates(hourly_from=None, aggregate_from=None, batch_size=None, pause=0.0):
+    """Delete aggregates older than their tier's first kept day; returns {model name: rows}."""
+    return {
+        queryset.model.__name__: delete_in_batches(queryset, batch_size, pause)
+        for queryset in expired_aggregates(hourly_from, aggregate_from)
+    }
@@ -0,0 +1,175 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import DailyRollup, Event, HourlyRollup
+from .signals import events_ingested
+
+DIMENSIONS = ('event_name', 'path', 'country', 'utm_source')
+UPSERT_BATCH_SIZE = 500
+
+
+def _dimension_key(row):
+    """Dimension tuple for a ``values()`` row, with NULLs folded to ''."""
+    return tuple(row[name] or '' for name in DIMENSIONS)
+
+
+def _upsert(model, counts):
+    """
+    Add ``counts`` ({(bucket, *dimensions): n}) to ``model`` rows, inserting
+    missing rows. Keys are sorted so concurrent writers lock rows in the
+    same order.
+    """
+    if not counts:
+        return
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    bucket_field = model._meta.get_field('bucket')
+    columns = ('bucket',) + DIMENSIONS + ('count',)
+    column_sql = ', '.join(connection.ops.quote_name(c) for c in columns)
+    key_sql = ', '.join(connection.ops.quote_name(c) for c in columns[:-1])
+    count_sql = connection.ops.quote_name('count')
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    rows = sorted(counts.items())
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+            chunk = rows[offset:offset + UPSERT_BATCH_SIZE]
+            params = []
+            for (bucket, *dimensions), n in chunk:
+                params.append(bucket_field.get_db_prep_value(bucket, connection))
+                params.extend(dimensions)
+                params.append(n)
+            cursor.execute(
+                f"INSERT INTO {table} ({column_sql}) VALUES {', '.join([row_sql] * len(chunk))} "
+                f"ON CONFLICT ({key_sql}) DO UPDATE "
+                f"SET {count_sql} = {table}.{count_sql} + EXCLUDED.{count_sql}",
+                params
+            )
+
+
+def record_events(events):
+    """Fold freshly inserted events into the hourly and daily rollups."""
+    hourly = Counter()
+    daily = Counter()
+    for event in events:
+        local = timezone.localtime(event.timestamp)
+        key = tuple(getattr(event, name) or '' for name in DIMENSIONS)
+        hourly[(local.replace(minute=0, second=0, microsecond=0),) + key] += 1
+        daily[(local.date(),) + key] += 1
+
+    _upsert(HourlyRollup, hourly)
+    _upsert(DailyRollup, daily)
+
+
+@receiver(events_ingested, dispatch_uid='api.rollups.record_events')
+def _on_events_ingested(sender, events, **kwargs):
+    record_events(events)
+
+
+def day_bounds(day):
+    """Aware [start, end) datetimes of a calendar day in the current time zone."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _raw_counts(day):
+    """Exact ({hour key: n}, {day key: n}) rollup counts of one day's raw events."""
+    start, end = day_bounds(day)
+    rows = (
+        Event.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(bucket=TruncHour('timestamp'))
+        .values('bucket', *DIMENSIONS)
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    hourly = Counter()
+    daily = Counter()
+    for row in rows:
+        key = _dimension_key(row)
+        hourly[(row['bucket'],) + key] += row['count']
+        daily[(day,) + key] += row['count']
+    return hourly, daily
+
+
+def _stored(model, **bucket_filter):
+    """Counts currently held by ``model``'s rows: {(bucket, *dimensions): n}."""
+    return Counter({
+        (row['bucket'],) + _dimension_key(row): row['count']
+        for row in model.objects.filter(**bucket_filter).values('bucket', *DIMENSIONS, 'count')
+    })
+
+
+def _read_day(day):
+    """
+    One day's exact counts from the raw events and the counts its rollup
+    rows hold, read from a single snapshot (REPEATABLE READ on PostgreSQL,
+    unless a caller's transaction already applies its own isolation):
+    ``(hourly, daily, stored hourly, stored daily)``.
+
+    Ingest inserts events and upserts their rollups in one transaction, so
+    in the snapshot the rollups hold exactly the visible events; whatever
+    commits later adds its own increments on top of any delta between the
+    two, which can then be applied in a separate transaction.
+    """
+    start, end = day_bounds(day)
+    snapshot = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic():
+        if snapshot:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        hourly, daily = _raw_counts(day)
+        return (
+            hourly, daily,
+            _stored(HourlyRollup, bucket__gte=start, bucket__lt=end), _stored(DailyRollup, bucket=day),
+        )
+
+
+def fold_day(day):
+    """
+    Make sure every raw event of one calendar day is counted in the hourly
+    and daily rollups, before the raw rows are deleted. Returns the number
+    of events that had to be added (0 when ingest already folded them all).
+
+    Only the counts a rollup row is short of are added, so it is safe while
+    ingest keeps upserting the same rows. Rows holding more than the raw
+    events (whose raw rows were already deleted) are left alone.
+    """
+    hourly, daily, stored_hourly, stored_daily = _read_day(day)
+    # Counter subtraction keeps the positive differences only
+    hourly, daily = hourly - stored_hourly, daily - stored_daily
+    with transaction.atomic():
+        _upsert(HourlyRollup, hourly)
+        _upsert(DailyRollup, daily)
+    return sum(daily.values())
+
+
+def _correct(model, counts, stored):
+    """Move ``model``'s rows from the ``stored`` counts to ``counts``, keeping later increments."""
+    _upsert(model, counts - stored)
+    for key, n in (stored - counts).items():
+        model.objects.filter(bucket=key[0], **dict(zip(DIMENSIONS, key[1:]))).update(count=F('count') - n)
+
+
+def rebuild_day(day):
+    """
+    Recompute the hourly and daily rollups of one calendar day from the raw
+    events. Returns the number of events that were folded in.
+
+    Rather than deleting and recreating the rows, each row is corrected by
+    its difference to the raw events of the snapshot, so events ingested
+    meanwhile are never lost from the rollups.
+    """
+    start, end = day_bounds(day)
+    hourly, daily, stored_hourly, stored_daily = _read_day(day)
+    with transaction.atomic():
+        _correct(HourlyRollup, hourly, stored_hourly)
+        _correct(DailyRollup, daily, stored_daily)
+        HourlyRollup.objects.filter(bucket__gte=start, bucket__lt=end, count__lte=0).delete()
+        DailyRollup.objects.filter(bucket=day, count__lte=0).delete()
+    return sum(daily.values())
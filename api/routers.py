@@ -0,0 +1,130 @@
+"""
+Database routing for the optional read replica (DB_REPLICA_HOST).
+
+Queries go to the primary unless they run under ``replica_reads``, which
+the read-only analytics views and the events list/detail apply. Writes,
+and reads inside a transaction on the primary, always stay there, so
+ingest never resolves dimension keys against a lagging copy.
+
+The replica is used only while its replay lag is within
+REPLICA_MAX_LAG_SECONDS. The lag is checked at most every
+REPLICA_LAG_CHECK_INTERVAL seconds per process; while a check is running,
+or when the replica cannot be reached, the last known state applies.
+"""
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+
+# Seconds since the last replayed transaction, 0 when the replica has
+# replayed everything it received (an idle primary replays nothing), and
+# NULL when unknown. 0 too if the alias points at a primary.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+_lag_lock = threading.Lock()
+_lag_state = {'checked_at': None, 'usable': False}
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def replica_lag():
+    """Replay lag of the replica in seconds, or None if it is unknown."""
+    connection = connections[REPLICA]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        lag, = cursor.fetchone()
+    return float(lag) if lag is not None else None
+
+
+def replica_usable():
+    """Whether reads may go to the replica; see the module docstring."""
+    checked_at = _lag_state['checked_at']
+    if checked_at is not None and time.monotonic() - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return _lag_state['usable']
+    if not _lag_lock.acquire(blocking=False):
+        return _lag_state['usable']
+    try:
+        try:
+            lag = replica_lag()
+        except DatabaseError as exc:
+            logger.warning('Replica unavailable, reading from the primary: %s', exc)
+            usable = False
+        else:
+            usable = lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+            if not usable and _lag_state['usable']:
+                logger.warning('Replica lag %s s over the limit, reading from the primary', lag)
+        _lag_state.update(checked_at=time.monotonic(), usable=usable)
+        return usable
+    finally:
+        _lag_lock.release()
+
+
+def replica_reads(view):
+    """
+    Route the reads of ``view`` (a sync or async function, or method) to
+    the replica when it is configured and usable. The routing follows the
+    call into threads that copy the context, such as the dashboard pool.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads under ``replica_reads`` go to the replica; everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if (
+            _replica_reads.get()
+            and replica_configured()
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+            and replica_usable()
+        ):
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
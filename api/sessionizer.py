@@ -0,0 +1,138 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import invalidate_days
+from .models import Event, Session, SessionizerCheckpoint
+
+EVENT_FIELDS = ('id', 'user_id', 'timestamp', 'path', 'utm_source')
+
+
+def _extends(session, timestamp, gap):
+    """Whether an event at ``timestamp`` belongs to ``session``."""
+    return session.started_at - gap <= timestamp <= session.ended_at + gap
+
+
+def _add_event(session, event):
+    session.event_count += 1
+    session.is_bounce = False
+    if event['timestamp'] >= session.ended_at:
+        session.ended_at = event['timestamp']
+        session.exit_path = event['path']
+    elif event['timestamp'] < session.started_at:
+        # Late arrival that predates the visit's first known event
+        session.started_at = event['timestamp']
+        session.landing_path = event['path']
+        session.utm_source = event['utm_source']
+
+
+def _open_sessions(events_by_user, gap):
+    """Sessions per visitor, oldest first, that the new events could still extend."""
+    earliest = min(events[0]['timestamp'] for events in events_by_user.values())
+    candidates = (
+        Session.objects.filter(user_id__in=list(events_by_user), ended_at__gte=earliest - gap)
+        .order_by('user_id', 'ended_at')
+    )
+    by_user = defaultdict(list)
+    for session in candidates:
+        by_user[session.user_id].append(session)
+    return by_user
+
+
+def sessionize_batch(batch_size=None, gap=None, settle=None):
+    """
+    Fold the next batch of unprocessed events into the Session table.
+
+    Events are consumed in primary-key order from the checkpoint. Only events
+    created more than ``settle`` ago are taken so that rows from concurrent
+    ingest transactions with lower ids have committed first. Within the batch
+    each visitor's events are walked in timestamp order and either extend the
+    visitor's open session or start a new one after an inactivity ``gap``.
+
+    The cached analytics results of every day whose sessions changed are
+    invalidated once the batch commits.
+
+    Returns the number of events consumed (0 when caught up).
+    """
+    batch_size = batch_size or settings.SESSIONIZER_BATCH_SIZE
+    gap = gap or timedelta(minutes=settings.SESSIONIZER_INACTIVITY_MINUTES)
+    settle = settle if settle is not None else timedelta(seconds=settings.SESSIONIZER_SETTLE_SECONDS)
+
+    with transaction.atomic():
+        checkpoint, _ = SessionizerCheckpoint.objects.select_for_update().get_or_create(pk=1)
+        batch = list(
+            Event.objects.filter(
+                id__gt=checkpoint.last_event_id,
+                created_at__lte=timezone.now() - settle
+            )
+            .order_by('id')
+            .values(*EVENT_FIELDS)[:batch_size]
+        )
+        if not batch:
+            return 0
+
+        events_by_user = defaultdict(list)
+        for event in batch:
+            if event['user_id']:
+                events_by_user[event['user_id']].append(event)
+
+        created = []
+        updated = {}
+        # Days whose sessions (by start) change
+        days = set()
+        if events_by_user:
+            for events in events_by_user.values():
+                events.sort(key=lambda e: (e['timestamp'], e['id']))
+            open_sessions = _open_sessions(events_by_user, gap)
+
+            for user_id, events in events_by_user.items():
+                visits = open_sessions[user_id]
+                for event in events:
+                    match = next(
+                        (v for v in reversed(visits) if _extends(v, event['timestamp'], gap)),
+                        None
+                    )
+                    if match is not None:
+                        days.add(timezone.localtime(match.started_at).date())
+                        _add_event(match, event)
+                        days.add(timezone.localtime(match.started_at).date())
+                        if match.pk is not None:
+                            updated[match.pk] = match
+                        continue
+                    session = Session(
+                        user_id=user_id,
+                        started_at=event['timestamp'],
+                        ended_at=event['timestamp'],
+                        landing_path=event['path'],
+                        exit_path=event['path'],
+                        event_count=1,
+                        utm_source=event['utm_source'],
+                        is_bounce=True,
+                    )
+                    visits.append(session)
+                    created.append(session)
+                    days.add(timezone.localtime(session.started_at).date())
+
+        Session.objects.bulk_create(created)
+        Session.objects.bulk_update(
+            updated.values(),
+            ['started_at', 'ended_at', 'landing_path', 'exit_path',
+             'event_count', 'utm_source', 'is_bounce']
+        )
+
+        checkpoint.last_event_id = batch[-1]['id']
+        checkpoint.save()
+        transaction.on_commit(lambda: invalidate_days(days))
+
+    return len(batch)
+
+
+def reset():
+    """Drop all sessions and rewind the checkpoint so they are rebuilt from scratch."""
+    with transaction.atomic():
+        Session.objects.all().delete()
+        SessionizerCheckpoint.objects.update_or_create(pk=1, defaults={'last_event_id': 0})
+
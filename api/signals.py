@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by api.ingest.store_events after a batch of events has been inserted,
+# inside the same transaction. Receivers get ``events``: the saved instances.
+events_ingested = Signal()
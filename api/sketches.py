@@ -0,0 +1,185 @@
+import math
+import os
+import threading
+from collections import defaultdict
+from hashlib import blake2b
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import DistinctSketch, Event
+from .rollups import day_bounds
+from .signals import events_ingested
+
+# 2**12 one-byte registers: 4 KB per sketch, ~1.6% standard error
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+RELATIVE_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_VALUE_BITS = 64 - PRECISION
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+
+USERS = 'users'
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over a 64-bit hash.
+
+    ``add`` is O(1); ``update`` and ``union`` take the register-wise maximum,
+    which is exactly the sketch of the union of the inputs, so per-day
+    sketches combine into the sketch of any date range.
+    """
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers else bytearray(REGISTERS)
+
+    def add(self, value):
+        x = int.from_bytes(blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = x >> _VALUE_BITS
+        rank = _VALUE_BITS - (x & _VALUE_MASK).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @classmethod
+    def union(cls, sketches):
+        sketches = [s.registers for s in sketches]
+        if not sketches:
+            return cls()
+        if len(sketches) == 1:
+            return cls(sketches[0])
+        return cls(bytes(map(max, *sketches)))
+
+    def count(self):
+        estimate = _ALPHA * REGISTERS * REGISTERS / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Small-range correction (linear counting)
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return int(round(estimate))
+
+    def __bytes__(self):
+        return bytes(self.registers)
+
+
+def _dimensions(event_name):
+    return ('', f'event:{event_name}')
+
+
+def _collect(rows):
+    """Build {(day, dimension): HyperLogLog} from (timestamp, user_id, event_name) rows."""
+    sketches = defaultdict(HyperLogLog)
+    for timestamp, user_id, event_name in rows:
+        if not user_id:
+            continue
+        day = timezone.localtime(timestamp).date()
+        for dimension in _dimensions(event_name):
+            sketches[(day, dimension)].add(user_id)
+    return sketches
+
+
+def record_events(events):
+    """Fold freshly inserted events into the per-day visitor sketches."""
+    _merge(_collect((e.timestamp, e.user_id, e.event_name) for e in events))
+
+
+def worker_shard():
+    """
+    Sketch shard written by the current process and thread, stable for its
+    lifetime, so that concurrent ingests lock different rows.
+    """
+    return hash((os.getpid(), threading.get_ident())) % settings.SKETCH_SHARDS
+
+
+def _merge(sketches):
+    """Union {(day, dimension): HyperLogLog} into this worker's stored sketch shards."""
+    if not sketches:
+        return
+
+    keys = sorted(sketches)
+    shard = worker_shard()
+    DistinctSketch.objects.bulk_create(
+        [DistinctSketch(day=day, metric=USERS, dimension=dimension, shard=shard, registers=bytes(REGISTERS))
+         for day, dimension in keys],
+        ignore_conflicts=True
+    )
+    rows = (
+        DistinctSketch.objects.select_for_update()
+        .filter(metric=USERS, shard=shard, day__in={day for day, _ in keys}, dimension__in={d for _, d in keys})
+        .order_by('day', 'dimension')
+    )
+    changed = []
+    for row in rows:
+        new = sketches.get((row.day, row.dimension))
+        if new is None:
+            continue
+        merged = HyperLogLog(bytes(row.registers))
+        merged.update(new)
+        if merged.registers != bytes(row.registers):
+            row.registers = bytes(merged)
+            changed.append(row)
+    DistinctSketch.objects.bulk_update(changed, ['registers'])
+
+
+@receiver(events_ingested, dispatch_uid='api.sketches.record_events')
+def _on_events_ingested(sender, events, **kwargs):
+    record_events(events)
+
+
+def _day_sketches(day):
+    start, end = day_bounds(day)
+    rows = (
+        Event.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .values_list('timestamp', 'user_id', 'event_name')
+        .order_by()
+        .iterator(chunk_size=10000)
+    )
+    return _collect(rows)
+
+
+def fold_day(day):
+    """
+    Union the visitors of one day's raw events into its sketches, before
+    the raw rows are deleted. Unions are idempotent, so visitors already
+    recorded at ingest are not counted twice.
+    """
+    with transaction.atomic():
+        _merge(_day_sketches(day))
+
+
+def rebuild_day(day):
+    """Recompute the visitor sketches of one calendar day from the raw events."""
+    sketches = _day_sketches(day)
+    with transaction.atomic():
+        DistinctSketch.objects.filter(metric=USERS, day=day).delete()
+        DistinctSketch.objects.bulk_create(
+            DistinctSketch(day=d, metric=USERS, dimension=dimension, registers=bytes(sketch))
+            for (d, dimension), sketch in sketches.items()
+        )
+
+
+def unique_users(start_date, end_date=None, dimension=''):
+    """Estimated distinct visitors over [start_date, end_date] (inclusive days)."""
+    end_date = end_date or timezone.localdate()
+    registers = DistinctSketch.objects.filter(
+        metric=USERS, dimension=dimension, day__gte=start_date, day__lte=end_date
+    ).values_list('registers', flat=True)
+    return HyperLogLog.union(HyperLogLog(bytes(r)) for r in registers).count()
+
+
+def daily_unique_users(start_date, end_date=None, dimension=''):
+    """Estimated distinct visitors per day over [start_date, end_date], as {day: count}."""
+    end_date = end_date or timezone.localdate()
+    rows = DistinctSketch.objects.filter(
+        metric=USERS, dimension=dimension, day__gte=start_date, day__lte=end_date
+    ).values_list('day', 'registers')
+    shards = defaultdict(list)
+    for day, registers in rows:
+        shards[day].append(HyperLogLog(bytes(registers)))
+    return {day: HyperLogLog.union(sketches).count() for day, sketches in shards.items()}
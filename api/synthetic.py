@@ -0,0 +1,150 @@
+"""
+Deterministic synthetic event streams for load tests and benchmarks.
+
+Events come in visits: a visitor lands from a weighted mix of traffic
+sources (direct, search, social, newsletter, paid), views a geometric
+number of pages picked from a Zipfian popularity curve and interacts with
+some of them. Start times follow a daily traffic curve over the last
+``days`` days and countries are weighted like a typical audience, so the
+rollups, sessionizer and top-N summaries see realistic skew.
+"""
+import itertools
+import random
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+# (utm_source, utm_medium, utm_campaign, referrer, weight)
+SOURCES = [
+    (None, None, None, None, 35),
+    ('google', 'organic', None, 'https://www.google.com/', 30),
+    ('bing', 'organic', None, 'https://www.bing.com/', 4),
+    ('twitter', 'social', None, 'https://t.co/', 8),
+    ('facebook', 'social', None, 'https://www.facebook.com/', 7),
+    ('linkedin', 'social', None, 'https://www.linkedin.com/', 4),
+    ('newsletter', 'email', 'weekly_digest', None, 7),
+    ('google', 'cpc', 'spring_sale', 'https://www.google.com/', 5),
+]
+
+# (country, region, weight)
+COUNTRIES = [
+    ('United States', 'California', 14), ('United States', 'New York', 9),
+    ('United States', 'Texas', 6), ('India', 'Karnataka', 10), ('India', 'Maharashtra', 8),
+    ('United Kingdom', 'England', 8), ('Germany', 'Bavaria', 6), ('Brazil', 'Sao Paulo', 5),
+    ('Canada', 'Ontario', 5), ('France', 'Ile-de-France', 4), ('Japan', 'Tokyo', 4),
+    ('Australia', 'New South Wales', 3), ('Netherlands', 'North Holland', 2),
+    ('Spain', 'Madrid', 2), ('Mexico', 'Mexico City', 2), (None, None, 2),
+]
+
+# Share of traffic starting in each local hour, peaking in the afternoon
+HOURLY_WEIGHTS = [
+    2, 1, 1, 1, 1, 2, 3, 5, 7, 8, 9, 9,
+    9, 10, 10, 9, 8, 7, 7, 6, 5, 4, 3, 3,
+]
+
+# Chance that a page view is followed by each interaction
+INTERACTIONS = [('click', 0.35), ('scroll_depth', 0.25), ('form_submit', 0.03)]
+
+SECTIONS = ['products', 'blog', 'docs', 'pricing', 'about', 'careers', 'support']
+
+SITE = 'https://example.com'
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def zipf_weights(n, s=1.1):
+    """Cumulative Zipf weights: item ``k`` is drawn with probability ~ 1 / (k+1)**s."""
+    return _cumulative(1 / (k + 1) ** s for k in range(n))
+
+
+class EventGenerator:
+    """
+    Seeded generator of event dicts with the fields accepted by
+    EventSerializer; the same arguments always yield the same stream.
+
+    ``events(count)`` yields exactly ``count`` events with aware datetimes,
+    suitable for ``Event(**event)``; ``payload(event)`` turns one into the
+    JSON body the track endpoints expect.
+    """
+
+    def __init__(self, seed=0, days=30, users=10000, paths=500, bounce_rate=0.45, end=None):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.users = users
+        self.bounce_rate = bounce_rate
+        self.end = end or timezone.localdate() + timedelta(days=1)
+        self.paths = ['/'] + [
+            f'/{SECTIONS[i % len(SECTIONS)]}/page-{i}' for i in range(1, paths)
+        ]
+        self._path_weights = zipf_weights(len(self.paths))
+        self._source_weights = _cumulative(source[-1] for source in SOURCES)
+        self._country_weights = _cumulative(country[-1] for country in COUNTRIES)
+        self._hour_weights = _cumulative(HOURLY_WEIGHTS)
+
+    def _path(self):
+        return self.rng.choices(self.paths, cum_weights=self._path_weights)[0]
+
+    def _visit_start(self):
+        rng = self.rng
+        day = self.end - timedelta(days=rng.randrange(1, self.days + 1))
+        hour = rng.choices(range(24), cum_weights=self._hour_weights)[0]
+        start = timezone.make_aware(datetime.combine(day, time(hour)))
+        return start + timedelta(seconds=rng.randrange(3600))
+
+    def visit(self):
+        """The events of one visit, page by page."""
+        rng = self.rng
+        source, medium, campaign, referrer, _ = rng.choices(SOURCES, cum_weights=self._source_weights)[0]
+        country, region, _ = rng.choices(COUNTRIES, cum_weights=self._country_weights)[0]
+        user_id = f'visitor-{rng.randrange(self.users)}'
+        timestamp = self._visit_start()
+
+        pages = 1
+        if rng.random() >= self.bounce_rate:
+            # Geometric number of further pages, mean ~3
+            while pages < 30 and rng.random() < 0.7:
+                pages += 1
+
+        events = []
+        for page in range(pages):
+            path = self._path()
+            common = {
+                'timestamp': timestamp,
+                'received_at': timestamp + timedelta(milliseconds=rng.randrange(50, 2000)),
+                'url': f'{SITE}{path}',
+                'path': path,
+                'referrer': referrer if page == 0 else events[-1]['url'],
+                'title': 'Home' if path == '/' else path.rsplit('/', 1)[-1].replace('-', ' ').title(),
+                'utm_source': source,
+                'utm_medium': medium,
+                'utm_campaign': campaign,
+                'country': country,
+                'region': region,
+                'user_id': user_id,
+            }
+            events.append({'event_name': 'pageview', **common})
+            for name, chance in INTERACTIONS:
+                if rng.random() < chance:
+                    at = timestamp + timedelta(seconds=rng.randrange(1, 30))
+                    events.append({**common, 'event_name': name, 'timestamp': at, 'received_at': at})
+            timestamp += timedelta(seconds=int(rng.expovariate(1 / 40)) + 2)
+        return events
+
+    def events(self, count):
+        """Yield ``count`` events, visit by visit (the last visit may be cut short)."""
+        produced = 0
+        while produced < count:
+            for event in self.visit()[:count - produced]:
+                produced += 1
+                yield event
+
+    @staticmethod
+    def payload(event):
+        """JSON-ready copy of ``event`` for the track endpoints."""
+        return {
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in event.items()
+            if value is not None
+        }
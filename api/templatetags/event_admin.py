@@ -0,0 +1,107 @@
+import calendar
+import datetime
+
+from django import template
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.db.models import Max, Min
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def _bounds(cl):
+    """
+    First and last value of the hierarchy field over the whole table: two
+    index lookups, unlike Min/Max over a filtered changelist.
+    """
+    field_name = cl.date_hierarchy
+    bounds = cl.root_queryset.order_by().aggregate(first=Min(field_name), last=Max(field_name))
+    if bounds['first'] is None:
+        return None, None
+    return timezone.localtime(bounds['first']).date(), timezone.localtime(bounds['last']).date()
+
+
+def event_date_hierarchy(cl):
+    """
+    ``{% date_hierarchy %}`` for large tables: the years, months and days
+    offered are those of the calendar between the first and last event,
+    not the ones with matching rows, so no DISTINCT over the events runs.
+    A period offered may hold no events for the current filters.
+    """
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    first, last = _bounds(cl)
+    if first is None:
+        return {'show': False}
+    if not (year_lookup or month_lookup or day_lookup) and first.year == last.year:
+        year_lookup = first.year
+        if first.month == last.month:
+            month_lookup = first.month
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup, month_field: month_lookup}),
+                'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT'))}],
+        }
+    if year_lookup and month_lookup:
+        year, month = int(year_lookup), int(month_lookup)
+        days = [
+            datetime.date(year, month, day)
+            for day in range(1, calendar.monthrange(year, month)[1] + 1)
+        ]
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}), 'title': str(year_lookup)},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month_lookup, day_field: day.day}),
+                    'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                }
+                for day in days if first <= day <= last
+            ],
+        }
+    if year_lookup:
+        year = int(year_lookup)
+        months = [datetime.date(year, month, 1) for month in range(1, 13)]
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month.month}),
+                    'title': capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT')),
+                }
+                for month in months if (first.year, first.month) <= (year, month.month) <= (last.year, last.month)
+            ],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({year_field: str(year)}), 'title': str(year)}
+            for year in range(first.year, last.year + 1)
+        ],
+    }
+
+
+@register.tag(name='event_date_hierarchy')
+def event_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser, token, func=event_date_hierarchy, template_name='date_hierarchy.html', takes_context=False,
+    )
@@ -1,3 +1,1342 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import (
+    async_views, caching, dashboard, dimensions, heavy_hitters, live, metrics, partitions, retention, rollups,
+    routers, sessionizer, sketches, urls as api_urls,
+)
+from .admin import CachedChoices
+from .benchmark import percentile
+from .buffer import EventBuffer
+from .management.commands.export_events import SplitCSVWriter
+from .funnels import Funnel
+from .ingest import store_events
+from .middleware import MetricsMiddleware
+from .models import DailyRollup, DistinctSketch, Event, Session
+from .queries import TimeRange
+from .renderers import FastJSONRenderer
+from .routers import ReplicaRouter, replica_reads
+from .serializers import EVENT_FIELDS, EventSerializer, event_data, event_rows, validate_event
+from .synthetic import EventGenerator
+
+
+@override_settings(TRACK_INGEST_MODE='sync', TRACK_BATCH_MAX_EVENTS=3)
+class TrackBatchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now().isoformat()
+
+    def payload(self, path='/'):
+        return {'event_name': 'pageview', 'timestamp': self.now, 'received_at': self.now,
+                'url': f'https://example.com{path}', 'path': path}
+
+    def post(self, items):
+        return self.client.post('/api/track/batch/', items, format='json')
+
+    def test_valid_batch_is_stored_in_order(self):
+        response = self.post([self.payload('/a'), self.payload('/b')])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['accepted'], body['rejected']), (2, 0))
+        self.assertEqual([Event.objects.get(pk=r['id']).path for r in body['results']], ['/a', '/b'])
+
+    def test_partly_invalid_batch_answers_207_per_item(self):
+        response = self.post([self.payload('/a'), {**self.payload('/b'), 'url': 'not a url'}, 'junk'])
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], [201, 400, 400])
+        self.assertIn('url', results[1]['errors'])
+        self.assertEqual(list(Event.objects.values_list('path', flat=True)), ['/a'])
+
+    def test_invalid_batch_answers_400(self):
+        response = self.post([{'event_name': 'pageview'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['rejected'], 1)
+        self.assertFalse(Event.objects.exists())
+
+    def test_oversized_batch_answers_413(self):
+        self.assertEqual(self.post([self.payload()] * 4).status_code, 413)
+        self.assertFalse(Event.objects.exists())
+
+    def test_ndjson_body(self):
+        body = '\n'.join(json.dumps(self.payload(path)) for path in ('/a', '/b')) + '\n\n'
+        response = self.client.post('/api/track/batch/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Event.objects.count(), 2)
+
+
+@override_settings(TRACK_INGEST_MODE='buffered')
+class EventBufferTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        # Flushed by the tests themselves, on the test's own connection
+        self.buffer = EventBuffer(max_events=5, flush_size=4, flush_interval=3600)
+        for patcher in (mock.patch('api.views.get_buffer', return_value=self.buffer),
+                        mock.patch.object(self.buffer, '_ensure_started'),
+                        mock.patch('api.buffer.close_old_connections')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def payload(self, path='/'):
+        now = timezone.now().isoformat()
+        return {'event_name': 'pageview', 'timestamp': now, 'received_at': now,
+                'url': f'https://example.com{path}', 'path': path}
+
+    def offer(self, paths):
+        now = timezone.now()
+        self.buffer.offer([
+            Event(event_name='pageview', timestamp=now, received_at=now, url=f'https://example.com{path}', path=path)
+            for path in paths
+        ])
+
+    def test_full_buffer_answers_503_with_retry_after(self):
+        self.assertEqual(self.client.post('/api/track/batch/', [self.payload()] * 4, format='json').status_code, 202)
+        response = self.client.post('/api/track/batch/', [self.payload()] * 2, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.TRACK_BUFFER_RETRY_AFTER))
+        self.assertEqual(self.client.post('/api/track/', self.payload(), format='json').status_code, 202)
+        self.assertEqual(self.client.post('/api/track/', self.payload(), format='json').status_code, 503)
+        self.assertEqual(len(self.buffer), 5)
+        self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(Event.objects.count(), 5)
+
+    def test_poison_events_are_dropped_without_blocking_the_rest(self):
+        def reject_poison(events):
+            if any(event.path == '/poison' for event in events):
+                raise IntegrityError('poison')
+            return store_events(events)
+
+        self.offer(['/a', '/poison', '/b', '/c', '/d'])
+        with mock.patch('api.buffer.store_events', reject_poison), self.assertLogs('api.buffer', 'ERROR') as logs:
+            self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(sorted(Event.objects.values_list('path', flat=True)), ['/a', '/b', '/c', '/d'])
+        self.assertIn('/poison', logs.output[0])
+
+    def test_operational_errors_keep_the_unstored_events(self):
+        self.offer(['/a', '/b', '/c'])
+        with mock.patch('api.buffer.store_events', side_effect=OperationalError('gone')), \
+                self.assertLogs('api.buffer', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 3)
+        self.assertEqual(self.buffer.flush(), 3)
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now().replace(microsecond=0)
+
+    def payload(self, **fields):
+        return {
+            'event_name': 'pageview', 'timestamp': self.now.isoformat(), 'received_at': self.now.isoformat(),
+            'url': 'https://example.com/pricing', 'path': '/pricing', 'country': 'US', **fields,
+        }
+
+    def daily(self, use_rollups):
+        with self.settings(ANALYTICS_USE_ROLLUPS=use_rollups):
+            return self.client.get('/api/analytics/daily/').json()
+
+    def test_every_write_path_updates_the_rollups(self):
+        self.assertEqual(self.client.post('/api/events/', self.payload(), format='json').status_code, 201)
+        self.assertEqual(self.client.post('/api/track/', self.payload(event_name='click'), format='json').status_code, 201)
+        batch = [self.payload(path=f'/docs/{i}') for i in range(3)]
+        self.assertEqual(self.client.post('/api/track/batch/', batch, format='json').status_code, 201)
+
+        self.assertEqual(sum(DailyRollup.objects.values_list('count', flat=True)), Event.objects.count())
+        self.assertEqual(self.daily(use_rollups=True), self.daily(use_rollups=False))
+        self.assertEqual(sum(day['count'] for day in self.daily(use_rollups=True)), 5)
+
+    def test_rebuild_day_corrects_rows_in_place(self):
+        store_events([Event(**{**e, 'timestamp': self.now}) for e in EventGenerator(seed=3).events(20)])
+        day = timezone.localdate(self.now)
+        row = DailyRollup.objects.filter(bucket=day).first()
+        row.count += 7
+        row.save()
+        DailyRollup.objects.create(bucket=day, event_name='click', path='/gone', count=3)
+
+        self.assertEqual(rollups.rebuild_day(day), 20)
+        self.assertEqual(sum(DailyRollup.objects.filter(bucket=day).values_list('count', flat=True)), 20)
+        self.assertFalse(DailyRollup.objects.filter(path='/gone').exists())
+        self.assertEqual(rollups.fold_day(day), 0)
+
+    @override_settings(RETENTION_RAW_DAYS=90)
+    def test_rebuilding_expired_days_keeps_their_aggregates(self):
+        day = timezone.localdate() - timedelta(days=100)
+        noon = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12)
+        store_events([Event(**{**e, 'timestamp': noon}) for e in EventGenerator(seed=4).events(20)])
+        retention.expire_raw_day(day)
+        options = {'start': day.isoformat(), 'end': day.isoformat(), 'stdout': io.StringIO(), 'stderr': io.StringIO()}
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', **options)
+        # Without a retention setting the oldest raw event is the limit
+        store_events([Event(**{**e, 'timestamp': noon + timedelta(days=5)}) for e in EventGenerator(seed=4).events(1)])
+        with self.settings(RETENTION_RAW_DAYS=None), self.assertRaises(CommandError):
+            call_command('rebuild_rollups', **options)
+        self.assertEqual(sum(DailyRollup.objects.filter(bucket=day).values_list('count', flat=True)), 20)
+        self.assertTrue(DistinctSketch.objects.filter(day=day).exists())
+
+        call_command('rebuild_rollups', force=True, **options)
+        self.assertFalse(DailyRollup.objects.filter(bucket=day).exists())
+
+
+class SessionizerTests(TestCase):
+    GAP = timedelta(minutes=30)
+
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=6)
+
+    def store(self, user_id, *visits):
+        """Store ``(minutes after start, path)`` events of ``user_id``."""
+        store_events([
+            Event(event_name='pageview', timestamp=self.start + timedelta(minutes=minutes), received_at=self.start,
+                  url=f'https://example.com{path}', path=path, user_id=user_id)
+            for minutes, path in visits
+        ])
+
+    def sessionize(self, batch_size=100):
+        while sessionizer.sessionize_batch(batch_size=batch_size, gap=self.GAP, settle=timedelta(0)):
+            pass
+        return list(
+            Session.objects.filter(user_id='a').order_by('started_at')
+            .values_list('landing_path', 'exit_path', 'event_count', 'is_bounce')
+        )
+
+    def test_inactivity_gap_splits_sessions(self):
+        self.store('a', (0, '/'), (20, '/pricing'), (45, '/signup'), (80, '/docs'), (200, '/'))
+        self.store('b', (10, '/'))
+        self.assertEqual(self.sessionize(), [
+            ('/', '/signup', 3, False), ('/docs', '/docs', 1, True), ('/', '/', 1, True),
+        ])
+        self.assertEqual(Session.objects.filter(user_id='b').count(), 1)
+
+    def test_later_batches_extend_open_sessions(self):
+        self.store('a', (0, '/'), (20, '/pricing'))
+        self.assertEqual(self.sessionize(batch_size=1), [('/', '/pricing', 2, False)])
+        # A late event predating the visit becomes its landing page
+        self.store('a', (40, '/signup'), (-10, '/blog'))
+        self.assertEqual(self.sessionize(batch_size=1), [('/blog', '/signup', 4, False)])
+        self.assertEqual(self.sessionize(), [('/blog', '/signup', 4, False)])
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class AnalyticsLimitTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        store_events([Event(**e) for e in EventGenerator(seed=5).events(40)])
+
+    def test_malformed_limits_are_rejected(self):
+        for url in ('/api/analytics/countries/', '/api/analytics/top-pages/', '/api/analytics/dashboard/'):
+            for limit in ('abc', '1.5'):
+                response = self.client.get(url, {'limit': limit, 'fast': 'true'})
+                self.assertEqual(response.status_code, 400, (url, limit))
+                self.assertIn('limit', response.json())
+
+    def test_limits_are_clamped(self):
+        pages = self.client.get('/api/analytics/top-pages/', {'limit': '-3'}).json()
+        self.assertEqual(len(pages), 1)
+        countries = self.client.get('/api/analytics/countries/', {'limit': '-3', 'fast': 'true'}).json()
+        self.assertEqual(len(countries), 1)
+
+
+@override_settings(ANALYTICS_CACHE_STALE_SECONDS=0)
+class AnalyticsCacheTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now()
+        caches[settings.ANALYTICS_CACHE_ALIAS].clear()
+        # Commit callbacks run here fill the dimension cache with keys the
+        # test's rollback discards
+        patcher = mock.patch.object(dimensions, '_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def store(self, count, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            store_events([
+                Event(event_name='pageview', timestamp=self.now, received_at=self.now,
+                      url='https://example.com/', path='/', **fields)
+                for _ in range(count)
+            ])
+
+    def test_unread_parameters_share_the_cached_result(self):
+        self.store(2)
+        self.assertEqual(self.client.get('/api/analytics/daily/', {'_': '1'}).json()[0]['count'], 2)
+        Event.objects.all().delete()  # Not signalled: the cache still holds 2
+        self.assertEqual(self.client.get('/api/analytics/daily/', {'_': '2', 'utm': 'x'}).json()[0]['count'], 2)
+        self.assertEqual(self.client.get('/api/analytics/daily/', {'event_name': 'pageview'}).json(), [])
+
+    def test_keys_are_short_and_hashed(self):
+        cache = caches[settings.ANALYTICS_CACHE_ALIAS]
+        with mock.patch.object(cache, 'set', wraps=cache.set) as set_entry:
+            self.client.get('/api/analytics/daily/', {'event_name': 'page view ' * 50})
+        key = set_entry.call_args.args[0]
+        self.assertLess(len(key), 100)
+        self.assertNotIn(' ', key)
+
+    def test_long_ranges_are_stamped_by_month(self):
+        start, end = datetime(2025, 1, 15).date(), datetime(2026, 1, 14).date()
+        cache = caches[settings.ANALYTICS_CACHE_ALIAS]
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            generation = caching.window_generation(start, end)
+        # 17 days of January 2025, 11 whole months, 14 days of January 2026
+        self.assertEqual(len(get_many.call_args.args[0]), 17 + 11 + 14)
+        caching.invalidate_days({datetime(2025, 6, 10).date()})
+        self.assertNotEqual(caching.window_generation(start, end), generation)
+
+    def test_commands_warn_that_a_local_cache_misses_their_invalidations(self):
+        for shared in (False, True):
+            stderr = io.StringIO()
+            with mock.patch('api.caching.is_shared', return_value=shared):
+                call_command('sessionize', stdout=io.StringIO(), stderr=stderr)
+            self.assertEqual('ANALYTICS_CACHE_URL' in stderr.getvalue(), not shared)
+
+    def test_ingest_invalidates_the_days_it_lands_in(self):
+        self.store(2)
+        self.assertEqual(self.client.get('/api/analytics/daily/').json()[0]['count'], 2)
+        self.store(1)
+        self.assertEqual(self.client.get('/api/analytics/daily/').json()[0]['count'], 3)
+
+    def test_sessionizing_invalidates_traffic_sources(self):
+        self.store(1, user_id='visitor', utm_source='news')
+        self.assertEqual(self.client.get('/api/analytics/sources/').json()[0]['sessions'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            sessionizer.sessionize_batch(settle=timedelta(0))
+        sources = self.client.get('/api/analytics/sources/').json()
+        self.assertEqual(sources[0], {**sources[0], 'source': 'news', 'sessions': 1})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Event partitioning requires PostgreSQL.')
+@override_settings(EVENT_PARTITIONS_BEHIND=2)
+class PartitionTests(TestCase):
+
+    def store(self, *timestamps):
+        return store_events([
+            Event(**{**e, 'timestamp': timestamp})
+            for e, timestamp in zip(EventGenerator(seed=7).events(len(timestamps)), timestamps)
+        ])
+
+    def partition_of(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM api_event WHERE id = %s', [event.pk])
+            return cursor.fetchone()[0]
+
+    def test_partitions_adopt_rows_caught_by_the_default(self):
+        now = timezone.now()
+        current, garbage, future = self.store(now, now.replace(year=1990), now + timedelta(days=200))
+        partitions.convert_to_partitioned(interval='month', ahead=1)
+
+        # One bogus timestamp does not create partitions back to 1990
+        self.assertEqual(len(partitions.list_partitions()), 4)
+        self.assertEqual(self.partition_of(garbage), 'api_event_default')
+        self.assertEqual(self.partition_of(future), 'api_event_default')
+        self.assertNotEqual(self.partition_of(current), 'api_event_default')
+
+        # Later runs create the partition the default holds rows for
+        partitions.ensure_partitions(ahead=8, interval='month')
+        self.assertEqual(self.partition_of(future), partitions._partition_name(
+            timezone.localtime(future.timestamp).date(), 'month'
+        ))
+        self.assertEqual(Event.objects.count(), 3)
+
+
+class ExportEventsCommandTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.output = os.path.join(self.directory, 'events.csv')
+        self.state = os.path.join(self.directory, 'state.json')
+        store_events([Event(**e) for e in EventGenerator(seed=8).events(30)])
+
+    def export(self, **options):
+        call_command('export_events', output=self.output, state=self.state, chunk_size=4,
+                     stdout=io.StringIO(), **options)
+        with open(self.state) as f:
+            return json.load(f)
+
+    def rows(self, files):
+        rows = []
+        for path in files:
+            with gzip.open(path, 'rt', newline='') as f:
+                rows.extend(list(csv.reader(f))[1:])
+        return rows
+
+    def test_incremental_runs_add_files_and_never_overwrite(self):
+        state = self.export(gzip=True, max_bytes=600)
+        self.assertGreater(len(state['files']), 1)
+        store_events([Event(**{**e, 'timestamp': timezone.now()}) for e in EventGenerator(seed=9).events(5)])
+        state = self.export(gzip=True, max_bytes=600)
+        self.assertEqual(len(set(state['files'])), len(state['files']))
+        self.assertEqual(len(self.rows(state['files'])), 35)
+        # A run with nothing new writes no file
+        self.assertEqual(self.export(gzip=True)['files'], state['files'])
+
+    def test_interrupted_run_resumes_from_its_last_checkpoint(self):
+        writerow = SplitCSVWriter.writerow
+        calls = []
+
+        def crash_after_ten_rows(writer, row):
+            if len(calls) == 10:
+                raise KeyboardInterrupt
+            calls.append(row)
+            writerow(writer, row)
+
+        # The process dies: rows past the checkpoint are on disk, the file is not closed
+        with mock.patch.object(SplitCSVWriter, 'writerow', crash_after_ten_rows), \
+                mock.patch.object(SplitCSVWriter, 'close'), self.assertRaises(KeyboardInterrupt):
+            self.export(gzip=True)
+        with open(self.state) as f:
+            self.assertIsNotNone(json.load(f)['open_size'])
+
+        state = self.export(gzip=True)
+        self.assertEqual(len(state['files']), 1)
+        self.assertIsNone(state['open_size'])
+        rows = self.rows(state['files'])
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(len({tuple(row) for row in rows}), len(rows))
+
+
+class ImportSampleDataTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.csv_file = os.path.join(directory, 'events.csv')
+        now = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(self.csv_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['event_name', 'timestamp', 'received_at', 'url', 'path'])
+            for i in range(6):
+                writer.writerow(['pageview', now, now, f'https://example.com/{i}', f'/{i}'])
+
+    def checkpoint(self):
+        with open(f'{self.csv_file}.checkpoint') as f:
+            return json.load(f)['rows']
+
+    def run_import(self, *errors):
+        """Import the file; the n-th store_events call raises ``errors[n]`` unless it is None."""
+        errors = iter(errors)
+
+        def store(events):
+            error = next(errors, None)
+            if error is not None:
+                raise error
+            return store_events(events)
+
+        with mock.patch('api.management.commands.import_sample_data.store_events', store):
+            call_command('import_sample_data', self.csv_file, batch_size=2, resume=True, stdout=io.StringIO())
+
+    def test_lost_connection_keeps_the_checkpoint_at_the_last_committed_batch(self):
+        with self.assertRaises(CommandError):
+            self.run_import(None, OperationalError('gone'))
+        self.assertEqual(self.checkpoint(), 2)
+
+        self.run_import()
+        self.assertEqual(sorted(Event.objects.values_list('path', flat=True)), [f'/{i}' for i in range(6)])
+        self.assertFalse(os.path.exists(f'{self.csv_file}.checkpoint'))
+
+    def test_lost_connection_while_isolating_rows_stops_before_the_unstored_row(self):
+        rejected = IntegrityError('rejected')
+        with self.assertRaises(CommandError):
+            self.run_import(None, rejected, rejected, OperationalError('gone'))
+        self.assertEqual(self.checkpoint(), 3)
+
+        self.run_import()
+        self.assertEqual(Event.objects.count(), 5)
+
+
+class EventPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now().replace(microsecond=0)
+        # Ties on timestamp are ordered by id
+        store_events([
+            Event(event_name='pageview', timestamp=now - timedelta(minutes=minutes), received_at=now,
+                  url='https://example.com/', path='/')
+            for minutes in (0, 1, 1, 1, 2, 3, 3)
+        ])
+        self.expected = list(Event.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def page(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get(url, params).json()
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('OFFSET', query['sql'].upper())
+        return body
+
+    def test_next_and_previous_links_walk_every_event_once(self):
+        pages = [self.page('/api/events/', {'page_size': 3})]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        ids = [[event['id'] for event in page['results']] for page in pages]
+        self.assertEqual(ids, [self.expected[:3], self.expected[3:6], self.expected[6:]])
+
+        previous = self.page(pages[-1]['previous'])
+        self.assertEqual([event['id'] for event in previous['results']], self.expected[3:6])
+        first = self.page(previous['previous'])
+        self.assertEqual([event['id'] for event in first['results']], self.expected[:3])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/events/', {'cursor': 'garbage'}).status_code, 404)
+
+
+class ExportStreamTests(TestCase):
+
+    def setUp(self):
+        store_events([Event(**e) for e in EventGenerator(seed=11).events(25)])
+        self.factory = AsyncRequestFactory()
+
+    def sync_export(self, **params):
+        response = self.client.get('/api/events/export/', params)
+        return b''.join(response.streaming_content)
+
+    async def async_export(self, **params):
+        response = await async_views.export_events(self.factory.get('/api/events/export/', params))
+        self.assertTrue(response.is_async)
+        return [chunk async for chunk in response.streaming_content]
+
+    async def test_async_stream_matches_the_sync_export(self):
+        for params in ({'format': 'csv'}, {'format': 'ndjson', 'event_name': 'pageview'}, {'format': 'csv', 'gzip': 'true'}):
+            chunks = await self.async_export(**params)
+            self.assertEqual(b''.join(chunks), await sync_to_async(self.sync_export)(**params), params)
+
+    async def test_csv_header_is_the_first_chunk(self):
+        with mock.patch('api.views.EXPORT_CHUNK_SIZE', 10), mock.patch('api.async_views.EXPORT_CHUNK_SIZE', 10):
+            chunks = await self.async_export(format='csv')
+        columns = [field.attname for field in Event._meta.concrete_fields]
+        self.assertEqual(chunks[0].decode().strip(), ','.join(columns))
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks[1:]], [10, 10, 5])
+
+    async def test_malformed_request_is_rejected(self):
+        response = await async_views.export_events(self.factory.get('/api/events/export/', {'format': 'xml'}))
+        self.assertEqual(response.status_code, 400)
+
+
+class DistinctSketchTests(TestCase):
+
+    def events(self, users, day):
+        noon = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12)
+        return [
+            Event(event_name='pageview', timestamp=noon, received_at=noon,
+                  url='https://example.com/', path='/', user_id=f'visitor-{n}')
+            for n in users
+        ]
+
+    def test_ingest_updates_the_day_sketch_incrementally(self):
+        day = timezone.localdate()
+        store_events(self.events(range(100), day))
+        store_events(self.events(range(50, 150), day))
+        self.assertAlmostEqual(sketches.unique_users(day, day), 150, delta=150 * 3 * sketches.RELATIVE_ERROR)
+        self.assertAlmostEqual(
+            sketches.unique_users(day, day, dimension='event:pageview'), 150, delta=150 * 3 * sketches.RELATIVE_ERROR
+        )
+
+    def test_shards_of_concurrent_writers_are_unioned(self):
+        day = timezone.localdate()
+        for shard, users in enumerate((range(100), range(50, 150), range(100, 200))):
+            with mock.patch.object(sketches, 'worker_shard', return_value=shard):
+                store_events(self.events(users, day))
+        self.assertEqual(DistinctSketch.objects.filter(day=day, dimension='').count(), 3)
+        estimate = sketches.unique_users(day, day)
+        self.assertAlmostEqual(estimate, 200, delta=200 * 3 * sketches.RELATIVE_ERROR)
+        self.assertEqual(sketches.daily_unique_users(day, day), {day: estimate})
+
+        sketches.rebuild_day(day)
+        self.assertEqual(DistinctSketch.objects.filter(day=day, dimension='').count(), 1)
+        self.assertEqual(sketches.unique_users(day, day), estimate)
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class TopValuesTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now()
+
+    def pageviews(self, paths):
+        return [
+            Event(event_name='pageview', timestamp=self.now, received_at=self.now,
+                  url=f'https://example.com{path}', path=path, title=path.upper())
+            for path in paths
+        ]
+
+    def test_shards_merge_into_exact_counts_below_capacity(self):
+        for shard, paths in enumerate((['/a'] * 5 + ['/b'] * 2, ['/a'] * 3 + ['/c'])):
+            with mock.patch.object(heavy_hitters, 'worker_shard', return_value=shard):
+                store_events(self.pageviews(paths))
+        day = timezone.localdate()
+        rows, total, max_error = heavy_hitters.top_values('path', day, 10, end_date=day)
+        self.assertEqual([(row['value'], row['count']) for row in rows], [('/a', 8), ('/b', 2), ('/c', 1)])
+        self.assertEqual((total, max_error), (11, 0))
+        self.assertEqual(rows[0]['label'], '/A')
+
+    def test_limit_is_validated_and_clamped(self):
+        store_events(self.pageviews(f'/page-{n}' for n in range(20)))
+        counts = {
+            limit: len(self.client.get('/api/analytics/top/', {'limit': limit}).json()['results'])
+            for limit in ('-3', '0', '5', '100000')
+        }
+        self.assertEqual(counts, {'-3': 1, '0': 1, '5': 5, '100000': 20})
+        self.assertEqual(self.client.get('/api/analytics/top/', {'limit': 'abc'}).status_code, 400)
+
+
+class DimensionFieldTests(TestCase):
+
+    def setUp(self):
+        store_events([Event(**e) for e in EventGenerator(seed=14).events(50)])
+        self.paths = sorted(set(Event.objects.values_list('path', flat=True)))
+        dimensions.get_cache().clear()
+
+    def test_strings_round_trip_through_the_dictionary(self):
+        event = Event.objects.filter(path=self.paths[0]).first()
+        self.assertIsInstance(event.path, str)
+        self.assertEqual(event.path, self.paths[0])
+        self.assertEqual(Event.objects.get(pk=event.pk).url, event.url)
+        self.assertEqual(set(Event.objects.values_list('path', flat=True)), set(self.paths))
+        self.assertFalse(Event.objects.filter(path='/never-seen').exists())
+        self.assertFalse(dimensions.DimensionValue.objects.filter(value='/never-seen').exists())
+
+    def test_comparisons_use_the_strings(self):
+        low, high = self.paths[0], self.paths[-1]
+        self.assertEqual(
+            set(Event.objects.filter(path__gt=low).values_list('path', flat=True)), set(self.paths[1:])
+        )
+        self.assertEqual(
+            set(Event.objects.filter(path__range=(low, low)).values_list('path', flat=True)), {low}
+        )
+        self.assertEqual(Event.objects.filter(path__lte=high).count(), Event.objects.count())
+
+    def test_cold_cache_decodes_each_result_set_with_one_query(self):
+        with self.assertNumQueries(2):
+            rows = list(Event.objects.values('path', 'title', 'country'))
+        self.assertEqual(len(rows), 50)
+        self.assertTrue(all(isinstance(row['path'], str) for row in rows))
+
+        dimensions.get_cache().clear()
+        with self.assertNumQueries(2):
+            events = list(Event.objects.all())
+        self.assertEqual({event.path for event in events}, set(self.paths))
+
+        # Iterating: one query per chunk of 20 rows
+        dimensions.get_cache().clear()
+        with self.assertNumQueries(4):
+            rows = list(Event.objects.values_list('path', 'referrer').iterator(chunk_size=20))
+        self.assertEqual({path for path, _ in rows}, set(self.paths))
+
+    def test_async_iteration_decodes_in_chunks(self):
+        async def paths():
+            return [path async for path in Event.objects.values_list('path', flat=True).aiterator(chunk_size=20)]
+
+        with self.assertNumQueries(4):
+            rows = async_to_sync(paths)()
+        self.assertEqual(sorted(set(rows)), self.paths)
+
+
+class TimeRangeTests(TestCase):
+
+    def test_last_days_is_half_open_over_whole_local_days(self):
+        today = datetime(2025, 3, 10).date()
+        time_range = TimeRange.last_days(7, today=today)
+        self.assertEqual(time_range.start, timezone.make_aware(datetime(2025, 3, 3)))
+        self.assertEqual(time_range.end, timezone.make_aware(datetime(2025, 3, 11)))
+        self.assertEqual(time_range.start_date, datetime(2025, 3, 3).date())
+        self.assertEqual(time_range.end_date, today)
+
+    def test_date_end_includes_the_whole_day(self):
+        time_range = TimeRange.from_params({'start_date': '2025-02-20', 'end_date': '2025-02-25'})
+        self.assertEqual(time_range.start, timezone.make_aware(datetime(2025, 2, 20)))
+        self.assertEqual(time_range.end, timezone.make_aware(datetime(2025, 2, 26)))
+
+    def test_datetime_bounds_are_kept(self):
+        time_range = TimeRange.from_params({'end_date': '2025-02-25T10:30:00Z'})
+        self.assertIsNone(time_range.start)
+        self.assertEqual(time_range.end, datetime(2025, 2, 25, 10, 30, tzinfo=dt_timezone.utc))
+
+    def test_open_range_without_default_days(self):
+        time_range = TimeRange.from_params({})
+        self.assertIsNone(time_range.start)
+        self.assertIsNone(time_range.end)
+
+    def test_malformed_values_are_rejected(self):
+        for params in ({'start_date': 'yesterday'}, {'end_date': '2025-02-30'}, {'days': 'x'}):
+            with self.subTest(params=params), self.assertRaises(ValidationError):
+                TimeRange.from_params(params, default_days=7)
+
+    @override_settings(ANALYTICS_MAX_DAYS=30)
+    def test_out_of_range_values_are_rejected(self):
+        for params in (
+            {'days': '0'}, {'days': '-5'}, {'days': '31'}, {'days': '1000000'},
+            {'start_date': '2025-01-01', 'end_date': '2025-03-01'},
+            {'start_date': '2025-03-01', 'end_date': '2025-02-01'},
+            {'start_date': '0001-01-01'}, {'end_date': '9999-12-31'},
+        ):
+            with self.subTest(params=params), self.assertRaises(ValidationError):
+                TimeRange.from_params(params, default_days=7)
+        time_range = TimeRange.from_params({'days': '30'}, default_days=7)
+        self.assertEqual((time_range.end_date - time_range.start_date).days, 30)
+        TimeRange.from_params({'start_date': '2025-01-01', 'end_date': '2025-01-31'}, default_days=7)
+
+    def test_filter_compares_the_raw_column(self):
+        queryset = TimeRange.last_days(7).filter(Event.objects.all())
+        sql = str(queryset.query)
+        self.assertIn('"timestamp" >=', sql)
+        self.assertIn('"timestamp" <', sql)
+        self.assertNotIn('::date', sql)
+
+    def test_bad_range_is_a_client_error(self):
+        client = APIClient()
+        response = client.get('/api/analytics/daily/', {'start_date': 'nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start_date', response.data)
+        response = client.get('/api/analytics/daily/', {'days': 1000000})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('days', response.data)
+
+
+# Tables whose dashboard scans must stay on an index
+PLAN_CHECKED_TABLES = ('api_event', 'api_session', 'api_dailyrollup')
+
+
+def dashboard_requests(today):
+    """(endpoint, query parameters, settings) the dashboard issues."""
+    week_ago = (today - timedelta(days=7)).isoformat()
+    return [
+        ('/api/events/', {'start_date': week_ago, 'end_date': today.isoformat()}, {}),
+        ('/api/events/', {'path': '/page/3', 'start_date': week_ago}, {}),
+        ('/api/analytics/daily/', {}, {'ANALYTICS_USE_ROLLUPS': False}),
+        ('/api/analytics/daily/', {'event_name': 'click'}, {'ANALYTICS_USE_ROLLUPS': False}),
+        ('/api/analytics/daily/', {}, {'ANALYTICS_USE_ROLLUPS': True}),
+        ('/api/analytics/countries/', {}, {'ANALYTICS_USE_ROLLUPS': False}),
+        ('/api/analytics/countries/', {}, {'ANALYTICS_USE_ROLLUPS': True}),
+        ('/api/analytics/sources/', {}, {}),
+        ('/api/analytics/pages/', {'exact': 'true'}, {'ANALYTICS_USE_ROLLUPS': False}),
+        ('/api/analytics/pages/', {}, {'ANALYTICS_USE_ROLLUPS': True}),
+        ('/api/analytics/top-pages/', {}, {}),
+    ]
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class QueryPlanTests(TestCase):
+    """
+    Run the dashboard queries against a year of representative data and
+    fail if the plan of any of them reads a whole events, sessions or
+    rollup table instead of an index range.
+    """
+
+    DAYS = 365
+    EVENTS_PER_DAY = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        today = timezone.localdate()
+        paths = [f'/page/{i}' for i in range(50)]
+        countries = [f'C{i}' for i in range(20)]
+        names = ['pageview'] * 7 + ['click', 'form_submit', 'scroll_depth']
+        sources = [None, 'google', 'newsletter', 'twitter', 'facebook']
+
+        events = []
+        sessions = []
+        for day in range(cls.DAYS):
+            midnight = timezone.make_aware(datetime.combine(today - timedelta(days=day), datetime.min.time()))
+            for _ in range(cls.EVENTS_PER_DAY):
+                timestamp = midnight + timedelta(seconds=rng.randrange(86400))
+                path = rng.choice(paths)
+                events.append(Event(
+                    event_name=rng.choice(names),
+                    timestamp=timestamp,
+                    received_at=timestamp,
+                    url=f'https://example.com{path}',
+                    path=path,
+                    title=path.title(),
+                    utm_source=rng.choice(sources),
+                    country=rng.choice(countries),
+                    user_id=f'user-{rng.randrange(2000)}',
+                ))
+            for _ in range(cls.EVENTS_PER_DAY // 5):
+                started_at = midnight + timedelta(seconds=rng.randrange(86400))
+                sessions.append(Session(
+                    user_id=f'user-{rng.randrange(2000)}',
+                    started_at=started_at,
+                    ended_at=started_at + timedelta(minutes=5),
+                    landing_path=rng.choice(paths),
+                    exit_path=rng.choice(paths),
+                    utm_source=rng.choice(sources),
+                ))
+
+        with dimensions.interned(events):
+            events = Event.objects.bulk_create(events, batch_size=5000)
+        rollups.record_events(events)
+        Session.objects.bulk_create(sessions, batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_dashboard_queries_use_indexes(self):
+        for url, params, overrides in dashboard_requests(timezone.localdate()):
+            with self.subTest(url=url, params=params, settings=overrides):
+                with override_settings(**overrides), CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+
+                checked = [q['sql'] for q in queries if _reads_checked_table(q['sql'])]
+                self.assertTrue(checked, 'no query reached the checked tables')
+                for sql in checked:
+                    scans = _full_scans(sql)
+                    self.assertFalse(scans, f'{", ".join(scans)} fully scanned by:\n{sql}')
+
+
+def _reads_checked_table(sql):
+    return sql.lstrip().upper().startswith('SELECT') and any(
+        f'"{table}"' in sql for table in PLAN_CHECKED_TABLES
+    )
+
+
+def _full_scans(sql):
+    """Checked tables (or their partitions) that the plan of ``sql`` reads in full."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return sorted(set(_pg_seq_scans(plan[0]['Plan'])))
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return sorted({
+                detail.split()[1] for *_, detail in cursor.fetchall()
+                if detail.startswith('SCAN ') and _is_checked(detail.split()[1])
+            })
+    raise AssertionError(f'no plan check for {connection.vendor}')
+
+
+def _pg_seq_scans(node):
+    if node.get('Node Type') == 'Seq Scan' and _is_checked(node.get('Relation Name', '')):
+        yield node['Relation Name']
+    for child in node.get('Plans', ()):
+        yield from _pg_seq_scans(child)
+
+
+def _is_checked(table):
+    # Partitions of api_event are named api_event_p<period> / api_event_default
+    return any(table == t or table.startswith(f'{t}_') for t in PLAN_CHECKED_TABLES)
+
+
+def run_inline(fn, *args, **kwargs):
+    """Stand-in for ``api.dashboard._submit`` running the widget on the test's connection."""
+    future = Future()
+    try:
+        future.set_result(dashboard._timed(fn, *args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class DashboardTests(TestCase):
+    URLS = {
+        'daily': '/api/analytics/daily/',
+        'countries': '/api/analytics/countries/',
+        'sources': '/api/analytics/sources/',
+        'pages': '/api/analytics/pages/',
+        'top_pages': '/api/analytics/top-pages/',
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        store_events([Event(**e) for e in EventGenerator(seed=16).events(60)])
+        for patcher in (mock.patch('api.dashboard._submit', run_inline),
+                        mock.patch('api.dashboard.close_old_connections')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_widgets_match_their_endpoints(self):
+        response = self.client.get('/api/analytics/dashboard/', {'days': 30})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(set(body['widgets']), set(self.URLS))
+        self.assertLessEqual(set(self.URLS), set(body['timings']))
+        for name, url in self.URLS.items():
+            self.assertEqual(body['widgets'][name], self.client.get(url, {'days': 30}).json(), name)
+
+    def test_selected_widgets_only(self):
+        body = self.client.get('/api/analytics/dashboard/', {'widgets': 'sources,top_pages'}).json()
+        self.assertEqual(set(body['widgets']), {'sources', 'top_pages'})
+        self.assertNotIn('shared_scan', body['timings'])
+        self.assertEqual(self.client.get('/api/analytics/dashboard/', {'widgets': 'daily,bogus'}).status_code, 400)
+
+    def test_failed_widget_answers_500_with_the_others(self):
+        with mock.patch('api.widgets.traffic_sources', side_effect=RuntimeError('boom')), \
+                self.assertLogs('api.dashboard', 'ERROR'):
+            response = self.client.get('/api/analytics/dashboard/')
+        self.assertEqual(response.status_code, 500)
+        body = response.json()
+        self.assertIsNone(body['widgets']['sources'])
+        self.assertEqual(body['errors'], {'sources': 'boom'})
+        self.assertIsNotNone(body['widgets']['daily'])
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False, API_ASYNC_VIEWS=True)
+class AsyncViewTests(TransactionTestCase):
+    """The API_ASYNC_VIEWS routes, through the ASGI handler."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._route(async_views=True)
+        # As with API_ASYNC_VIEWS in production (see webAnalytics.settings),
+        # pool threads close their connection after each query
+        cls.conn_max_age = connections.settings['default']['CONN_MAX_AGE']
+        connections.settings['default']['CONN_MAX_AGE'] = 0
+
+    @classmethod
+    def tearDownClass(cls):
+        connections.settings['default']['CONN_MAX_AGE'] = cls.conn_max_age
+        cls._route(async_views=False)
+        super().tearDownClass()
+
+    @staticmethod
+    def _route(async_views):
+        with override_settings(API_ASYNC_VIEWS=async_views):
+            importlib.reload(api_urls)
+        # The project urlconf holds a resolver of the old api.urls patterns
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def setUp(self):
+        store_events([Event(**e) for e in EventGenerator(seed=17).events(60)])
+
+    async def test_analytics_match_the_sync_views(self):
+        for url in ('/api/analytics/daily/', '/api/analytics/countries/', '/api/analytics/top-pages/'):
+            response = await self.async_client.get(url, {'limit': '3'})
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func), url)
+            expected = await sync_to_async(APIClient().get)(url, {'limit': '3'})
+            self.assertEqual(response.json(), expected.json(), url)
+
+    async def test_queries_run_on_their_own_pool(self):
+        threads = []
+
+        def record_thread(time_range, event_name=None):
+            threads.append(threading.current_thread().name)
+            return []
+
+        with mock.patch('api.widgets.event_counts_by_day', record_thread):
+            response = await self.async_client.get('/api/analytics/daily/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(threads[0].startswith('async-views'), threads)
+
+    async def test_limits_are_validated_and_clamped(self):
+        for url in ('/api/analytics/countries/', '/api/analytics/top-pages/', '/api/analytics/dashboard/'):
+            response = await self.async_client.get(url, {'limit': 'abc'})
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn('limit', response.json())
+        response = await self.async_client.get('/api/analytics/top-pages/', {'limit': '-3'})
+        self.assertEqual(len(response.json()), 1)
+
+    async def test_track_endpoints_store_events(self):
+        now = timezone.now().isoformat()
+        event = {'event_name': 'pageview', 'timestamp': now, 'received_at': now,
+                 'url': 'https://example.com/async', 'path': '/async'}
+        response = await self.async_client.post('/api/track/', event, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.post(
+            '/api/track/batch/', [event, {'event_name': 'pageview'}], content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.json()['results']], [201, 400])
+        self.assertEqual(await Event.objects.filter(path='/async').acount(), 2)
+
+
+def sse_messages(chunks):
+    """Parse a Server-Sent Events body into one dict of fields per message."""
+    body = ''.join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks)
+    assert body.endswith('\n\n'), body
+    return [dict(line.split(': ', 1) for line in message.split('\n')) for message in body[:-2].split('\n\n')]
+
+
+@override_settings(TRACK_INGEST_MODE='sync', LIVE_COUNTERS_SHARED=False, LIVE_STREAM_SECONDS=0, LIVE_PUSH_INTERVAL=0.5)
+class LiveStreamTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(live, '_counters', live.LiveCounters())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        now = timezone.now().isoformat()
+        batch = [
+            {'event_name': 'pageview', 'timestamp': now, 'received_at': now, 'url': f'https://example.com{path}',
+             'path': path, 'user_id': user}
+            for path, user in (('/a', 'u1'), ('/a', 'u2'), ('/b', 'u1'))
+        ]
+        self.assertEqual(APIClient().post('/api/track/batch/', batch, format='json').status_code, 201)
+
+    def check(self, messages):
+        retry, counters = messages
+        self.assertEqual(retry, {'retry': '500'})
+        self.assertEqual(counters['event'], 'counters')
+        data = json.loads(counters['data'])
+        self.assertEqual(data['active_visitors'], 2)
+        self.assertEqual(sum(m['pageviews'] for m in data['pageviews_per_minute']), 3)
+        self.assertEqual([(p['path'], p['views']) for p in data['top_paths']['5m']], [('/a', 2), ('/b', 1)])
+
+    def test_stream_sends_counters_as_server_sent_events(self):
+        response = self.client.get('/api/live/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        self.check(sse_messages(response.streaming_content))
+
+    def test_async_stream_sends_the_same_messages(self):
+        async def collect():
+            return [chunk async for chunk in live.astream()]
+
+        self.check(sse_messages(async_to_sync(collect)()))
+
+
+class SyntheticEventsTests(TestCase):
+
+    def test_same_seed_gives_the_same_stream(self):
+        first = list(EventGenerator(seed=7).events(500))
+        self.assertEqual(len(first), 500)
+        self.assertEqual(first, list(EventGenerator(seed=7).events(500)))
+        self.assertNotEqual(first, list(EventGenerator(seed=8).events(500)))
+
+    def test_payloads_are_valid_events(self):
+        for event in EventGenerator(seed=1).events(50):
+            serializer = EventSerializer(data=EventGenerator.payload(event))
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_page_popularity_is_skewed(self):
+        pageviews = [e['path'] for e in EventGenerator(seed=3, paths=500).events(5000) if e['event_name'] == 'pageview']
+        # Under the Zipf curve the ten most popular of 500 pages take about half the views
+        top_ten = sum(path in EventGenerator(paths=500).paths[:10] for path in pageviews)
+        self.assertGreater(top_ten / len(pageviews), 0.4)
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5.0], 95), 5.0)
+        self.assertIsNone(percentile([], 50))
+
+
+SAMPLE_LINE = re.compile(r'^([a-z_]+)(\{(?:[a-z_]+="(?:[^"\\]|\\.)*",?)*\})? (-?[0-9.e+-]+|\+Inf)$')
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False, TRACK_INGEST_MODE='sync')
+class PrometheusMetricsTests(TestCase):
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line.startswith('#'):
+                self.assertRegex(line, r'^# (HELP|TYPE) webanalytics_[a-z_]+ .+$')
+                continue
+            match = SAMPLE_LINE.match(line)
+            self.assertIsNotNone(match, line)
+            samples[match[1] + (match[2] or '')] = float(match[3])
+        return samples
+
+    def test_exposition_format(self):
+        self.client.get('/api/analytics/daily/')
+        self.client.get('/no/such/page/')
+        samples = self.scrape()
+
+        requests = samples['webanalytics_requests_total{view="daily-events",method="GET",status="200"}']
+        self.assertGreaterEqual(requests, 1)
+        self.assertIn('webanalytics_requests_total{view="unmatched",method="GET",status="404"}', samples)
+        buckets = [
+            value for name, value in samples.items()
+            if name.startswith('webanalytics_request_db_queries_bucket{view="daily-events",')
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], samples['webanalytics_request_db_queries_count{view="daily-events"}'])
+        self.assertEqual(metrics._labels(('path',), ('a"b\\c\n',)), '{path="a\\"b\\\\c\\n"}')
+
+    def test_ingest_outcomes_are_counted(self):
+        accepted = 'webanalytics_ingest_events_total{endpoint="batch",outcome="accepted"}'
+        rejected = 'webanalytics_ingest_events_total{endpoint="batch",outcome="rejected"}'
+        before = self.scrape()
+        now = timezone.now().isoformat()
+        event = {'event_name': 'pageview', 'timestamp': now, 'received_at': now,
+                 'url': 'https://example.com/', 'path': '/'}
+        self.client.post('/api/track/batch/', [event, event, {}], content_type='application/json')
+        after = self.scrape()
+        self.assertEqual(after[accepted] - before.get(accepted, 0), 2)
+        self.assertEqual(after[rejected] - before.get(rejected, 0), 1)
+        batches = 'webanalytics_ingest_batch_size_count'
+        self.assertEqual(after[batches] - before.get(batches, 0), 1)
+
+
+class FastSerializationTests(TestCase):
+
+    PAYLOAD = {
+        'event_name': 'pageview',
+        'timestamp': '2025-01-02T03:04:05.123456+02:00',
+        'received_at': '2025-01-02T01:04:06Z',
+        'url': 'https://example.com/pricing?plan=pro',
+        'path': ' /pricing ',
+        'referrer': '',
+        'title': None,
+        'country': 'US',
+    }
+
+    def assertSameAsSerializer(self, data):
+        serializer = EventSerializer(data=data)
+        validated, errors = validate_event(data)
+        if serializer.is_valid():
+            self.assertEqual(errors, {})
+            self.assertEqual(validated, dict(serializer.validated_data))
+        else:
+            self.assertEqual(json.loads(JSONRenderer().render(errors)), json.loads(JSONRenderer().render(serializer.errors)))
+
+    def test_validator_matches_the_serializer(self):
+        self.assertSameAsSerializer(self.PAYLOAD)
+        for name, values in {
+            'event_name': [None, '', 'unknown', 1],
+            'timestamp': ['', 'yesterday', '2025-02-30T00:00:00', '2025-01-01', '2025-01-01T00:00', 5],
+            'url': [None, '  ', 'not a url', 'https://example.com/' + 'a' * 300, 'https://example.com/\x00', True],
+            'referrer': [None, 'nope', 'https://ok.example/'],
+            'title': ['  ', '\ud800', 'x' * 256, 42],
+        }.items():
+            for value in values:
+                with self.subTest(name=name, value=value):
+                    self.assertSameAsSerializer({**self.PAYLOAD, name: value})
+        for name in ('event_name', 'url', 'country'):
+            self.assertSameAsSerializer({k: v for k, v in self.PAYLOAD.items() if k != name})
+        for data in ([], 'event', None):
+            self.assertSameAsSerializer(data)
+
+    def test_representation_matches_the_serializer(self):
+        validated, _ = validate_event(self.PAYLOAD)
+        event = Event.objects.create(**validated)
+        expected = JSONRenderer().render(EventSerializer(event).data)
+        self.assertEqual(FastJSONRenderer().render(event_data(event)), expected)
+        rows = event_rows(Event.objects.values(*EVENT_FIELDS))
+        self.assertEqual(FastJSONRenderer().render(rows), JSONRenderer().render([EventSerializer(event).data]))
+
+    def test_request_stats_are_released_when_the_view_raises(self):
+        def fail(request):
+            metrics.current().add_query('SELECT 1', 0.001)
+            raise RuntimeError('boom')
+
+        async def afail(request):
+            return fail(request)
+
+        request = AsyncRequestFactory().get('/api/events/')
+        with self.settings(METRICS_ENABLED=True):
+            with self.assertRaises(RuntimeError):
+                MetricsMiddleware(fail)(request)
+            self.assertIsNone(metrics.current())
+            with self.assertRaises(RuntimeError):
+                async_to_sync(MetricsMiddleware(afail))(request)
+            self.assertIsNone(metrics.current())
+
+
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.read = replica_reads(lambda: self.router.db_for_read(Event))
+        self.lag = mock.Mock(return_value=0.5)
+        for patcher in (mock.patch('api.routers.replica_configured', return_value=True),
+                        mock.patch('api.routers.replica_lag', self.lag),
+                        mock.patch.dict(routers._lag_state, checked_at=None, usable=False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_reads_stay_on_the_primary_without_a_replica(self):
+        with mock.patch('api.routers.replica_configured', return_value=False):
+            self.assertEqual(self.router.db_for_read(Event), 'default')
+            self.assertEqual(self.read(), 'default')
+        self.assertEqual(self.router.db_for_write(Event), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'api'))
+
+    def test_replica_reads_go_to_the_replica(self):
+        self.assertEqual(self.read(), 'replica')
+        self.assertEqual(self.router.db_for_read(Event), 'default')
+        self.assertEqual(self.router.db_for_write(Event), 'default')
+        # Inside a transaction on the primary reads stay there
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.read(), 'default')
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=10, REPLICA_LAG_CHECK_INTERVAL=5)
+    def test_lagging_or_unreachable_replica_falls_back_to_the_primary(self):
+        self.assertEqual(self.read(), 'replica')
+        routers._lag_state['checked_at'] -= 5
+        self.lag.return_value = 30.0
+        with self.assertLogs('api.routers', 'WARNING'):
+            self.assertEqual(self.read(), 'default')
+        # The lag is checked at most every REPLICA_LAG_CHECK_INTERVAL seconds
+        self.lag.return_value = 0.0
+        self.assertEqual(self.read(), 'default')
+        self.assertEqual(self.lag.call_count, 2)
+
+        routers._lag_state['checked_at'] -= 5
+        self.assertEqual(self.read(), 'replica')
+        routers._lag_state['checked_at'] -= 5
+        self.lag.side_effect = OperationalError('replica is down')
+        with self.assertLogs('api.routers', 'WARNING'):
+            self.assertEqual(self.read(), 'default')
+        routers._lag_state['checked_at'] -= 5
+        self.lag.side_effect, self.lag.return_value = None, None
+        self.assertEqual(self.read(), 'default')
+
+
+class RetentionTests(TestCase):
+
+    def test_expiring_day_is_folded_once_then_deleted(self):
+        day = timezone.localdate() - timedelta(days=100)
+        noon = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12)
+        events = [Event(**{**e, 'timestamp': noon}) for e in EventGenerator(seed=4).events(60)]
+        # Half the events bypass ingest, as if stored before rollups existed
+        with dimensions.interned(events[:30]):
+            Event.objects.bulk_create(events[:30])
+        store_events(events[30:])
+
+        folded, deleted = retention.expire_raw_day(day, batch_size=7)
+        self.assertEqual((folded, deleted), (30, 60))
+        self.assertFalse(Event.objects.exists())
+        self.assertEqual(sum(DailyRollup.objects.filter(bucket=day).values_list('count', flat=True)), 60)
+        # Rollups holding more than the remaining raw rows are left alone
+        self.assertEqual(rollups.fold_day(day), 0)
+        self.assertEqual(retention.expiring_days(timezone.localdate()), [])
+
+    def test_dry_run_reports_both_tiers(self):
+        day = timezone.localdate() - timedelta(days=100)
+        noon = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12)
+        store_events([Event(**{**e, 'timestamp': noon}) for e in EventGenerator(seed=4).events(10)])
+        rows = DailyRollup.objects.filter(bucket=day).count()
+        stdout = io.StringIO()
+        call_command('apply_retention', raw_days=50, hourly_days=50, aggregate_days=60, dry_run=True,
+                     stdout=stdout, stderr=io.StringIO())
+        output = stdout.getvalue()
+        self.assertIn('raw events of 50 days', output)
+        self.assertIn(f'Would delete {rows} expired DailyRollup rows', output)
+        self.assertIn('expired HourlyRollup rows', output)
+        self.assertEqual(Event.objects.count(), 10)
+        self.assertEqual(DailyRollup.objects.filter(bucket=day).count(), rows)
+
+
+class EventAdminTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        store_events([Event(**e) for e in EventGenerator(seed=5, days=3).events(40)])
+
+    def test_changelist_avoids_full_table_queries(self):
+        path = Event.objects.first().path
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/admin/api/event/', {'q': path[:3], 'country': 'US'})
+        self.assertEqual(response.status_code, 200)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('%%%s' % path[:3], sql)
+
+    def test_filter_choices_come_from_the_dictionary(self):
+        countries = set(Event.objects.exclude(country=None).values_list('country', flat=True))
+        cache = CachedChoices('country')
+        self.assertEqual(set(cache.get()), countries)
+        with self.assertNumQueries(0):
+            cache.get()
+
+
+class FunnelTests(TestCase):
+    STEPS = [{'event_name': 'pageview', 'path': '/pricing'}, {'event_name': 'click'}, {'event_name': 'form_submit'}]
+
+    def setUp(self):
+        caches[settings.ANALYTICS_CACHE_ALIAS].clear()
+        self.day = timezone.localdate() - timedelta(days=2)
+        self.noon = timezone.make_aware(datetime.combine(self.day, datetime.min.time())) + timedelta(hours=12)
+        visits = {
+            # Converts, the click reusing the second pricing view
+            'a': [('pageview', '/pricing', 0), ('pageview', '/pricing', 50), ('click', '/pricing', 70),
+                  ('form_submit', '/pricing', 80)],
+            # Submits before clicking, then times out
+            'b': [('pageview', '/pricing', 0), ('form_submit', '/pricing', 10), ('click', '/pricing', 20),
+                  ('form_submit', '/pricing', 200)],
+            # Never sees the pricing page
+            'c': [('pageview', '/', 0), ('click', '/', 10), ('form_submit', '/', 20)],
+        }
+        store_events([
+            Event(event_name=name, path=path, url=f'https://example.com{path}', user_id=user,
+                  timestamp=self.noon + timedelta(seconds=offset), received_at=self.noon)
+            for user, events in visits.items() for name, path, offset in events
+        ])
+
+    def test_counts_follow_step_order_and_window(self):
+        funnel = Funnel(self.STEPS, window=timedelta(seconds=100))
+        self.assertEqual(funnel.count_day(self.day), [2, 2, 1])
+        self.assertEqual(funnel.count_day(self.day - timedelta(days=1)), [0, 0, 0])
+
+    def test_endpoint_reuses_cached_days(self):
+        params = {'steps': json.dumps(self.STEPS), 'window': 100, 'days': 3}
+        response = APIClient().get('/api/analytics/funnel/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['visitors'] for row in response.data['results']], [2, 2, 1])
+        self.assertEqual(response.data['results'][2]['step_conversion_rate'], 50.0)
+        with self.assertNumQueries(0):
+            APIClient().get('/api/analytics/funnel/', params)
+        response = APIClient().get('/api/analytics/funnel/', {**params, 'steps': '[{"path": "/"}]'})
+        self.assertEqual(response.status_code, 400)
+        for window in ('0', str(10 ** 21), 'soon'):
+            response = APIClient().get('/api/analytics/funnel/', {**params, 'window': window})
+            self.assertEqual(response.status_code, 400, window)
+            self.assertIn('window', response.json())
+        self.assertEqual(APIClient().get('/api/analytics/funnel/', {**params, 'days': -5}).status_code, 400)
+
+    @override_settings(FUNNEL_MAX_DAYS=5, RETENTION_RAW_DAYS=1)
+    def test_ranges_are_capped_and_expired_days_not_scanned(self):
+        params = {'steps': json.dumps(self.STEPS), 'window': 100}
+        response = APIClient().get('/api/analytics/funnel/', {**params, 'days': 100000})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('days', response.json())
+        # The entry day is past the raw retention: reported, never queried
+        params.update(start_date=(self.day - timedelta(days=4)).isoformat(), end_date=self.day.isoformat())
+        with self.assertNumQueries(0):
+            response = APIClient().get('/api/analytics/funnel/', params)
+        self.assertEqual(len(response.data['days']), 5)
+        self.assertEqual([row['visitors'] for row in response.data['results']], [0, 0, 0])
@@ -1,23 +1,39 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under ASGI the ingest and analytics endpoints can be served by native async views
+if settings.API_ASYNC_VIEWS:
+    from . import async_views as endpoint_views
+else:
+    endpoint_views = views
+
 urlpatterns = [
     # Keep the hello_world endpoint for testing
     path('hello/', views.hello_world, name='hello_world'),
     
     # Event endpoints
     path('events/', views.EventList.as_view(), name='event-list'),
+    path('events/export/', endpoint_views.export_events, name='event-export'),
     path('events/<int:pk>/', views.EventDetail.as_view(), name='event-detail'),
     
     # Analytics endpoints
-    path('analytics/daily/', views.event_count_by_day, name='daily-events'),
-    path('analytics/countries/', views.page_views_by_country, name='country-views'),
-    path('analytics/top-pages/', views.top_pages, name='top-pages'),
+    path('analytics/daily/', endpoint_views.event_count_by_day, name='daily-events'),
+    path('analytics/countries/', endpoint_views.page_views_by_country, name='country-views'),
+    path('analytics/top-pages/', endpoint_views.top_pages, name='top-pages'),
     # Add these to your api/urls.py file
-    path('analytics/sources/', views.traffic_sources, name='traffic-sources'),
-    path('analytics/pages/', views.page_metrics, name='page-metrics'),
-    path('analytics/top-pages/', views.top_pages, name='top-pages'),            
+    path('analytics/sources/', endpoint_views.traffic_sources, name='traffic-sources'),
+    path('analytics/pages/', endpoint_views.page_metrics, name='page-metrics'),
+    path('analytics/top/', views.top_values, name='top-values'),
+    path('analytics/funnel/', views.funnel, name='funnel'),
+    path('analytics/dashboard/', endpoint_views.dashboard, name='dashboard'),
+    path('analytics/top-pages/', endpoint_views.top_pages, name='top-pages'),            
+    
+    # Live counters
+    path('live/', views.live_counters, name='live-counters'),
+    path('live/stream/', endpoint_views.live_stream, name='live-stream'),
     
     # Tracking endpoint
-    path('track/', views.track_event, name='track-event'),
+    path('track/', endpoint_views.track_event, name='track-event'),
+    path('track/batch/', endpoint_views.track_batch, name='track-batch'),
 ]
\ No newline at end of file
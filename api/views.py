@@ -1,54 +1,200 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.generics import ListCreateAPIView, RetrieveAPIView
-from django.db.models import Count
-from django.db.models.functions import TruncDate
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from django.views.decorators.http import require_GET
 from .models import Event
-from .serializers import EventSerializer
-from datetime import timedelta
-from django.utils import timezone
+from .serializers import EVENT_FIELDS, EventSerializer, event_data, event_rows, validate_event
+from .parsers import NDJSONParser
+from .pagination import EventCursorPagination
+from .ingest import batch_status, store_events, validate_batch
+from .buffer import BufferFull, get_buffer
+from .caching import cached_analytics
+from .queries import TimeRange, parse_limit
+from .routers import replica_reads
+from . import dashboard as dashboard_widgets, funnels, heavy_hitters, live, metrics, widgets
+import csv
+import io
+import zlib
+
+TOP_PAGES_MAX_LIMIT = 1000
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
 
 # Keep the hello_world endpoint for testing
 @api_view(['GET'])
 def hello_world(request):
     return Response({"message": "Hello World"})
 
+def filter_events(queryset, params):
+    """
+    Apply the events API filters (event_name, path, start_date, end_date)
+    from a query parameter mapping.
+    """
+    # Filter by event name
+    event_name = params.get('event_name', None)
+    if event_name:
+        queryset = queryset.filter(event_name=event_name)
+    
+    # Filter by path
+    path = params.get('path', None)
+    if path:
+        queryset = queryset.filter(path=path)
+    
+    # Filter by date range: a date end_date includes that whole day
+    return TimeRange.from_params(params).filter(queryset)
+
 class EventList(ListCreateAPIView):
     """
     List all events or create a new event.
+    
+    Listing is keyset-paginated newest first; follow the opaque `next` and
+    `previous` links, optionally with `page_size`.
     """
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    pagination_class = EventCursorPagination
     
     def get_queryset(self):
         """
         Optionally restricts the returned events by filtering
         against query parameters in the URL.
         """
-        queryset = Event.objects.all()
-        
-        # Filter by event name
-        event_name = self.request.query_params.get('event_name', None)
-        if event_name:
-            queryset = queryset.filter(event_name=event_name)
-        
-        # Filter by path
-        path = self.request.query_params.get('path', None)
-        if path:
-            queryset = queryset.filter(path=path)
-        
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
+        return filter_events(Event.objects.all(), self.request.query_params)
+    
+    @replica_reads
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
+    def list(self, request, *args, **kwargs):
+        # Pages go from values() rows straight to dicts: no model instances
+        # or per-field serializer calls for up to EVENTS_MAX_PAGE_SIZE rows
+        queryset = self.filter_queryset(self.get_queryset()).values(*EVENT_FIELDS)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(event_rows(page))
+    
+    def perform_create(self, serializer):
+        # Through the ingest path, so rollups, sketches and caches see the event
+        serializer.instance, = store_events([Event(**serializer.validated_data)])
+        live.record([serializer.instance])
+
+@require_GET
+@replica_reads
+def export_events(request):
+    """
+    Stream raw events as NDJSON (default) or CSV without building the result
+    in memory.
+    
+    Rows are read through a server-side cursor in chunks and written to the
+    response as they arrive, so memory stays flat and the first byte (the
+    CSV header) goes out immediately regardless of export size. Under ASGI,
+    api.async_views.export_events streams the same bytes from an async
+    iterator.
+    
+    Query parameters:
+    - format: ndjson or csv
+    - gzip: true to gzip-compress the stream
+    - event_name, path, start_date, end_date: same filters as /api/events/
+    """
+    export = _export_query(request)
+    if isinstance(export, HttpResponse):
+        return export
+    rows, columns, export_format, compress = export
+    
+    chunks = _export_chunks(_row_chunks(rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)), columns, export_format)
+    if compress:
+        chunks = _gzip_chunks(chunks)
+    return _export_response(chunks, export_format, compress)
+
+def _export_query(request):
+    """
+    Validate an export request. Returns ``(rows, columns, format, compress)``,
+    ``rows`` being a values_list queryset pinned to its database, or a 400
+    response.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return JsonResponse({'detail': 'format must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+    compress = _is_true(request.GET.get('gzip'))
+    try:
+        queryset = filter_events(Event.objects.all(), request.GET)
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+    
+    columns = [field.attname for field in Event._meta.concrete_fields]
+    rows = (
+        # Pin the database now: the stream is read after the view returns
+        queryset.using(queryset.db)
+        .order_by('-timestamp', '-id')
+        .values_list(*columns)
+    )
+    return rows, columns, export_format, compress
+
+def _export_response(chunks, export_format, compress):
+    filename = f'events.{export_format}' + ('.gz' if compress else '')
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/gzip' if compress else EXPORT_CONTENT_TYPES[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _row_chunks(rows):
+    """Group rows into lists of EXPORT_CHUNK_SIZE."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _export_encoder(columns, export_format):
+    """``(header, encode)``: the bytes opening the export, and a function encoding a list of rows."""
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
         
-        if start_date:
-            queryset = queryset.filter(timestamp__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(timestamp__lte=end_date)
+        def encode(rows):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            return buffer.getvalue().encode('utf-8')
         
-        return queryset
+        return encode([columns]), encode
+    
+    encoder = DjangoJSONEncoder()
+    
+    def encode(rows):
+        return ''.join(encoder.encode(dict(zip(columns, row))) + '\n' for row in rows).encode('utf-8')
+    
+    return b'', encode
+
+def _export_chunks(row_chunks, columns, export_format):
+    """Encode lists of rows into byte chunks, starting with the header."""
+    header, encode = _export_encoder(columns, export_format)
+    if header:
+        yield header
+    for rows in row_chunks:
+        yield encode(rows)
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        # Sync-flush so every chunk reaches the client as it is produced
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
 
 class EventDetail(RetrieveAPIView):
     """
@@ -56,8 +202,14 @@ class EventDetail(RetrieveAPIView):
     """
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    
+    @replica_reads
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 @api_view(['GET'])
+@replica_reads
+@cached_analytics(default_days=7)
 def event_count_by_day(request):
     """
     Get event counts grouped by day.
@@ -65,268 +217,325 @@ def event_count_by_day(request):
     Query parameters:
     - event_name: Filter by event type
     - days: Number of days to include (default: 7)
+    - start_date, end_date: explicit range instead of days
     """
-    days = int(request.query_params.get('days', 7))
+    time_range = TimeRange.from_params(request.query_params, default_days=7)
     event_name = request.query_params.get('event_name', None)
     
-    # Calculate the start date
-    start_date = timezone.now().date() - timedelta(days=days)
-    
-    # Base query
-    queryset = Event.objects.filter(timestamp__date__gte=start_date)
-    
-    # Apply event type filter if provided
-    if event_name:
-        queryset = queryset.filter(event_name=event_name)
-    
-    # Group by day and count
-    daily_counts = (
-        queryset
-        .annotate(day=TruncDate('timestamp'))
-        .values('day')
-        .annotate(count=Count('id'))
-        .order_by('day')
-    )
-    
-    return Response(daily_counts)
+    return Response(widgets.event_counts_by_day(time_range, event_name))
 
 @api_view(['GET'])
+@replica_reads
+@cached_analytics(default_days=30)
 def page_views_by_country(request):
     """
     Get page view counts grouped by country.
-    """
-    days = int(request.query_params.get('days', 30))
-    start_date = timezone.now().date() - timedelta(days=days)
     
-    country_views = (
-        Event.objects.filter(
-            event_name='pageview',
-            timestamp__date__gte=start_date,
-            country__isnull=False
-        )
-        .values('country')
-        .annotate(views=Count('id'))
-        .order_by('-views')
-    )
+    Query parameters:
+    - days: Number of days to include (default: 30)
+    - fast: true to answer from the top-value summaries; each row then
+      carries `error`, the most its `views` may overcount
+    - limit: Number of countries in fast mode (default: 50, max: TOPK_CAPACITY)
+    - start_date, end_date: explicit range instead of days
+    """
+    time_range = TimeRange.from_params(request.query_params, default_days=30)
+    fast = _is_true(request.query_params.get('fast'))
+    limit = parse_limit(request.query_params, 50, settings.TOPK_CAPACITY)
     
-    return Response(country_views)
+    return Response(widgets.country_views(time_range, fast=fast, limit=limit))
 
 # Add these to your api/views.py file
 
 @api_view(['GET'])
+@replica_reads
+@cached_analytics(default_days=7)
 def traffic_sources(request):
     """
     Get traffic sources data grouped by UTM source.
     """
-    days = int(request.query_params.get('days', 7))
-    start_date = timezone.now().date() - timedelta(days=days)
-    
-    # Group by source and calculate metrics
-    sources = (
-        Event.objects.filter(timestamp__date__gte=start_date)
-        .values('utm_source')
-        .annotate(
-            sessions=Count('session_id', distinct=True),
-            bounces=Count(Case(
-                When(session_id__in=Subquery(
-                    Event.objects.filter(
-                        timestamp__date__gte=start_date
-                    ).values('session_id').annotate(
-                        count=Count('id')
-                    ).filter(count=1).values('session_id')
-                ), then=1),
-                output_field=IntegerField()
-            ))
-        )
-        .annotate(
-            bounce_rate=ExpressionWrapper(
-                F('bounces') * 100.0 / F('sessions'),
-                output_field=FloatField()
-            )
-        )
-        .order_by('-sessions')
-    )
-    
-    # Format the results
-    result = []
-    for source in sources:
-        result.append({
-            'source': source['utm_source'] or '(not set)',
-            'sessions': source['sessions'],
-            'bounces': source['bounces'],
-            'bounceRate': source['bounce_rate']
-        })
-    
-    # Add overall stats
-    total_sessions = sum(item['sessions'] for item in result)
-    total_bounces = sum(item['bounces'] for item in result)
-    
-    if total_sessions > 0:
-        overall_bounce_rate = (total_bounces * 100.0) / total_sessions
-    else:
-        overall_bounce_rate = 0
-    
-    result.append({
-        'source': 'Overall',
-        'sessions': total_sessions,
-        'bounces': total_bounces,
-        'bounceRate': overall_bounce_rate
-    })
+    time_range = TimeRange.from_params(request.query_params, default_days=7)
     
-    return Response(result)
+    return Response(widgets.traffic_sources(time_range))
 
 @api_view(['GET'])
+@replica_reads
+@cached_analytics(default_days=7)
 def page_metrics(request):
     """
     Get page view metrics and trends.
-    """
-    days = int(request.query_params.get('days', 7))
-    start_date = timezone.now().date() - timedelta(days=days)
-    
-    # Get total page views
-    total_views = Event.objects.filter(
-        timestamp__date__gte=start_date,
-        event_name='pageview'
-    ).count()
-    
-    # Get total unique users
-    unique_users = Event.objects.filter(
-        timestamp__date__gte=start_date
-    ).values('user_id').distinct().count()
-    
-    # Calculate average pages per user
-    avg_per_user = 0
-    if unique_users > 0:
-        avg_per_user = total_views / unique_users
-    
-    # Get trend data
-    trend = (
-        Event.objects.filter(
-            timestamp__date__gte=start_date,
-            event_name='pageview'
-        )
-        .annotate(date=TruncDate('timestamp'))
-        .values('date')
-        .annotate(
-            views=Count('id'),
-            users=Count('user_id', distinct=True)
-        )
-        .order_by('date')
-    )
     
-    # Calculate average pages per user for each day
-    trend_data = []
-    for day in trend:
-        avg_pages = 0
-        if day['users'] > 0:
-            avg_pages = day['views'] / day['users']
-        
-        trend_data.append({
-            'date': day['date'],
-            'avg_pages_per_user': avg_pages
-        })
-    
-    result = {
-        'total_views': total_views,
-        'avg_per_user': avg_per_user,
-        'trend': trend_data
-    }
+    Unique visitor counts come from HyperLogLog sketches (the response
+    reports their relative standard error) unless exact=true is passed.
     
-    return Response(result)
+    Query parameters:
+    - days: Number of days to include (default: 7)
+    - exact: true to count distinct visitors over the raw events
+    - start_date, end_date: explicit range instead of days
+    """
+    time_range = TimeRange.from_params(request.query_params, default_days=7)
+    exact = _is_true(request.query_params.get('exact'))
+    
+    return Response(widgets.page_metrics(time_range, exact=exact))
 
 @api_view(['GET'])
+@replica_reads
+@cached_analytics(default_days=7)
 def top_pages(request):
     """
     Get performance metrics for top pages.
+    
+    Runs three queries regardless of `limit`: page views for the top paths,
+    then landing/bounce and exit counts for just those paths from the
+    Session table, joined by path in Python.
+    
+    Query parameters:
+    - days: Number of days to include (default: 7)
+    - limit: Number of pages to return (default: 10, max: 1000)
+    - fast: true to take the top pages and their views from the top-value
+      summaries; each row then carries `error`, the most `views` may overcount
+    - start_date, end_date: explicit range instead of days
     """
-    days = int(request.query_params.get('days', 7))
-    limit = int(request.query_params.get('limit', 10))
-    start_date = timezone.now().date() - timedelta(days=days)
+    time_range = TimeRange.from_params(request.query_params, default_days=7)
+    limit = parse_limit(request.query_params, 10, TOP_PAGES_MAX_LIMIT)
+    fast = _is_true(request.query_params.get('fast'))
     
-    # Get page views
-    page_views = (
-        Event.objects.filter(
-            timestamp__date__gte=start_date,
-            event_name='pageview'
-        )
-        .values('path', 'title')
-        .annotate(views=Count('id'))
-        .order_by('-views')[:limit]
-    )
+    return Response(widgets.top_pages(time_range, limit=limit, fast=fast))
+
+@api_view(['GET'])
+@replica_reads
+@cached_analytics(default_days=7)
+def top_values(request):
+    """
+    Get the most frequent values of a pageview dimension from the
+    bounded-memory top-value summaries.
+    
+    Counts are upper bounds: `count - error` is a lower bound, and any value
+    not listed occurred at most `max_error` times.
     
-    # Get landing pages (first touch)
-    landing_pages = (
-        Event.objects.filter(
-            timestamp__date__gte=start_date
+    Query parameters:
+    - dimension: path, referrer, utm_source, utm_campaign or country
+    - days: Number of days to include (default: 7)
+    - limit: Number of values to return (default: 10, at most the
+      TOPK_CAPACITY values a summary holds)
+    - start_date, end_date: explicit range instead of days (whole days)
+    """
+    dimension = request.query_params.get('dimension', 'path')
+    if dimension not in heavy_hitters.DIMENSIONS:
+        return Response(
+            {'detail': f"dimension must be one of {', '.join(heavy_hitters.DIMENSIONS)}"},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        .values('path')
-        .annotate(count=Count('session_id', distinct=True))
-        .order_by('-count')
+    time_range = TimeRange.from_params(request.query_params, default_days=7)
+    limit = parse_limit(request.query_params, 10, settings.TOPK_CAPACITY)
+    
+    rows, total, max_error = heavy_hitters.top_values(
+        dimension, time_range.start_date, limit, end_date=time_range.end_date
     )
     
-    # Get exit pages (last touch)
-    exit_pages = (
-        Event.objects.filter(
-            timestamp__date__gte=start_date
+    return Response({
+        'dimension': dimension,
+        'total': total,
+        'max_error': max_error,
+        'results': [
+            {'value': row['value'], 'count': row['count'], 'error': row['error']}
+            for row in rows
+        ]
+    })
+
+@api_view(['GET'])
+@replica_reads
+def funnel(request):
+    """
+    Count the visitors that performed an ordered list of steps, each within
+    `window` seconds of their first step.
+    
+    Visitors are counted once per day they perform the first step; each
+    day's counts are cached, so only days with new events are recomputed.
+    
+    Query parameters:
+    - steps: JSON array of 2 to 10 objects matching events on event_name,
+      path, utm_source, utm_medium and utm_campaign, e.g.
+      [{"event_name": "pageview", "path": "/pricing"}, {"event_name": "click"}]
+    - window: conversion window in seconds (default: 3600)
+    - days: Number of days of entry to include (default: 7, at most
+      FUNNEL_MAX_DAYS)
+    - start_date, end_date: explicit range instead of days (whole days)
+    """
+    analysis = funnels.Funnel.from_params(request.query_params)
+    time_range = TimeRange.from_params(request.query_params, default_days=7)
+    return Response(analysis.report(time_range))
+
+@api_view(['GET'])
+@replica_reads
+@cached_analytics(default_days=7)
+def dashboard(request):
+    """
+    Get every dashboard widget in one response.
+    
+    Widgets are computed concurrently on a bounded thread pool; the daily
+    and page metrics widgets share a single scan of the range. `timings`
+    reports each widget's wall time in milliseconds. If a widget fails its
+    payload is null, `errors` holds the reason and the status is 500.
+    
+    Query parameters:
+    - days: Number of days to include (default: 7)
+    - start_date, end_date: explicit range instead of days
+    - widgets: comma-separated subset of daily, countries, sources, pages
+      and top_pages (default: all)
+    - limit: Number of top pages (default: 10, max: 1000)
+    - exact, fast: as on the individual endpoints
+    """
+    time_range = TimeRange.from_params(request.query_params, default_days=7)
+    names = request.query_params.get('widgets')
+    names = names.split(',') if names else list(dashboard_widgets.WIDGETS)
+    unknown = [name for name in names if name not in dashboard_widgets.WIDGETS]
+    if unknown:
+        return Response(
+            {'detail': f"Unknown widgets: {', '.join(unknown)}"},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        .values('path', 'session_id')
-        .annotate(last_touch=Max('timestamp'))
-        .values('path')
-        .annotate(count=Count('session_id'))
-        .order_by('-count')
-    )
+    options = {
+        'exact': _is_true(request.query_params.get('exact')),
+        'fast': _is_true(request.query_params.get('fast')),
+        'limit': parse_limit(request.query_params, 10, TOP_PAGES_MAX_LIMIT),
+    }
     
-    # Calculate bounce rates
-    bounce_rates = {}
-    for path in set([p['path'] for p in page_views]):
-        sessions = Event.objects.filter(
-            timestamp__date__gte=start_date,
-            path=path
-        ).values('session_id').distinct().count()
-        
-        bounces = Event.objects.filter(
-            timestamp__date__gte=start_date,
-            path=path,
-            session_id__in=Subquery(
-                Event.objects.filter(
-                    timestamp__date__gte=start_date
-                ).values('session_id').annotate(
-                    count=Count('id')
-                ).filter(count=1).values('session_id')
-            )
-        ).values('session_id').distinct().count()
-        
-        if sessions > 0:
-            bounce_rates[path] = (bounces * 100.0) / sessions
-        else:
-            bounce_rates[path] = 0
-    
-    # Combine the data
-    result = []
-    for page in page_views:
-        path = page['path']
-        landing_count = next((p['count'] for p in landing_pages if p['path'] == path), 0)
-        exit_count = next((p['count'] for p in exit_pages if p['path'] == path), 0)
-        
-        result.append({
-            'page': page['title'] or path,
-            'views': page['views'],
-            'landing_page': landing_count,
-            'exit_page': exit_count,
-            'bounce_rate': bounce_rates.get(path, 0)
-        })
-    
-    return Response(result)
+    status_code, result = dashboard_widgets.dashboard_response(time_range, names, options)
+    return Response(result, status=status_code)
+
+@require_GET
+def live_counters(request):
+    """
+    Get the live counters, kept in memory from the track endpoints without
+    touching the database: active visitors (last 5 minutes), events and
+    pageviews per minute over the last 30 minutes, and the top paths of the
+    last 5 and 30 minutes. Counts are approximate (HyperLogLog visitors;
+    path views may overcount by `error`).
+    """
+    return JsonResponse(live.snapshot())
+
+@require_GET
+def live_stream(request):
+    """
+    Push the live counters as Server-Sent Events (`event: counters`) every
+    LIVE_PUSH_INTERVAL seconds. All watchers share one snapshot per
+    interval. Each watcher holds a worker thread here; under ASGI the async
+    view holds none.
+    """
+    return _event_stream_response(live.stream())
+
+def _event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Request and ingest metrics of this process in the Prometheus text
+    format: per-view latency, query count, database, rendering and Python
+    time histograms, and ingest counters.
+    """
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _is_true(value):
+    return (value or '').lower() in ('1', 'true', 'yes')
 
 @api_view(['POST'])
 def track_event(request):
     """
     Endpoint to receive and store analytics events from the frontend.
+    
+    With TRACK_INGEST_MODE = 'buffered' the event is validated, queued for
+    a background bulk insert and acknowledged with 202; a full queue
+    answers 503 with Retry-After.
     """
-    serializer = EventSerializer(data=request.data)
+    validated, errors = validate_event(request.data)
+    
+    if errors:
+        metrics.record_ingest('track', rejected=1)
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
     
-    if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    event = Event(**validated)
+    
+    if settings.TRACK_INGEST_MODE == 'buffered':
+        try:
+            get_buffer().offer([event])
+        except BufferFull as exc:
+            metrics.record_ingest('track', throttled=1)
+            return _buffer_full_response(exc)
+        live.record([event])
+        metrics.record_ingest('track', accepted=1)
+        return Response(event_data(event), status=status.HTTP_202_ACCEPTED)
+    
+    event, = store_events([event])
+    live.record([event])
+    metrics.record_ingest('track', accepted=1)
+    return Response(event_data(event), status=status.HTTP_201_CREATED)
+
+def _buffer_full_response(exc):
+    """Ask the client to retry later when the ingest buffer is saturated."""
+    return Response(
+        {'detail': str(exc)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(settings.TRACK_BUFFER_RETRY_AFTER)}
+    )
+
+@api_view(['POST'])
+@parser_classes([JSONParser, NDJSONParser])
+def track_batch(request):
+    """
+    Receive many analytics events in one request.
+    
+    The body is either a JSON array of event objects or newline-delimited
+    JSON (Content-Type: application/x-ndjson). Every event is validated
+    independently; the valid ones are written with a single multi-row
+    insert and the response carries one status entry per input item, in
+    order:
+    - {"status": 201, "id": <pk>} for stored events
+    - {"status": 202} for events queued in buffered ingest mode
+    - {"status": 400, "errors": {...}} for rejected events
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response(
+            {'detail': 'Expected a JSON array or NDJSON body.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    max_events = settings.TRACK_BATCH_MAX_EVENTS
+    if len(items) > max_events:
+        metrics.record_ingest('batch', rejected=len(items), batch_size=len(items))
+        return Response(
+            {'detail': f'Batch exceeds the limit of {max_events} events.'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+    
+    buffered = settings.TRACK_INGEST_MODE == 'buffered'
+    accepted_status = status.HTTP_202_ACCEPTED if buffered else status.HTTP_201_CREATED
+    
+    results, pending = validate_batch(items, accepted_status)
+    events = [event for _, event in pending]
+    if buffered:
+        try:
+            get_buffer().offer(events)
+        except BufferFull as exc:
+            metrics.record_ingest(
+                'batch', rejected=len(results) - len(events), throttled=len(events), batch_size=len(items)
+            )
+            return _buffer_full_response(exc)
+        live.record(events)
+    else:
+        for (result, _), event in zip(pending, store_events(events)):
+            result['id'] = event.pk
+        live.record(events)
     
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    accepted = len(events)
+    rejected = len(results) - accepted
+    metrics.record_ingest('batch', accepted=accepted, rejected=rejected, batch_size=len(items))
+    return Response(
+        {'accepted': accepted, 'rejected': rejected, 'results': results},
+        status=batch_status(accepted, rejected, accepted_status)
+    )
\ No newline at end of file
@@ -0,0 +1,326 @@
+"""
+Payloads of the analytics endpoints, computed from a TimeRange.
+
+Each endpoint in api.views and each widget of the dashboard endpoint is one
+function here. Functions that accept ``shared`` can derive their result from
+the output of ``daily_event_counts`` instead of scanning the range again.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q, Sum
+from django.db.models.functions import TruncDate
+
+from . import heavy_hitters, sketches
+from .models import DailyRollup, Event, Session
+
+
+def daily_event_counts(time_range):
+    """
+    Event counts per (day, event_name) over ``time_range``: the one scan the
+    daily and page metrics widgets share.
+    """
+    if settings.ANALYTICS_USE_ROLLUPS:
+        rows = (
+            time_range.filter_days(DailyRollup.objects.all())
+            .annotate(day=F('bucket'))
+            .values('day', 'event_name')
+            .annotate(count=Sum('count'))
+            .order_by()
+        )
+    else:
+        rows = (
+            time_range.filter(Event.objects.all())
+            .annotate(day=TruncDate('timestamp'))
+            .values('day', 'event_name')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+    return {(row['day'], row['event_name']): row['count'] for row in rows}
+
+
+def _sum_by_day(shared, event_name=None):
+    counts = defaultdict(int)
+    for (day, name), count in shared.items():
+        if event_name is None or name == event_name:
+            counts[day] += count
+    return [{'day': day, 'count': counts[day]} for day in sorted(counts)]
+
+
+def event_counts_by_day(time_range, event_name=None, shared=None):
+    """Event counts grouped by day, optionally for one event type."""
+    if shared is not None:
+        return _sum_by_day(shared, event_name)
+
+    if settings.ANALYTICS_USE_ROLLUPS:
+        # Daily rollups hold exactly this aggregate, one row per dimension combination
+        queryset = time_range.filter_days(DailyRollup.objects.all())
+        if event_name:
+            queryset = queryset.filter(event_name=event_name)
+
+        return list(
+            queryset
+            .annotate(day=F('bucket'))
+            .values('day')
+            .annotate(count=Sum('count'))
+            .order_by('day')
+        )
+
+    # Base query
+    queryset = time_range.filter(Event.objects.all())
+
+    # Apply event type filter if provided
+    if event_name:
+        queryset = queryset.filter(event_name=event_name)
+
+    # Group by day and count
+    return list(
+        queryset
+        .annotate(day=TruncDate('timestamp'))
+        .values('day')
+        .annotate(count=Count('id'))
+        .order_by('day')
+    )
+
+
+def country_views(time_range, fast=False, limit=50):
+    """Page view counts grouped by country, largest first."""
+    if fast:
+        rows, _, _ = heavy_hitters.top_values(
+            'country', time_range.start_date, limit, end_date=time_range.end_date
+        )
+        return [
+            {'country': row['value'], 'views': row['count'], 'error': row['error']}
+            for row in rows
+        ]
+
+    if settings.ANALYTICS_USE_ROLLUPS:
+        return list(
+            time_range.filter_days(DailyRollup.objects.filter(event_name='pageview'))
+            .exclude(country='')
+            .values('country')
+            .annotate(views=Sum('count'))
+            .order_by('-views')
+        )
+
+    return list(
+        time_range.filter(Event.objects.filter(
+            event_name='pageview',
+            country__isnull=False
+        ))
+        .values('country')
+        .annotate(views=Count('id'))
+        .order_by('-views')
+    )
+
+
+def traffic_sources(time_range):
+    """Sessions and bounce rate per UTM source, followed by an Overall row."""
+    # Group by source and calculate metrics, one row per visit
+    sources = (
+        time_range.filter(Session.objects.all(), 'started_at')
+        .values('utm_source')
+        .annotate(
+            sessions=Count('id'),
+            bounces=Count('id', filter=Q(is_bounce=True))
+        )
+        .annotate(
+            bounce_rate=ExpressionWrapper(
+                F('bounces') * 100.0 / F('sessions'),
+                output_field=FloatField()
+            )
+        )
+        .order_by('-sessions')
+    )
+
+    # Format the results
+    result = []
+    for source in sources:
+        result.append({
+            'source': source['utm_source'] or '(not set)',
+            'sessions': source['sessions'],
+            'bounces': source['bounces'],
+            'bounceRate': source['bounce_rate']
+        })
+
+    # Add overall stats
+    total_sessions = sum(item['sessions'] for item in result)
+    total_bounces = sum(item['bounces'] for item in result)
+
+    if total_sessions > 0:
+        overall_bounce_rate = (total_bounces * 100.0) / total_sessions
+    else:
+        overall_bounce_rate = 0
+
+    result.append({
+        'source': 'Overall',
+        'sessions': total_sessions,
+        'bounces': total_bounces,
+        'bounceRate': overall_bounce_rate
+    })
+
+    return result
+
+
+def _pageviews_by_day(time_range):
+    if settings.ANALYTICS_USE_ROLLUPS:
+        rows = (
+            time_range.filter_days(DailyRollup.objects.filter(event_name='pageview'))
+            .annotate(date=F('bucket'))
+            .values('date')
+            .annotate(views=Sum('count'))
+        )
+    else:
+        rows = (
+            time_range.filter(Event.objects.filter(event_name='pageview'))
+            .annotate(date=TruncDate('timestamp'))
+            .values('date')
+            .annotate(views=Count('id'))
+        )
+    return {row['date']: row['views'] for row in rows}
+
+
+def page_metrics(time_range, exact=False, shared=None):
+    """
+    Page views, unique visitors and the daily pages-per-visitor trend.
+
+    Unique visitor counts come from HyperLogLog sketches unless ``exact``.
+    """
+    start_date, end_date = time_range.start_date, time_range.end_date
+    approximate = settings.ANALYTICS_USE_SKETCHES and not exact
+
+    if shared is not None:
+        daily_views = {day: count for (day, name), count in shared.items() if name == 'pageview'}
+    elif approximate:
+        daily_views = _pageviews_by_day(time_range)
+    else:
+        daily_views = None
+
+    # Get total page views
+    if daily_views is not None:
+        total_views = sum(daily_views.values())
+    elif settings.ANALYTICS_USE_ROLLUPS:
+        total_views = time_range.filter_days(
+            DailyRollup.objects.filter(event_name='pageview')
+        ).aggregate(total=Sum('count'))['total'] or 0
+    else:
+        total_views = time_range.filter(Event.objects.filter(event_name='pageview')).count()
+
+    # Get total unique users
+    if approximate:
+        unique_users = sketches.unique_users(start_date, end_date)
+    else:
+        unique_users = time_range.filter(
+            Event.objects.filter(user_id__isnull=False)
+        ).values('user_id').distinct().count()
+
+    # Calculate average pages per user
+    avg_per_user = 0
+    if unique_users > 0:
+        avg_per_user = total_views / unique_users
+
+    # Get trend data
+    if approximate:
+        daily_users = sketches.daily_unique_users(start_date, end_date, dimension='event:pageview')
+        trend = [
+            {'date': day, 'views': views, 'users': daily_users.get(day, 0)}
+            for day, views in sorted(daily_views.items())
+        ]
+    else:
+        trend = (
+            time_range.filter(Event.objects.filter(event_name='pageview'))
+            .annotate(date=TruncDate('timestamp'))
+            .values('date')
+            .annotate(
+                views=Count('id'),
+                users=Count('user_id', distinct=True)
+            )
+            .order_by('date')
+        )
+
+    # Calculate average pages per user for each day
+    trend_data = []
+    for day in trend:
+        avg_pages = 0
+        if day['users'] > 0:
+            avg_pages = day['views'] / day['users']
+
+        trend_data.append({
+            'date': day['date'],
+            'avg_pages_per_user': avg_pages
+        })
+
+    return {
+        'total_views': total_views,
+        'unique_users': unique_users,
+        'avg_per_user': avg_per_user,
+        'trend': trend_data,
+        'approximate': approximate,
+        'relative_error': sketches.RELATIVE_ERROR if approximate else 0
+    }
+
+
+def top_pages(time_range, limit=10, fast=False):
+    """
+    Performance metrics for the ``limit`` most viewed pages.
+
+    Runs three queries regardless of ``limit``: page views for the top paths,
+    then landing/bounce and exit counts for just those paths from the
+    Session table, joined by path in Python.
+    """
+    # Get page views
+    if fast:
+        rows, _, _ = heavy_hitters.top_values(
+            'path', time_range.start_date, limit, end_date=time_range.end_date
+        )
+        page_views = [
+            {'path': row['value'], 'title': row['label'], 'views': row['count'], 'error': row['error']}
+            for row in rows
+        ]
+    else:
+        page_views = list(
+            time_range.filter(Event.objects.filter(event_name='pageview'))
+            .values('path', 'title')
+            .annotate(views=Count('id'))
+            .order_by('-views')[:limit]
+        )
+    paths = {page['path'] for page in page_views}
+    sessions = time_range.filter(Session.objects.all(), 'started_at')
+
+    # Landing pages (first touch) and their bounces in one pass; bounce rate
+    # is the share of sessions landing on a page that left without a second event
+    landing = {
+        row['landing_path']: row
+        for row in sessions.filter(landing_path__in=paths)
+        .values('landing_path')
+        .annotate(count=Count('id'), bounces=Count('id', filter=Q(is_bounce=True)))
+        .order_by()
+    }
+
+    # Exit pages (last touch)
+    exits = dict(
+        sessions.filter(exit_path__in=paths)
+        .values('exit_path')
+        .annotate(count=Count('id'))
+        .order_by()
+        .values_list('exit_path', 'count')
+    )
+
+    # Combine the data
+    result = []
+    for page in page_views:
+        path = page['path']
+        landed = landing.get(path, {'count': 0, 'bounces': 0})
+
+        row = {
+            'page': page['title'] or path,
+            'views': page['views'],
+            'landing_page': landed['count'],
+            'exit_page': exits.get(path, 0),
+            'bounce_rate': (landed['bounces'] * 100.0) / landed['count'] if landed['count'] else 0
+        }
+        if fast:
+            row['error'] = page['error']
+        result.append(row)
+
+    return result
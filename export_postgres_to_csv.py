@@ -1,73 +1,26 @@
-import psycopg2
-import csv
-import os
-
-# Database connection parameters - update these with your actual values
-DB_NAME = "analytics"
-DB_USER = "postgres"
-DB_PASSWORD = "Podadai@123"  # Replace with your actual password
-DB_HOST = "localhost"
-DB_PORT = "5432"
+"""
+Export events to CSV.
 
-# Output file path
-OUTPUT_FILE = "events_data.csv"
+Thin wrapper around `python manage.py export_events`, which streams rows
+through a server-side cursor instead of loading the table into memory.
+Database settings come from the project's .env file. All arguments are
+passed through, e.g.:
 
-# SQL query to fetch the data
-QUERY = """
-SELECT 
-    event_name, received_at, timestamp, url, path, referrer, title,
-    utm_source, utm_medium, utm_campaign, country, region
-FROM 
-    events
-ORDER BY 
-    timestamp DESC;
+    python export_postgres_to_csv.py --output exports/events.csv --gzip \
+        --max-bytes 100000000 --state exports/state.json
 """
+import os
+import sys
+
+import django
+from django.core.management import call_command
+
 
-def export_data():
-    """Export data from PostgreSQL to CSV file."""
-    try:
-        # Connect to the database
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        
-        # Create a cursor
-        cursor = conn.cursor()
-        
-        # Execute the query
-        cursor.execute(QUERY)
-        
-        # Get the column names
-        column_names = [desc[0] for desc in cursor.description]
-        
-        # Fetch all rows
-        rows = cursor.fetchall()
-        
-        # Write to CSV
-        with open(OUTPUT_FILE, 'w', newline='') as file:
-            writer = csv.writer(file)
-            
-            # Write header
-            writer.writerow(column_names)
-            
-            # Write data rows
-            writer.writerows(rows)
-        
-        print(f"Successfully exported {len(rows)} rows to {OUTPUT_FILE}")
-        
-    except Exception as e:
-        print(f"Error: {e}")
-    
-    finally:
-        # Close the database connection
-        if conn:
-            cursor.close()
-            conn.close()
-            print("Database connection closed.")
+def export_data(*args):
+    """Export events to CSV using the export_events management command."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'webAnalytics.settings')
+    django.setup()
+    call_command('export_events', *args)
 
 if __name__ == "__main__":
-    export_data()
\ No newline at end of file
+    export_data(*sys.argv[1:])
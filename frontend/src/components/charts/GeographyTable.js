@@ -2,11 +2,18 @@ import React, { useState, useEffect } from 'react';
 import analyticsService from '../../services/analyticsService';
 import '../../styles/components.css';
 
-const GeographyTable = ({ timeRange }) => {
+const GeographyTable = ({ timeRange, payload }) => {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(true);
   
   useEffect(() => {
+    // Payload already fetched by the dashboard request
+    if (payload) {
+      setData(payload);
+      setLoading(false);
+      return;
+    }
+    
     const fetchData = async () => {
       try {
         // Calculate days based on timeRange
@@ -31,7 +38,7 @@ const GeographyTable = ({ timeRange }) => {
     };
     
     fetchData();
-  }, [timeRange]);
+  }, [timeRange, payload]);
   
   const getTimeRangeDays = (range) => {
     switch (range) {
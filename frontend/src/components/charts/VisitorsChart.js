@@ -4,11 +4,24 @@ import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, Responsi
 import analyticsService from '../../services/analyticsService';
 import '../../styles/components.css';
 
-const VisitorsChart = ({ timeRange }) => {
+// Daily counts as chart points
+const formatDays = (rows) => rows.map(item => ({
+  date: new Date(item.day).toLocaleDateString(),
+  value: item.count
+}));
+
+const VisitorsChart = ({ timeRange, payload }) => {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(true);
   
   useEffect(() => {
+    // Payload already fetched by the dashboard request
+    if (payload) {
+      setData(formatDays(payload));
+      setLoading(false);
+      return;
+    }
+    
     // Calculate days based on timeRange
     let days = 30;
     switch (timeRange) {
@@ -35,13 +48,7 @@ const VisitorsChart = ({ timeRange }) => {
       try {
         const response = await analyticsService.getDailyActiveUsers(days);
         
-        // Format the data for the chart
-        const formattedData = response.data.map(item => ({
-          date: new Date(item.day).toLocaleDateString(),
-          value: item.count
-        }));
-        
-        setData(formattedData);
+        setData(formatDays(response.data));
         setLoading(false);
       } catch (error) {
         console.error('Error fetching visitor data:', error);
@@ -50,7 +57,7 @@ const VisitorsChart = ({ timeRange }) => {
     };
     
     fetchData();
-  }, [timeRange]);
+  }, [timeRange, payload]);
   
   if (loading) {
     return <div className="loading">Loading...</div>;
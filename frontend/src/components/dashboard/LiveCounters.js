@@ -0,0 +1,63 @@
+// src/components/dashboard/LiveCounters.js
+import React, { useState, useEffect } from 'react';
+import analyticsService from '../../services/analyticsService';
+import '../../styles/components.css';
+
+// Active visitors, pageviews of the current minute and top paths of the
+// last 5 minutes, pushed by the server every few seconds
+const LiveCounters = () => {
+  const [counters, setCounters] = useState(null);
+  
+  useEffect(() => {
+    // EventSource reconnects by itself; close it when the dashboard unmounts
+    const unsubscribe = analyticsService.subscribeLive(setCounters);
+    return unsubscribe;
+  }, []);
+  
+  if (!counters) {
+    return <div className="loading">Loading...</div>;
+  }
+  
+  const minutes = counters.pageviews_per_minute;
+  const currentMinute = minutes.length ? minutes[minutes.length - 1] : { pageviews: 0 };
+  const topPaths = counters.top_paths['5m'] || [];
+  
+  return (
+    <div>
+      <div className="metrics-cards">
+        <div className="metric-card">
+          <h3>Active Visitors</h3>
+          <div className="metric-value">{counters.active_visitors.toLocaleString()}</div>
+          <div className="metric-label">last {counters.active_minutes} minutes</div>
+        </div>
+        
+        <div className="metric-card">
+          <h3>Pageviews</h3>
+          <div className="metric-value">{currentMinute.pageviews.toLocaleString()}</div>
+          <div className="metric-label">this minute</div>
+        </div>
+      </div>
+      
+      <div className="table-container">
+        <table className="data-table">
+          <thead>
+            <tr>
+              <th>Page</th>
+              <th>Views (5 min)</th>
+            </tr>
+          </thead>
+          <tbody>
+            {topPaths.map((item) => (
+              <tr key={item.path}>
+                <td>{item.title || item.path}</td>
+                <td>{item.views.toLocaleString()}</td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+      </div>
+    </div>
+  );
+};
+
+export default LiveCounters;
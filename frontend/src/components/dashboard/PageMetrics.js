@@ -4,13 +4,34 @@ import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, Responsi
 import analyticsService from '../../services/analyticsService';
 import '../../styles/components.css';
 
-const PageMetrics = ({ timeRange }) => {
+const PageMetrics = ({ timeRange, payload }) => {
   const [pageViews, setPageViews] = useState(0);
   const [avgPagesPerUser, setAvgPagesPerUser] = useState(0);
   const [trendData, setTrendData] = useState([]);
   const [loading, setLoading] = useState(true);
   
   useEffect(() => {
+    const showMetrics = (metrics) => {
+      // Extract total page views and average per user
+      setPageViews(metrics.total_views || 0);
+      setAvgPagesPerUser(metrics.avg_per_user || 0);
+      
+      // Extract trend data if available
+      if (metrics.trend) {
+        setTrendData(metrics.trend.map(item => ({
+          date: new Date(item.date).toLocaleDateString(),
+          value: item.avg_pages_per_user
+        })));
+      }
+    };
+    
+    // Payload already fetched by the dashboard request
+    if (payload) {
+      showMetrics(payload);
+      setLoading(false);
+      return;
+    }
+    
     const fetchData = async () => {
       try {
         const days = getTimeRangeDays(timeRange);
@@ -19,17 +40,7 @@ const PageMetrics = ({ timeRange }) => {
         const response = await analyticsService.getPageViews(days);
         
         if (response.data) {
-          // Extract total page views and average per user
-          setPageViews(response.data.total_views || 0);
-          setAvgPagesPerUser(response.data.avg_per_user || 0);
-          
-          // Extract trend data if available
-          if (response.data.trend) {
-            setTrendData(response.data.trend.map(item => ({
-              date: new Date(item.date).toLocaleDateString(),
-              value: item.avg_pages_per_user
-            })));
-          }
+          showMetrics(response.data);
         }
         
         setLoading(false);
@@ -57,7 +68,7 @@ const PageMetrics = ({ timeRange }) => {
     };
     
     fetchData();
-  }, [timeRange]);
+  }, [timeRange, payload]);
   
   const getTimeRangeDays = (range) => {
     switch (range) {
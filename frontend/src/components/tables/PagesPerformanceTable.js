@@ -3,11 +3,18 @@ import React, { useState, useEffect } from 'react';
 import analyticsService from '../../services/analyticsService';
 import '../../styles/components.css';
 
-const PagesPerformanceTable = ({ timeRange }) => {
+const PagesPerformanceTable = ({ timeRange, payload }) => {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(true);
   
   useEffect(() => {
+    // Payload already fetched by the dashboard request
+    if (payload) {
+      setData(payload);
+      setLoading(false);
+      return;
+    }
+    
     const fetchData = async () => {
       try {
         const days = getTimeRangeDays(timeRange);
@@ -60,7 +67,7 @@ const PagesPerformanceTable = ({ timeRange }) => {
     };
     
     fetchData();
-  }, [timeRange]);
+  }, [timeRange, payload]);
   
   const getTimeRangeDays = (range) => {
     switch (range) {
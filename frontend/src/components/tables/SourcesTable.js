@@ -3,11 +3,18 @@ import React, { useState, useEffect } from 'react';
 import analyticsService from '../../services/analyticsService';
 import '../../styles/components.css';
 
-const SourcesTable = ({ timeRange }) => {
+const SourcesTable = ({ timeRange, payload }) => {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(true);
   
   useEffect(() => {
+    // Payload already fetched by the dashboard request
+    if (payload) {
+      setData(payload);
+      setLoading(false);
+      return;
+    }
+    
     const fetchData = async () => {
       try {
         // Calculate days based on timeRange
@@ -32,7 +39,7 @@ const SourcesTable = ({ timeRange }) => {
     };
     
     fetchData();
-  }, [timeRange]);
+  }, [timeRange, payload]);
   
   const getTimeRangeDays = (range) => {
     switch (range) {
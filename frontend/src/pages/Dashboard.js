@@ -1,5 +1,5 @@
 // src/pages/Dashboard.js
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import VisitorsChart from '../components/charts/VisitorsChart';
 import UserMetricsCards from '../components/dashboard/UserMetricsCards';
 import GeographyTable from '../components/charts/GeographyTable';
@@ -8,10 +8,46 @@ import SessionMetrics from '../components/dashboard/SessionMetrics';
 import SourcesTable from '../components/tables/SourcesTable';
 import PageMetrics from '../components/dashboard/PageMetrics';
 import PagesPerformanceTable from '../components/tables/PagesPerformanceTable';
+import LiveCounters from '../components/dashboard/LiveCounters';
+import analyticsService from '../services/analyticsService';
 import '../styles/pages.css';
 
 const Dashboard = () => {
   const [timeRange, setTimeRange] = useState('7D');
+  const [widgets, setWidgets] = useState(null);
+  
+  // One request for every widget the backend serves (daily, countries,
+  // sources, pages, top_pages). A widget that is missing from the response
+  // falls back to fetching its own endpoint.
+  useEffect(() => {
+    let cancelled = false;
+    setWidgets(null);
+    
+    const fetchData = async () => {
+      try {
+        const response = await analyticsService.getDashboard(getTimeRangeDays(timeRange));
+        if (!cancelled) setWidgets(response.data.widgets);
+      } catch (error) {
+        console.error('Error fetching dashboard:', error);
+        // A failed widget makes the response a 500 carrying the others
+        if (!cancelled) setWidgets(error.response?.data?.widgets || {});
+      }
+    };
+    
+    fetchData();
+    return () => { cancelled = true; };
+  }, [timeRange]);
+  
+  const getTimeRangeDays = (range) => {
+    switch (range) {
+      case 'Today': return 1;
+      case 'Yesterday': return 2;
+      case '7D': return 7;
+      case '30D': return 30;
+      case '3M': return 90;
+      default: return 7;
+    }
+  };
   
   const handleTimeRangeChange = (range) => {
     setTimeRange(range);
@@ -30,17 +66,23 @@ const Dashboard = () => {
         </div>
       </header>
       
+      <section className="dashboard-section">
+        <h2>Right Now</h2>
+        <LiveCounters />
+      </section>
+      
+      {widgets === null ? <div className="loading">Loading...</div> : <>
       <section className="dashboard-section">
         <h2>User Metrics</h2>
         <UserMetricsCards timeRange={timeRange} />
         <h3>Daily Active Users</h3>
-        <VisitorsChart timeRange={timeRange} />
+        <VisitorsChart timeRange={timeRange} payload={widgets.daily} />
       </section>
       
       <div className="dashboard-row">
         <section className="dashboard-column">
           <h2>Geography</h2>
-          <GeographyTable timeRange={timeRange} />
+          <GeographyTable timeRange={timeRange} payload={widgets.countries} />
         </section>
         <section className="dashboard-column">
           <h2>Platform</h2>
@@ -55,18 +97,19 @@ const Dashboard = () => {
       
       <section className="dashboard-section">
         <h2>Traffic Sources</h2>
-        <SourcesTable timeRange={timeRange} />
+        <SourcesTable timeRange={timeRange} payload={widgets.sources} />
       </section>
       
       <section className="dashboard-section">
         <h2>Page Metrics</h2>
-        <PageMetrics timeRange={timeRange} />
+        <PageMetrics timeRange={timeRange} payload={widgets.pages} />
       </section>
       
       <section className="dashboard-section">
         <h3>Pages Performance</h3>
-        <PagesPerformanceTable timeRange={timeRange} />
+        <PagesPerformanceTable timeRange={timeRange} payload={widgets.top_pages} />
       </section>
+      </>}
     </div>
   );
 };
@@ -2,6 +2,19 @@
 import api from './api';
 
 const analyticsService = {
+  // All dashboard widgets (daily, countries, sources, pages, top_pages) in one request
+  getDashboard: (days = 7, widgets = null) => {
+    const only = widgets ? `&widgets=${widgets.join(',')}` : '';
+    return api.get(`analytics/dashboard/?days=${days}${only}`);
+  },
+  
+  // Live counters pushed over Server-Sent Events; returns an unsubscribe function
+  subscribeLive: (onCounters) => {
+    const source = new EventSource(`${api.defaults.baseURL}live/stream/`);
+    source.addEventListener('counters', (event) => onCounters(JSON.parse(event.data)));
+    return () => source.close();
+  },
+  
   // User metrics
   getDailyActiveUsers: (days = 7) => {
     return api.get(`analytics/daily/?days=${days}`);
@@ -3,6 +3,23 @@ ASGI config for webAnalytics project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+ASGI deployment mode: serve this module with an ASGI server, e.g.
+
+    API_ASYNC_VIEWS=true TRACK_INGEST_MODE=buffered \
+        uvicorn webAnalytics.asgi:application --workers 4
+
+(or ``daphne webAnalytics.asgi:application``). API_ASYNC_VIEWS routes the
+ingest and analytics endpoints to the native async views in api.async_views,
+so slow analytics queries wait on the bounded ASYNC_VIEW_WORKERS pool instead
+of tying up a thread per request; in buffered ingest mode tracked events are
+queued without leaving the event loop, and exports stream from an async
+iterator. The remaining endpoints (events API, admin) run as sync views in
+Django's thread adapter.
+
+API_ASYNC_VIEWS also turns persistent connections off (DB_CONN_MAX_AGE
+defaults to 0): sync code runs on a new thread per request under ASGI, so
+connections could not be reused. Set DB_POOL=true to share a pool instead.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
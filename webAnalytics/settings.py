@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -92,9 +93,52 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST', default='localhost'),
         'PORT': env('DB_PORT', default='5432'),
+        # Keep connections open between requests instead of connecting on
+        # every request; health checks drop ones the server has closed.
+        # Not under ASGI (API_ASYNC_VIEWS): there each request runs its sync
+        # code on a thread of its own, which would leave a connection behind
+        # per request. Use DB_POOL to reuse connections there.
+        'CONN_MAX_AGE': env.int(
+            'DB_CONN_MAX_AGE', default=0 if env.bool('API_ASYNC_VIEWS', default=False) else 60
+        ),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# DB_POOL uses Django's connection pool instead of persistent connections:
+# a process shares at most DB_POOL_MAX_SIZE connections between all its
+# threads. Requires psycopg 3 (`pip install "psycopg[binary,pool]"`) in
+# place of psycopg2.
+if env.bool('DB_POOL', default=False):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+        },
+    }
+
+# Optional streaming replica. The read-only analytics views and the events
+# list/detail read from it (see api.routers); ingest and every other query
+# stay on the primary. Credentials and database name are the primary's.
+DB_REPLICA_HOST = env('DB_REPLICA_HOST', default=None)
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': env('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+# Reads fall back to the primary while the replica's replay lag exceeds
+# REPLICA_MAX_LAG_SECONDS (or it is unreachable); each process checks the
+# lag at most every REPLICA_LAG_CHECK_INTERVAL seconds. Cached analytics
+# results may be as stale as the lag allowed when they were computed.
+REPLICA_MAX_LAG_SECONDS = env.float('REPLICA_MAX_LAG_SECONDS', default=10.0)
+REPLICA_LAG_CHECK_INTERVAL = env.float('REPLICA_LAG_CHECK_INTERVAL', default=5.0)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -127,6 +171,26 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The analytics result cache is an in-process LRU by default; point
+# ANALYTICS_CACHE_URL at redis:// or memcached (pymemcache://) to share it
+# between worker processes. Only a shared cache sees the invalidations of
+# management commands (sessionize, rebuild_rollups, apply_retention and the
+# importers): with the default, web workers serve results cached before a
+# command for up to ANALYTICS_CACHE_TIMEOUT, and the commands warn so.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': env.cache(
+        'ANALYTICS_CACHE_URL',
+        default='locmemcache://analytics?max_entries=2000'
+    ),
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
@@ -140,3 +204,143 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
+
+# JSON is encoded with orjson when it is installed (same output, see
+# api.renderers); the browsable API stays available.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Event ingest
+
+# Maximum number of events accepted in a single /api/track/batch/ request.
+TRACK_BATCH_MAX_EVENTS = env.int('TRACK_BATCH_MAX_EVENTS', default=1000)
+
+# 'sync' writes every tracked event before responding; 'buffered' validates,
+# queues the event in an in-process buffer and answers 202 while a background
+# thread bulk-inserts the queue.
+TRACK_INGEST_MODE = env('TRACK_INGEST_MODE', default='sync')
+
+# Buffered mode: backlog limit before clients get 503, and the size/time
+# triggers for the background flush.
+TRACK_BUFFER_MAX_EVENTS = env.int('TRACK_BUFFER_MAX_EVENTS', default=10000)
+TRACK_BUFFER_FLUSH_SIZE = env.int('TRACK_BUFFER_FLUSH_SIZE', default=500)
+TRACK_BUFFER_FLUSH_INTERVAL = env.float('TRACK_BUFFER_FLUSH_INTERVAL', default=1.0)
+TRACK_BUFFER_RETRY_AFTER = env.int('TRACK_BUFFER_RETRY_AFTER', default=1)
+
+# Route the ingest and analytics endpoints to the native async views in
+# api.async_views. Only worthwhile when served over ASGI (webAnalytics/asgi.py).
+API_ASYNC_VIEWS = env.bool('API_ASYNC_VIEWS', default=False)
+
+# Events API page size (keyset pagination); clients may ask for up to the max.
+EVENTS_PAGE_SIZE = env.int('EVENTS_PAGE_SIZE', default=100)
+EVENTS_MAX_PAGE_SIZE = env.int('EVENTS_MAX_PAGE_SIZE', default=1000)
+
+# Per-process LRU cache of dictionary-encoded event strings (url, path,
+# referrer, title, UTM, geo) and their integer keys.
+DIMENSION_CACHE_SIZE = env.int('DIMENSION_CACHE_SIZE', default=20000)
+
+# Analytics
+
+# Serve day-granular aggregates from the incrementally maintained rollup
+# tables instead of scanning raw events. Off by default: events stored
+# before the rollups existed must first be backfilled once with
+# `manage.py rebuild_rollups`, then this can be turned on (it is needed to
+# report days whose raw events were removed by RETENTION_RAW_DAYS).
+ANALYTICS_USE_ROLLUPS = env.bool('ANALYTICS_USE_ROLLUPS', default=False)
+
+# Longest time range, in days, the analytics endpoints accept (`days` or a
+# `start_date`/`end_date` span); longer requests are answered with 400.
+ANALYTICS_MAX_DAYS = env.int('ANALYTICS_MAX_DAYS', default=366)
+
+# Answer unique-visitor counts from per-day HyperLogLog sketches (~1.6%
+# standard error) unless a request passes exact=true.
+ANALYTICS_USE_SKETCHES = env.bool('ANALYTICS_USE_SKETCHES', default=True)
+
+# Rows each day's sketch is split across. Every ingesting process and
+# thread merges into one of them, so concurrent ingests rarely wait on
+# the same row lock; reads union them.
+SKETCH_SHARDS = env.int('SKETCH_SHARDS', default=8)
+
+# Threads computing /api/analytics/dashboard/ widgets, shared by all
+# requests of a process; each busy thread holds a database connection.
+DASHBOARD_WORKERS = env.int('DASHBOARD_WORKERS', default=4)
+
+# Threads the async analytics views (API_ASYNC_VIEWS) run their queries on.
+# Each busy thread holds a database connection, and a request waiting up to
+# api.caching.LOCK_TIMEOUT seconds for another process to fill the cache
+# holds a thread: size it to the connections a process may open.
+ASYNC_VIEW_WORKERS = env.int('ASYNC_VIEW_WORKERS', default=16)
+
+# Counters kept per day and dimension by the Space-Saving top-value
+# summaries behind the fast=true mode of the top-N endpoints.
+TOPK_CAPACITY = env.int('TOPK_CAPACITY', default=200)
+
+# Live counters (/api/live/, /api/live/stream/) kept in memory from the
+# track endpoints. SSE watchers get a snapshot every LIVE_PUSH_INTERVAL
+# seconds and reconnect after LIVE_STREAM_SECONDS. With several worker
+# processes set LIVE_COUNTERS_SHARED (and a shared ANALYTICS_CACHE_URL) so
+# every process reports the counters of all of them.
+LIVE_COUNTERS_SHARED = env.bool('LIVE_COUNTERS_SHARED', default=False)
+LIVE_PUSH_INTERVAL = env.float('LIVE_PUSH_INTERVAL', default=2.0)
+LIVE_STREAM_SECONDS = env.int('LIVE_STREAM_SECONDS', default=300)
+LIVE_TOP_PATHS = env.int('LIVE_TOP_PATHS', default=10)
+
+# Sessionizer (manage.py sessionize): a visitor's events more than this many
+# minutes apart start a new session.
+SESSIONIZER_INACTIVITY_MINUTES = env.int('SESSIONIZER_INACTIVITY_MINUTES', default=30)
+SESSIONIZER_BATCH_SIZE = env.int('SESSIONIZER_BATCH_SIZE', default=5000)
+# Only events older than this are consumed, so in-flight ingest transactions
+# with lower ids commit before the checkpoint moves past them.
+SESSIONIZER_SETTLE_SECONDS = env.int('SESSIONIZER_SETTLE_SECONDS', default=60)
+
+# Per-view latency, query, database and rendering histograms and ingest
+# counters, exposed at /metrics. Requests slower than SLOW_REQUEST_MS are
+# logged (api.metrics logger) with their slowest SQL.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+SLOW_REQUEST_MS = env.int('SLOW_REQUEST_MS', default=1000)
+
+# Result cache for the read-only analytics endpoints. Entries are dropped
+# when events land inside their window, but a result younger than
+# ANALYTICS_CACHE_STALE_SECONDS is still served so steady ingest does not
+# defeat the cache.
+ANALYTICS_CACHE_ENABLED = env.bool('ANALYTICS_CACHE_ENABLED', default=True)
+ANALYTICS_CACHE_ALIAS = 'analytics'
+ANALYTICS_CACHE_TIMEOUT = env.int('ANALYTICS_CACHE_TIMEOUT', default=300)
+ANALYTICS_CACHE_STALE_SECONDS = env.int('ANALYTICS_CACHE_STALE_SECONDS', default=10)
+
+# Funnels (/api/analytics/funnel/) are counted per day of entry. Each day's
+# counts are cached for FUNNEL_CACHE_TIMEOUT seconds, or until events land
+# in that day or its conversion window, so a multi-week funnel only
+# recomputes the days that changed. Windows are capped at
+# FUNNEL_MAX_WINDOW_HOURS and ranges at FUNNEL_MAX_DAYS days of entry.
+FUNNEL_CACHE_TIMEOUT = env.int('FUNNEL_CACHE_TIMEOUT', default=86400)
+FUNNEL_MAX_WINDOW_HOURS = env.int('FUNNEL_MAX_WINDOW_HOURS', default=168)
+FUNNEL_MAX_DAYS = env.int('FUNNEL_MAX_DAYS', default=92)
+
+# Tiered retention (`manage.py apply_retention`, run daily or with --follow).
+# Raw events older than RETENTION_RAW_DAYS are folded into the rollups,
+# sketches and top-value summaries and then deleted; hourly rollups are kept
+# RETENTION_HOURLY_DAYS and the daily aggregates and sessions
+# RETENTION_AGGREGATE_DAYS. Unset keeps a tier forever. For example 90, 90
+# and 1095 keep raw events for 90 days and daily aggregates for 3 years.
+# Deletes run in windows of RETENTION_BATCH_SIZE primary keys.
+RETENTION_RAW_DAYS = env.int('RETENTION_RAW_DAYS', default=None)
+RETENTION_HOURLY_DAYS = env.int('RETENTION_HOURLY_DAYS', default=None)
+RETENTION_AGGREGATE_DAYS = env.int('RETENTION_AGGREGATE_DAYS', default=None)
+RETENTION_BATCH_SIZE = env.int('RETENTION_BATCH_SIZE', default=5000)
+
+# Events table partitioning (PostgreSQL only, opt-in via
+# `manage.py partition_events --convert`; keep it running daily afterwards).
+EVENT_PARTITION_INTERVAL = env('EVENT_PARTITION_INTERVAL', default='month')
+EVENT_PARTITIONS_AHEAD = env.int('EVENT_PARTITIONS_AHEAD', default=3)
+# Past partitions --convert creates at most, counting back from the current
+# one; older rows (or garbage timestamps) stay in the DEFAULT partition.
+EVENT_PARTITIONS_BEHIND = env.int('EVENT_PARTITIONS_BEHIND', default=36)
+# Partitions ending more than this many days ago are detached and dropped;
+# unset keeps events forever. Dropped rows are not folded into the
+# aggregates: keep it above RETENTION_RAW_DAYS.
+EVENT_RETENTION_DAYS = env.int('EVENT_RETENTION_DAYS', default=None)